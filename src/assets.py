@@ -0,0 +1,232 @@
+import json
+import os
+import os.path
+import posixpath
+import re
+from typing import Optional
+
+from images import IMAGE_EXTENSIONS, read_image_size
+from manifest import BuildManifest, ASSETS, hash_bytes, hash_file
+from publish import atomic_write
+
+# Fingerprinted static assets: files under the static directory are
+# published under content-hashed names (index.css -> index.3f9a1c2b7d.css)
+# so they can be cached forever, and pages link to them through the
+# index built here.
+#
+# The hash of every asset (and the size of every image) is stored in its
+# manifest entry and reused while the file's size and mtime are
+# unchanged, so an unchanged asset is never opened.
+#
+# Stylesheets are the exception: the url() and @import references in
+# them are rewritten to the hashed names, so they are read every build
+# and hashed after rewriting, which gives a stylesheet a new name when an
+# image it uses gets one. Rewritten stylesheets are written out by
+# publish_rewritten() rather than copied.
+
+HASH_CHARS = 10
+# files pages link to; the rest (robots.txt, favicon.ico, ...) are
+# fetched by fixed name and keep it
+FINGERPRINT_EXTENSIONS = {
+    '.css', '.js', '.mjs', '.png', '.jpg', '.jpeg', '.gif', '.svg', '.webp', '.avif',
+    '.woff', '.woff2', '.ttf', '.otf', '.mp3', '.mp4', '.webm', '.pdf',
+}
+ASSET_MANIFEST_NAME = 'asset-manifest.json'
+
+
+class AssetInfo:
+    __slots__ = ('src', 'dest', 'url', 'digest', 'width', 'height', 'content')
+
+    def __init__(self, src: str, dest: str, url: str, digest: str,
+                 width: Optional[int] = None, height: Optional[int] = None,
+                 content: Optional[bytes] = None):
+        self.src = src
+        self.dest = dest
+        self.url = url
+        self.digest = digest
+        self.width = width
+        self.height = height
+        # what is published instead of the file, for rewritten stylesheets
+        self.content = content
+
+    def __repr__(self) -> str:
+        return f'AssetInfo({self.url}, {self.width}x{self.height})'
+
+
+def hashed_path(path: str, digest: str) -> str:
+    stem, ext = os.path.splitext(path)
+    return f'{stem}.{digest[:HASH_CHARS]}{ext}'
+
+def _walk_files(root: str, extensions: set[str]):
+    stack = [root]
+    while len(stack) > 0:
+        for entry in os.scandir(stack.pop()):
+            if entry.is_dir():
+                stack.append(entry.path)
+            elif os.path.splitext(entry.name)[1].lower() in extensions:
+                yield entry
+
+_CSS_REF_RE = re.compile(r'''(url\(\s*)(["']?)([^"')]*)\2(\s*\))|(@import\s*)(["'])([^"']*)\6''', re.I)
+
+# The asset url a reference in the stylesheet at css_url points to, and
+# what follows the path (?query or #fragment). None for data: urls,
+# other sites and the like.
+def _css_target(ref: str, css_url: str) -> Optional[tuple[str, str]]:
+    ref = ref.strip()
+    if ref == '' or ref.startswith(('#', '//')) or re.match(r'[a-zA-Z][a-zA-Z0-9+.-]*:', ref):
+        return None
+    cut = min([i for i in (ref.find('?'), ref.find('#')) if i >= 0], default=len(ref))
+    path, suffix = ref[:cut], ref[cut:]
+    if not path.startswith('/'):
+        path = posixpath.join(posixpath.dirname(css_url), path)
+    return posixpath.normpath(path), suffix
+
+# Points the url() and @import references in a stylesheet at the hashed
+# urls of the assets they name, keeping each reference relative or
+# absolute as it was written
+def rewrite_css_urls(text: str, css_url: str, urls: dict[str, str]) -> str:
+    def replace(m: re.Match) -> str:
+        ref = m.group(3) if m.group(1) is not None else m.group(7)
+        target = _css_target(ref, css_url)
+        if target is None or target[0] not in urls:
+            return m.group(0)
+        path = ref.strip()[:len(ref.strip()) - len(target[1])]
+        new_ref = posixpath.join(posixpath.dirname(path), posixpath.basename(urls[target[0]])) + target[1]
+        if m.group(1) is not None:
+            return f'{m.group(1)}{m.group(2)}{new_ref}{m.group(2)}{m.group(4)}'
+        return f'{m.group(5)}{m.group(6)}{new_ref}{m.group(6)}'
+
+    return _CSS_REF_RE.sub(replace, text)
+
+# Finds every asset under static_dir with one of the extensions, keyed by
+# the url pages use for it ('/images/tom.png'). Hashes and image sizes
+# come from the manifest where the file is unchanged, unless always_hash
+# is set. Stylesheets referencing assets are rewritten, see above, and
+# keep their name if css isn't one of the extensions.
+def index_assets(static_dir: str, public_dir: str, manifest: BuildManifest, always_hash: bool = False,
+                 extensions: set[str] = FINGERPRINT_EXTENSIONS) -> dict[str, AssetInfo]:
+    assets = {}
+    stylesheets = {}
+    for entry in _walk_files(static_dir, extensions | {'.css'}):
+        src = os.path.normpath(entry.path)
+        rel = os.path.relpath(src, static_dir)
+        url = '/' + rel.replace(os.sep, '/')
+        if os.path.splitext(src)[1].lower() == '.css':
+            stylesheets[url] = (src, rel)
+            continue
+        is_image = os.path.splitext(src)[1].lower() in IMAGE_EXTENSIONS
+        st = entry.stat()
+
+        known = manifest.get(ASSETS, src)
+        if (known is not None and not always_hash and (not is_image or 'width' in known)
+                and known.get('size') == st.st_size and known.get('mtime_ns') == st.st_mtime_ns):
+            digest = known['hash']
+            size = (known['width'], known['height']) if is_image else None
+        else:
+            digest = hash_file(src)
+            if not is_image:
+                size = None
+            elif known is not None and known['hash'] == digest and 'width' in known:
+                size = (known['width'], known['height'])
+            else:
+                size = read_image_size(src)
+
+        hashed = hashed_path(rel, digest)
+        width, height = size if size is not None else (None, None)
+        assets[url] = AssetInfo(src, os.path.join(public_dir, hashed), '/' + hashed.replace(os.sep, '/'),
+                                digest, width, height)
+
+    # stylesheets after the rest, and one @imported before the one
+    # importing it, so every url they reference is known
+    resolving = set()
+
+    def resolve(url: str):
+        if url in assets or url in resolving:
+            return
+        resolving.add(url)
+        src, rel = stylesheets[url]
+        with open(src, 'rb') as f:
+            data = f.read()
+        text = data.decode('utf-8', errors='surrogateescape')
+        for m in _CSS_REF_RE.finditer(text):
+            target = _css_target(m.group(3) if m.group(1) is not None else m.group(7), url)
+            if target is not None and target[0] in stylesheets:
+                resolve(target[0])
+        rewritten = rewrite_css_urls(text, url, asset_urls(assets)).encode('utf-8', errors='surrogateescape')
+        content = rewritten if rewritten != data else None
+        if '.css' in extensions:
+            digest = hash_bytes(rewritten)
+            hashed = hashed_path(rel, digest)
+        elif content is not None:
+            digest = hash_bytes(rewritten)
+            hashed = rel
+        else:
+            return
+        assets[url] = AssetInfo(src, os.path.join(public_dir, hashed), '/' + hashed.replace(os.sep, '/'),
+                                digest, content=content)
+
+    for url in sorted(stylesheets):
+        resolve(url)
+    return assets
+
+# Writes the rewritten stylesheets, which the static sync skips, and
+# records them in the manifest. Returns how many were written.
+def publish_rewritten(manifest: BuildManifest, assets: dict[str, AssetInfo]) -> int:
+    written = 0
+    for info in assets.values():
+        if info.content is None or manifest.is_current(ASSETS, info.src, info.digest, info.dest):
+            continue
+        entry = manifest.get(ASSETS, info.src)
+        if entry is not None and entry['dest'] != info.dest:
+            manifest.remove(ASSETS, info.src)
+        os.makedirs(os.path.split(info.dest)[0], exist_ok=True)
+        with atomic_write(info.dest, 'wb') as f:
+            f.write(info.content)
+        # no size or mtime, the hash is of the rewritten text and can't be
+        # reused from the source's stat
+        manifest.record(ASSETS, info.src, info.digest, info.dest)
+        print(f'LOG: wrote rewritten stylesheet: {info.src} -> {info.dest}')
+        written += 1
+    return written
+
+# Stores the image sizes in the manifest entries written by the static
+# sync, for index_assets() to reuse next build
+def annotate_manifest(manifest: BuildManifest, assets: dict[str, AssetInfo]):
+    for info in assets.values():
+        entry = manifest.get(ASSETS, info.src)
+        if entry is not None and os.path.splitext(info.src)[1].lower() in IMAGE_EXTENSIONS:
+            entry['width'] = info.width
+            entry['height'] = info.height
+
+# Changes whenever any asset url or image size changes
+def index_digest(assets: dict[str, AssetInfo]) -> str:
+    parts = [f'{url} {info.url} {info.width} {info.height}' for url, info in sorted(assets.items())]
+    return hash_bytes('\n'.join(parts).encode())
+
+def asset_urls(assets: dict[str, AssetInfo]) -> dict[str, str]:
+    return {url: info.url for url, info in assets.items()}
+
+# Writes {url: hashed url} as json for servers and scripts that need to
+# find an asset by its plain name. The file is only replaced when its
+# content changes, or removed with assets None.
+def write_asset_manifest(public_dir: str, assets: Optional[dict[str, AssetInfo]]):
+    path = os.path.join(public_dir, ASSET_MANIFEST_NAME)
+    if assets is None:
+        if os.path.exists(path):
+            os.remove(path)
+        return
+
+    text = json.dumps(asset_urls(assets), indent=1, sort_keys=True)
+    try:
+        with open(path, 'rt') as f:
+            if f.read() == text:
+                return
+    except FileNotFoundError:
+        pass
+
+    os.makedirs(public_dir, exist_ok=True)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wt') as f:
+        f.write(text)
+    os.replace(tmp_path, path)
+    print(f'LOG: wrote asset manifest: {path}')
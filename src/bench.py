@@ -0,0 +1,158 @@
+import argparse
+import contextlib
+import gc
+import io
+import json
+import os
+import os.path
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Callable
+
+from corpus import generate_document, generate_tree, link_dense, paragraph
+from functions import (
+    markdown_to_html_node,
+    markdown_to_html_node_scan,
+    markdown_to_html_node_split,
+    text_to_textnodes,
+    text_to_textnodes_scan,
+)
+from main import generate_pages_recursive
+from profiler import count_nodes
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'bench_baseline.json')
+
+# Benchmarks the hot paths of a build against a synthetic corpus, and the
+# memory used per node.
+#
+#   python3 src/bench.py                    run and compare with the baseline
+#   python3 src/bench.py --save-baseline    run and store the results as the new baseline
+#   python3 src/bench.py --quick            smaller corpus, for a fast sanity check
+#
+# The baseline is src/bench_baseline.json wherever it's run from. Timings
+# only compare on the same machine, so it isn't committed: save one before
+# a change, then run again after it.
+
+
+# Runs fn `repeat` times and returns the fastest run in seconds
+def measure(fn: Callable[[], object], repeat: int) -> float:
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+# Returns the bytes allocated by fn() and still alive afterwards, and its result
+def measure_memory(fn: Callable[[], object]) -> tuple[int, object]:
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    result = fn()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return after - before, result
+
+# Bytes per node for an html tree and a text node list, strings included
+def run_memory_benchmarks(seed: int) -> dict[str, float]:
+    rng = random.Random(seed)
+    document = generate_document(rng, 500)
+    text = paragraph(rng, span_every=1, sentences=2000)
+
+    results = {}
+    nbytes, tree = measure_memory(lambda: markdown_to_html_node(document))
+    results['memory.bytes_per_html_node'] = nbytes / count_nodes(tree)
+    nbytes, nodes = measure_memory(lambda: text_to_textnodes_scan(text))
+    results['memory.bytes_per_text_node'] = nbytes / len(nodes)
+    return results
+
+def run_benchmarks(pages: int, repeat: int, seed: int) -> dict[str, float]:
+    rng = random.Random(seed)
+    document = generate_document(rng, 2000)
+    paragraph = link_dense(rng, 5000)
+    tree = markdown_to_html_node(document)
+
+    results = {}
+    results['markdown_to_html_node.split'] = measure(lambda: markdown_to_html_node_split(document), repeat)
+    results['markdown_to_html_node.scan'] = measure(lambda: markdown_to_html_node_scan(document), repeat)
+    results['text_to_textnodes.split'] = measure(lambda: text_to_textnodes(paragraph), repeat)
+    results['text_to_textnodes.scan'] = measure(lambda: text_to_textnodes_scan(paragraph), repeat)
+    results['ParentNode.to_html'] = measure(tree.to_html, repeat)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        content = os.path.join(tmp, 'content')
+        template = os.path.join(tmp, 'template.html')
+        with open('template.html', 'rt') as src, open(template, 'wt') as dst:
+            dst.write(src.read())
+        generate_tree(content, pages, seed)
+
+        def build():
+            # generate_page logs every page, keep that out of the results
+            with contextlib.redirect_stdout(io.StringIO()):
+                generate_pages_recursive(content, template, os.path.join(tmp, 'public'))
+
+        # a full build is slow, once is enough
+        results[f'generate_pages_recursive.{pages}'] = measure(build, 1)
+
+    results.update(run_memory_benchmarks(seed))
+    return results
+
+def load_baseline(path: str) -> dict[str, float]:
+    if not os.path.exists(path):
+        return {}
+    with open(path, 'rt') as f:
+        return json.load(f)
+
+# Prints results next to the baseline, returns the names that got slower
+# than baseline * threshold
+def compare(results: dict[str, float], baseline: dict[str, float], threshold: float) -> list[str]:
+    regressions = []
+    # memory.* results are bytes, everything else is seconds
+    print(f'{"benchmark":<36} {"value":>10} {"baseline":>10} {"ratio":>7}')
+    for name, value in results.items():
+        base = baseline.get(name)
+        if base is None or base <= 0:
+            print(f'{name:<36} {value:>10.4f} {"-":>10} {"-":>7}')
+            continue
+
+        ratio = value / base
+        flag = ''
+        if ratio > threshold:
+            flag = '  REGRESSION'
+            regressions.append(name)
+        print(f'{name:<36} {value:>10.4f} {base:>10.4f} {ratio:>7.2f}{flag}')
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the site generator')
+    parser.add_argument('--pages', type=int, default=10000,
+                        help='pages in the generated tree for the full build benchmark')
+    parser.add_argument('--repeat', type=int, default=5, help='runs per micro benchmark, best is kept')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--quick', action='store_true', help='use 200 pages and 2 repeats')
+    parser.add_argument('--baseline', default=BASELINE_PATH)
+    parser.add_argument('--save-baseline', action='store_true')
+    parser.add_argument('--threshold', type=float, default=1.2,
+                        help='fail if a benchmark is this many times slower than the baseline')
+    args = parser.parse_args()
+
+    if args.quick:
+        args.pages = 200
+        args.repeat = 2
+
+    results = run_benchmarks(args.pages, args.repeat, args.seed)
+    regressions = compare(results, load_baseline(args.baseline), args.threshold)
+
+    if args.save_baseline:
+        with open(args.baseline, 'wt') as f:
+            json.dump(results, f, indent=1)
+        print(f'LOG: saved baseline: {args.baseline}')
+    elif len(regressions) > 0:
+        print(f'LOG: {len(regressions)} benchmark(s) regressed')
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,107 @@
+import gzip
+import os
+import os.path
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+from manifest import BuildManifest, PAGES, ASSETS, GENERATED
+
+# Precompressed copies of the outputs, written next to them as .gz (and
+# .br when the brotli module is installed) for servers that can send
+# them as-is, e.g. nginx's gzip_static.
+#
+# Every manifest entry that has been through this stage carries the
+# suffixes tried for it under 'compressed'. Recording an entry again
+# after its output is rewritten drops that key, so only new and changed
+# outputs get compressed.
+
+COMPRESSIBLE_EXTENSIONS = {
+    '.html', '.htm', '.css', '.js', '.mjs', '.json', '.xml', '.svg', '.txt', '.md', '.map', '.ico',
+}
+# below this the saving is smaller than the request overhead
+MIN_COMPRESS_BYTES = 256
+
+
+def available_suffixes() -> list[str]:
+    if brotli is None:
+        return ['.gz']
+    return ['.gz', '.br']
+
+def is_compressible(path: str) -> bool:
+    return os.path.splitext(path)[1].lower() in COMPRESSIBLE_EXTENSIONS
+
+def _encode(data: bytes, suffix: str) -> bytes:
+    if suffix == '.gz':
+        # mtime=0 keeps the output the same from build to build
+        return gzip.compress(data, compresslevel=9, mtime=0)
+    return brotli.compress(data, quality=11)
+
+# Writes the compressed siblings of path, returns the suffixes written.
+# A sibling that wouldn't be smaller than the original is not written,
+# and any old copy of it is removed.
+def compress_file(path: str, suffixes: list[str]) -> list[str]:
+    with open(path, 'rb') as f:
+        data = f.read()
+
+    written = []
+    for suffix in suffixes:
+        encoded = _encode(data, suffix) if len(data) >= MIN_COMPRESS_BYTES else None
+        if encoded is None or len(encoded) >= len(data):
+            discard_compressed(path, [suffix])
+            continue
+
+        tmp_path = f'{path}{suffix}.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(encoded)
+        os.replace(tmp_path, path + suffix)
+        written.append(suffix)
+    return written
+
+def discard_compressed(path: str, suffixes: list[str]):
+    for suffix in suffixes:
+        try:
+            os.remove(path + suffix)
+        except FileNotFoundError:
+            pass
+
+# Brings the compressed siblings of every output in the manifest up to
+# date, compressing on `threads` threads (zlib and brotli release the
+# GIL). With enabled False, siblings left by earlier builds are removed
+# instead. Returns the number of outputs compressed.
+def compress_outputs(manifest: BuildManifest, enabled: bool, threads: Optional[int] = None) -> int:
+    suffixes = available_suffixes()
+    todo = []
+    for kind in (PAGES, ASSETS, GENERATED):
+        for src, entry in manifest.entries[kind].items():
+            dest = entry['dest']
+            if not is_compressible(dest):
+                continue
+
+            done = entry.get('compressed')
+            if enabled:
+                # also redone when brotli was installed or removed since
+                if done != suffixes:
+                    discard_compressed(dest, [suffix for suffix in done or [] if suffix not in suffixes])
+                    todo.append(entry)
+            elif done is not None:
+                discard_compressed(dest, done)
+                del entry['compressed']
+            elif src in manifest.recorded[kind]:
+                # rewritten this build, may still have siblings from before
+                discard_compressed(dest, suffixes)
+
+    if len(todo) == 0:
+        return 0
+
+    with ThreadPoolExecutor(threads or os.cpu_count()) as pool:
+        list(pool.map(lambda entry: compress_file(entry['dest'], suffixes), todo))
+    for entry in todo:
+        entry['compressed'] = suffixes
+
+    print(f'LOG: compressed {len(todo)} outputs ({", ".join(suffixes)})')
+    return len(todo)
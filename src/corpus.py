@@ -0,0 +1,116 @@
+import os
+import os.path
+import random
+
+# Seeded generator of synthetic markdown for benchmarks.
+#
+# Everything produced here is valid for our parser: inline delimiters are
+# balanced, urls and code never contain _ or ** and code fences have no
+# blank lines.
+
+WORDS = (
+    'the', 'ring', 'of', 'power', 'shire', 'hobbit', 'wizard', 'elf', 'dwarf', 'road',
+    'goes', 'ever', 'on', 'and', 'under', 'mountain', 'river', 'forest', 'dark', 'light',
+    'a', 'to', 'in', 'with', 'song', 'tale', 'old', 'new', 'west', 'east', 'king', 'return',
+)
+
+# relative weight of each block kind in a generated document
+DEFAULT_MIX = {
+    'heading': 2,
+    'paragraph': 6,
+    'inline_heavy': 3,
+    'link_dense': 2,
+    'unordered_list': 2,
+    'ordered_list': 2,
+    'code': 1,
+    'quote': 1,
+}
+
+
+def words(rng: random.Random, count: int) -> str:
+    return ' '.join(rng.choice(WORDS) for _ in range(count))
+
+def url(rng: random.Random) -> str:
+    return f'/{rng.choice(WORDS)}/{rng.choice(WORDS)}-{rng.randrange(10000)}'
+
+def inline_span(rng: random.Random) -> str:
+    kind = rng.randrange(6)
+    if kind == 0:
+        return f'**{words(rng, rng.randint(1, 4))}**'
+    if kind == 1:
+        return f'_{words(rng, rng.randint(1, 4))}_'
+    if kind == 2:
+        return f'`{words(rng, rng.randint(1, 3))}`'
+    if kind == 3:
+        return f'[{words(rng, rng.randint(1, 3))}]({url(rng)})'
+    if kind == 4:
+        return f'![{words(rng, 2)}]({url(rng)}.png)'
+    # links and images inside bold/italic stay literal text for our parser,
+    # still worth exercising as the delimiters are found first
+    return f'**[{words(rng, 2)}]({url(rng)})** _{words(rng, 2)}_'
+
+def paragraph(rng: random.Random, span_every: int, sentences: int) -> str:
+    lines = []
+    for _ in range(sentences):
+        parts = []
+        for _ in range(rng.randint(4, 12)):
+            if rng.randrange(span_every) == 0:
+                parts.append(inline_span(rng))
+            else:
+                parts.append(words(rng, rng.randint(1, 4)))
+        lines.append(' '.join(parts) + '.')
+    return '\n'.join(lines)
+
+def link_dense(rng: random.Random, links: int) -> str:
+    return ' '.join(f'[{words(rng, 2)}]({url(rng)}) and' for _ in range(links)) + ' done.'
+
+def block(rng: random.Random, kind: str) -> str:
+    if kind == 'heading':
+        return '#' * rng.randint(2, 6) + ' ' + words(rng, rng.randint(2, 6))
+    if kind == 'paragraph':
+        return paragraph(rng, span_every=6, sentences=rng.randint(1, 6))
+    if kind == 'inline_heavy':
+        return paragraph(rng, span_every=1, sentences=rng.randint(2, 8))
+    if kind == 'link_dense':
+        return link_dense(rng, rng.randint(10, 80))
+    if kind == 'unordered_list':
+        return '\n'.join(f'- {paragraph(rng, 3, 1)}' for _ in range(rng.randint(3, 60)))
+    if kind == 'ordered_list':
+        return '\n'.join(f'{ii + 1}. {paragraph(rng, 3, 1)}' for ii in range(rng.randint(3, 60)))
+    if kind == 'code':
+        lines = [f'    {words(rng, rng.randint(1, 8))}();' for _ in range(rng.randint(5, 200))]
+        return '```\n' + '\n'.join(lines) + '\n```'
+    if kind == 'quote':
+        return '\n'.join(f'> {paragraph(rng, 4, 1)}' for _ in range(rng.randint(1, 8)))
+    raise ValueError(f'unknown block kind: {kind}')
+
+# Returns a markdown document of roughly `blocks` blocks, starting with an h1
+def generate_document(rng: random.Random, blocks: int, mix: dict[str, int] = DEFAULT_MIX) -> str:
+    kinds = list(mix)
+    weights = [mix[kind] for kind in kinds]
+    parts = ['# ' + words(rng, rng.randint(2, 6))]
+    for kind in rng.choices(kinds, weights, k=blocks):
+        parts.append(block(rng, kind))
+    return '\n\n'.join(parts) + '\n'
+
+# Writes `pages` documents under root, spread over nested directories.
+# Returns the paths written.
+def generate_tree(root: str, pages: int, seed: int = 0, blocks: int = 10,
+                  mix: dict[str, int] = DEFAULT_MIX, fanout: int = 20) -> list[str]:
+    rng = random.Random(seed)
+    paths = []
+    for ii in range(pages):
+        parts = []
+        n = ii // fanout
+        while n > 0:
+            parts.append(f'd{n % fanout}')
+            n //= fanout
+        dir_path = os.path.join(root, *reversed(parts))
+        os.makedirs(dir_path, exist_ok=True)
+
+        path = os.path.join(dir_path, f'page{ii}.md')
+        with open(path, 'wt') as f:
+            f.write(generate_document(rng, rng.randint(blocks // 2, blocks * 3 // 2), mix))
+        paths.append(path)
+
+    return paths
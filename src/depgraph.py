@@ -0,0 +1,104 @@
+from typing import Optional
+
+# What every page was built from besides its markdown, so a change to one
+# shared input rebuilds only the pages that use it, and the build can say
+# why a page was rebuilt.
+#
+# Dependencies are strings:
+#   'template:template.html'  the template the page was rendered with
+#   'asset:/images/tom.png'   a static file it embeds or links, by plain url
+#   'page:/blog/tom'          another page it links to
+#
+# The graph is saved with the build manifest: each page's dependencies,
+# the reverse index from a dependency to the pages using it, and the state
+# (hashed url and size) every asset had when its pages were last rendered.
+
+TEMPLATE_DEP = 'template:'
+ASSET_DEP = 'asset:'
+PAGE_DEP = 'page:'
+
+# links to these are pages, anything else with an extension is an asset
+PAGE_EXTENSIONS = {'', '.html', '.htm'}
+
+
+class DependencyGraph:
+    def __init__(self):
+        # page -> dependencies
+        self.forward: dict[str, list[str]] = {}
+        # dependency -> pages
+        self.reverse: dict[str, set[str]] = {}
+        # dependency -> state at the last build, only assets have one
+        self.states: dict[str, str] = {}
+        # page -> why it has to be rebuilt, for this build only
+        self.stale: dict[str, str] = {}
+
+    @classmethod
+    def from_json(cls, data: Optional[dict]) -> 'DependencyGraph':
+        graph = cls()
+        if data is None:
+            return graph
+        graph.states = data.get('states', {})
+        for dep, pages in data.get('dependents', {}).items():
+            graph.reverse[dep] = set(pages)
+            for page in pages:
+                graph.forward.setdefault(page, []).append(dep)
+        return graph
+
+    # Only the reverse index is stored, the forward edges are rebuilt from it
+    def to_json(self) -> dict:
+        return {
+            'dependents': {dep: sorted(pages) for dep, pages in self.reverse.items()},
+            'states': self.states,
+        }
+
+    def record(self, page: str, deps: list[str]):
+        self.remove(page)
+        self.forward[page] = list(deps)
+        for dep in deps:
+            self.reverse.setdefault(dep, set()).add(page)
+
+    def remove(self, page: str):
+        self.stale.pop(page, None)
+        for dep in self.forward.pop(page, []):
+            pages = self.reverse.get(dep)
+            if pages is None:
+                continue
+            pages.discard(page)
+            if len(pages) == 0:
+                del self.reverse[dep]
+
+    def dependencies(self, page: str) -> list[str]:
+        return self.forward.get(page, [])
+
+    def dependents(self, dep: str) -> set[str]:
+        return self.reverse.get(dep, set())
+
+    # Stores the current state of every dependency that has one (missing
+    # means it doesn't exist) and returns {dependency: what changed} for
+    # those that differ from the last build
+    def update_states(self, states: dict[str, str]) -> dict[str, str]:
+        changed = {}
+        for dep in self.states.keys() | states.keys():
+            old = self.states.get(dep)
+            new = states.get(dep)
+            if old == new:
+                continue
+            if old is None:
+                changed[dep] = 'added'
+            elif new is None:
+                changed[dep] = 'removed'
+            else:
+                changed[dep] = 'changed'
+        self.states = dict(states)
+        return changed
+
+    # Marks every page that depends on a changed dependency as stale,
+    # returns {page: reason}
+    def invalidate(self, changed: dict[str, str]) -> dict[str, str]:
+        marked = {}
+        for dep in sorted(changed):
+            for page in self.dependents(dep):
+                if page not in self.stale and page not in marked:
+                    marked[page] = f'{dep.split(":", 1)[1]} {changed[dep]}'
+        self.stale.update(marked)
+        return marked
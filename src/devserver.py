@@ -0,0 +1,111 @@
+import functools
+import os
+import os.path
+import threading
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+# Development http server that tells open pages to reload after a rebuild.
+#
+# Html responses get a small script appended that listens on an
+# EventSource (server-sent events) at LIVERELOAD_PATH. Files on disk are
+# never changed, only what is sent to the browser.
+
+LIVERELOAD_PATH = '/__livereload'
+LIVERELOAD_SCRIPT = (
+    '<script>new EventSource("' + LIVERELOAD_PATH + '")'
+    '.addEventListener("reload", function () { location.reload(); });</script>'
+)
+KEEPALIVE_SECONDS = 15
+
+
+class Reloader:
+    def __init__(self):
+        self.condition = threading.Condition()
+        self.generation = 0
+
+    def notify(self):
+        with self.condition:
+            self.generation += 1
+            self.condition.notify_all()
+
+    # Blocks until the next notify() or timeout, returns the current generation
+    def wait(self, generation: int, timeout: float) -> int:
+        with self.condition:
+            self.condition.wait_for(lambda: self.generation != generation, timeout)
+            return self.generation
+
+
+class DevRequestHandler(SimpleHTTPRequestHandler):
+    reloader: Reloader
+
+    def __init__(self, *args, reloader: Reloader, **kwargs):
+        self.reloader = reloader
+        super().__init__(*args, **kwargs)
+
+    def do_GET(self):
+        if self.path == LIVERELOAD_PATH:
+            self.stream_reloads()
+            return
+
+        path = self.translate_path(self.path)
+        if os.path.isdir(path) and self.path.split('?', 1)[0].endswith('/'):
+            path = os.path.join(path, 'index.html')
+
+        if path.endswith('.html') and os.path.isfile(path):
+            self.send_html(path)
+            return
+
+        super().do_GET()
+
+    def send_html(self, path: str):
+        with open(path, 'rb') as f:
+            body = f.read()
+
+        script = LIVERELOAD_SCRIPT.encode()
+        index = body.rfind(b'</body>')
+        if index == -1:
+            body += script
+        else:
+            body = body[:index] + script + body[index:]
+
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/html; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('Cache-Control', 'no-store')
+        self.end_headers()
+        self.wfile.write(body)
+
+    def stream_reloads(self):
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Cache-Control', 'no-store')
+        self.end_headers()
+
+        generation = self.reloader.generation
+        try:
+            while True:
+                current = self.reloader.wait(generation, KEEPALIVE_SECONDS)
+                if current == generation:
+                    self.wfile.write(b': keepalive\n\n')
+                else:
+                    generation = current
+                    self.wfile.write(b'event: reload\ndata: reload\n\n')
+                self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+    def log_message(self, format, *args):
+        if self.path != LIVERELOAD_PATH:
+            super().log_message(format, *args)
+
+
+# Starts serving directory on a background thread
+def start_server(directory: str, port: int, reloader: Reloader) -> ThreadingHTTPServer:
+    handler = functools.partial(DevRequestHandler, directory=directory, reloader=reloader)
+    server = ThreadingHTTPServer(('', port), handler)
+    server.daemon_threads = True
+
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    print(f'LOG: serving {directory} on http://localhost:{server.server_address[1]}/')
+    return server
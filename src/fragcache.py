@@ -0,0 +1,119 @@
+import hashlib
+import os
+import os.path
+import pickle
+from collections import OrderedDict
+from typing import Optional
+
+# Rendered html of markdown blocks, keyed by a hash of the block text and
+# the renderer version, so blocks repeated across pages (footers,
+# disclaimers, code samples) are only parsed and rendered once.
+#
+# Entries are kept in LRU order and evicted once their html adds up to
+# more than max_chars. The cache can be saved to disk and loaded by the
+# next build.
+
+FRAGMENT_CACHE_PATH = '.cache/fragments.pickle'
+FORMAT_VERSION = 1
+DEFAULT_MAX_CHARS = 64 * 1024 * 1024
+# blocks shorter than this render faster than they hash
+MIN_BLOCK_CHARS = 32
+
+
+class FragmentCache:
+    def __init__(self, version: str, max_chars: int = DEFAULT_MAX_CHARS):
+        self.version = version
+        self.max_chars = max_chars
+        self.entries: OrderedDict[bytes, str] = OrderedDict()
+        self.chars = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        # keys added since the last take_new(), for merging worker caches
+        self.new_keys: set[bytes] = set()
+
+    def key(self, text: str) -> bytes:
+        h = hashlib.blake2b(self.version.encode(), digest_size=16)
+        h.update(b'\0')
+        h.update(text.encode())
+        return h.digest()
+
+    def get(self, key: bytes) -> Optional[str]:
+        html = self.entries.get(key)
+        if html is None:
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return html
+
+    def put(self, key: bytes, html: str):
+        old = self.entries.pop(key, None)
+        if old is not None:
+            self.chars -= len(old)
+        self.entries[key] = html
+        self.chars += len(html)
+        self.new_keys.add(key)
+
+        while self.chars > self.max_chars and len(self.entries) > 1:
+            _, evicted = self.entries.popitem(last=False)
+            self.chars -= len(evicted)
+            self.evictions += 1
+
+    # Hands over entries added since the last call, with the hit/miss counts
+    def take_new(self) -> tuple[dict[bytes, str], int, int]:
+        new = {key: self.entries[key] for key in self.new_keys if key in self.entries}
+        stats = (new, self.hits, self.misses)
+        self.new_keys = set()
+        self.hits = 0
+        self.misses = 0
+        return stats
+
+    # Adds what a worker process rendered, see take_new()
+    def merge(self, new: dict[bytes, str], hits: int, misses: int):
+        for key, html in new.items():
+            self.put(key, html)
+        self.hits += hits
+        self.misses += misses
+
+    def summary(self) -> str:
+        lookups = self.hits + self.misses
+        rate = 100 * self.hits / lookups if lookups > 0 else 0.0
+        return (f'fragment cache: {self.hits} hits, {self.misses} misses ({rate:.1f}% hit rate), '
+                f'{len(self.entries)} entries, {self.chars / 1024:.0f} KiB, {self.evictions} evicted')
+
+    @classmethod
+    def load(cls, path: str, version: str, max_chars: int = DEFAULT_MAX_CHARS) -> 'FragmentCache':
+        cache = cls(version, max_chars)
+        if not os.path.exists(path):
+            return cache
+
+        try:
+            with open(path, 'rb') as f:
+                data = pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError, ValueError):
+            print(f'LOG: unreadable fragment cache, starting empty: {path}')
+            return cache
+
+        # a different renderer version means every key is stale anyway
+        if data.get('format') != FORMAT_VERSION or data.get('version') != version:
+            print(f'LOG: fragment cache is from another renderer version, starting empty')
+            return cache
+
+        for key, html in data['entries']:
+            cache.entries[key] = html
+            cache.chars += len(html)
+        return cache
+
+    def save(self, path: str):
+        dir_part = os.path.split(path)[0]
+        if dir_part:
+            os.makedirs(dir_part, exist_ok=True)
+
+        data = {'format': FORMAT_VERSION, 'version': self.version, 'entries': list(self.entries.items())}
+        # shards building side by side save at the same time, the last one wins
+        tmp_path = f'{path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'wb') as f:
+            pickle.dump(data, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+        self.new_keys = set()
@@ -0,0 +1,121 @@
+import mmap
+import os
+import re
+from typing import Optional, Union
+
+from functions import extract_title, find_title
+
+# Front matter: an optional header of key: value lines between two ---
+# lines at the very top of a page.
+#
+#   ---
+#   title: Why Tom Bombadil Was a Mistake
+#   date: 2024-03-01
+#   tags: [tolkien, opinion]
+#   ---
+#
+# Values are strings, or lists of strings when written as [a, b], with
+# surrounding quotes dropped. A title here wins over the page's heading.
+#
+# read_metadata() gets the same metadata (and the heading title) straight
+# from the file, memory-mapped, so only the start of the file is read and
+# no body is rendered.
+
+MetaValue = Union[str, list[str]]
+
+FENCE = '---'
+# a header longer than this is taken for a page that just starts with ---
+MAX_FRONT_MATTER_BYTES = 64 * 1024
+
+_FENCE_LINE = re.compile(r'^---[ \t]*\r?$', re.M)
+_FENCE_LINE_BYTES = re.compile(rb'^---[ \t]*\r?$', re.M)
+# lines that could hold the title, see find_title()
+_HEADING_LINE_BYTES = re.compile(rb'^# .*$', re.M)
+
+
+def _unquote(text: str) -> str:
+    if len(text) >= 2 and text[0] == text[-1] and text[0] in '"\'':
+        return text[1:-1]
+    return text
+
+def parse_value(text: str) -> MetaValue:
+    text = text.strip()
+    if text.startswith('[') and text.endswith(']'):
+        return [_unquote(item.strip()) for item in text[1:-1].split(',') if item.strip() != '']
+    return _unquote(text)
+
+# Parses the lines between the fences. Blank lines and # comments are
+# skipped, anything else without a colon is an error.
+def parse_front_matter(text: str) -> dict[str, MetaValue]:
+    meta = {}
+    for line in text.splitlines():
+        stripped = line.strip()
+        if stripped == '' or stripped.startswith('#'):
+            continue
+        key, sep, value = stripped.partition(':')
+        if sep == '' or key.strip() == '':
+            raise ValueError(f'bad front matter line: {line}')
+        meta[key.strip()] = parse_value(value)
+    return meta
+
+# Returns (front matter, markdown after it). Pages without front matter
+# come back whole with an empty dict.
+def split_front_matter(markdown: str) -> tuple[dict[str, MetaValue], str]:
+    if not markdown.startswith(FENCE):
+        return {}, markdown
+    first_end = markdown.find('\n')
+    if first_end < 0 or markdown[:first_end].rstrip() != FENCE:
+        return {}, markdown
+
+    m = _FENCE_LINE.search(markdown, first_end + 1, first_end + 1 + MAX_FRONT_MATTER_BYTES)
+    if m is None:
+        return {}, markdown
+    meta = parse_front_matter(markdown[first_end + 1:m.start()])
+    return meta, markdown[m.end() + 1:]
+
+# A title in the front matter wins over the heading
+def page_title(meta: dict[str, MetaValue], markdown: str) -> str:
+    title = meta.get('title')
+    if isinstance(title, str) and title != '':
+        return title
+    return extract_title(markdown)
+
+# The front matter with the title filled in, for the page's manifest
+# entry, see listings.py
+def page_metadata(markdown: str) -> dict[str, MetaValue]:
+    meta, body = split_front_matter(markdown)
+    if not isinstance(meta.get('title'), str) or meta['title'] == '':
+        title = find_title(body)
+        if title is not None:
+            meta['title'] = title
+    return meta
+
+# The page's title and front matter without rendering it: front matter
+# first, then the first heading, as extract_title() finds it, if the front
+# matter has no title. Only the pages of the file up to those are read.
+def read_metadata(path: str) -> dict[str, MetaValue]:
+    with open(path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return {}
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            meta = {}
+            start = 0
+            first_end = mm.find(b'\n', 0, MAX_FRONT_MATTER_BYTES)
+            if first_end >= 0 and mm[:first_end].rstrip() == FENCE.encode():
+                m = _FENCE_LINE_BYTES.search(mm, first_end + 1, first_end + 1 + MAX_FRONT_MATTER_BYTES)
+                if m is not None:
+                    meta = parse_front_matter(mm[first_end + 1:m.start()].decode())
+                    start = m.end() + 1
+
+            if 'title' not in meta:
+                title = _find_heading(mm, start)
+                if title is not None:
+                    meta['title'] = title
+            return meta
+
+def _find_heading(mm: mmap.mmap, start: int) -> Optional[str]:
+    for m in _HEADING_LINE_BYTES.finditer(mm, start):
+        title = find_title(m.group(0).decode(errors='replace'))
+        if title is not None:
+            return title
+    return None
@@ -1,9 +1,62 @@
 import re
 from enum import Enum
+from typing import Iterator, Optional
 
 from textnode import TextNode, TextType
-from htmlnode import HtmlNode, ParentNode, LeafNode
-
+from htmlnode import HtmlNode, ParentNode, LeafNode, FragmentNode, minify_enabled
+from fragcache import FragmentCache, MIN_BLOCK_CHARS
+from assets import AssetInfo, index_digest
+from depgraph import ASSET_DEP, PAGE_DEP, TEMPLATE_DEP, PAGE_EXTENSIONS
+from profiler import stage
+
+_asset_index: Optional[dict[str, AssetInfo]] = None
+_asset_digest = ''
+_image_attrs = False
+
+# Points links and images at the hashed urls of the assets in the index
+# (or stops with None). With image_attrs, <img> tags also get the size of
+# the image and load lazily.
+def set_asset_index(assets: Optional[dict[str, AssetInfo]], image_attrs: bool = False):
+    global _asset_index, _asset_digest, _image_attrs
+    _asset_index = assets
+    _asset_digest = index_digest(assets) if assets is not None else ''
+    _image_attrs = image_attrs
+
+def get_asset_index() -> Optional[dict[str, AssetInfo]]:
+    return _asset_index
+
+def asset_url(url: str) -> str:
+    if _asset_index is None:
+        return url
+    info = _asset_index.get(url)
+    return url if info is None else info.url
+
+# What pages embedding or linking url depend on: its hashed url and size,
+# None when it isn't in the index
+def asset_state(url: str) -> Optional[str]:
+    info = _asset_index.get(url) if _asset_index is not None else None
+    if info is None:
+        return None
+    return f'{info.url} {info.width}x{info.height}'
+
+# {asset dependency: state} for every indexed asset, see depgraph.py
+def asset_states() -> dict[str, str]:
+    if _asset_index is None:
+        return {}
+    return {ASSET_DEP + url: asset_state(url) for url in _asset_index}
+
+def image_props(url: str, alt: str) -> dict[str, str]:
+    props = {'src': asset_url(url), 'alt': alt}
+    if not _image_attrs:
+        return props
+
+    info = _asset_index.get(url) if _asset_index is not None else None
+    if info is not None and info.width is not None:
+        props['width'] = str(info.width)
+        props['height'] = str(info.height)
+    props['loading'] = 'lazy'
+    props['decoding'] = 'async'
+    return props
 
 def text_node_to_html_node(text_node: TextNode) -> HtmlNode:
     match text_node.text_type:
@@ -20,10 +73,10 @@ def text_node_to_html_node(text_node: TextNode) -> HtmlNode:
             return LeafNode(tag='code', value=text_node.text)
         
         case TextType.LINK:
-            return LeafNode(tag='a', value=text_node.text, props={'href': text_node.url})
+            return LeafNode(tag='a', value=text_node.text, props={'href': asset_url(text_node.url)})
 
         case TextType.IMAGE:
-            return LeafNode(tag='img', value='', props={'src': text_node.url, 'alt': text_node.text})
+            return LeafNode(tag='img', value='', props=image_props(text_node.url, text_node.text))
 
         case _:
             raise Exception(f'unsupported type: {text_node.text_type.value}')
@@ -57,16 +110,57 @@ def split_nodes_delimiter(old_nodes: list[TextNode], delimiter: str, text_type:
 
     return new_nodes
 
+_IMAGE_PATTERN = re.compile(r'!\[([^\n\[\]]*)\]\(([^\n\(\)]*)\)')
+# the lookbehind comes after the [ so the regex engine can skip ahead to
+# the next [ instead of trying every position
+_LINK_PATTERN = re.compile(r'\[(?<!!\[)([^\n\[\]]*)\]\(([^\n\(\)]*)\)')
+
 def extract_markdown_images(text: str) -> list[tuple[str,str]]:
-    pattern = r'!\[([^\n\[\]]*)\]\(([^\n\(\)]*)\)'
-    matches = re.findall(pattern, text)
+    matches = _IMAGE_PATTERN.findall(text)
     return matches
 
 def extract_markdown_links(text: str) -> list[tuple[str,str]]:
-    pattern = r'(?<!\!)\[([^\n\[\]]*)\]\(([^\n\(\)]*)\)'
-    matches = re.findall(pattern, text)
+    matches = _LINK_PATTERN.findall(text)
     return matches
 
+# Only site-absolute urls are dependencies, relative ones are left as
+# written by the renderer too. Fragments and queries are dropped.
+def _local_path(url: str) -> Optional[str]:
+    if not url.startswith('/') or url.startswith('//'):
+        return None
+    return url.split('#', 1)[0].split('?', 1)[0]
+
+# The dependency a link to url makes, None for links elsewhere. Pages link
+# the same urls over and over, so the answers are kept.
+_link_deps: dict[str, Optional[str]] = {}
+
+def _link_dependency(url: str) -> Optional[str]:
+    if url in _link_deps:
+        return _link_deps[url]
+
+    path = _local_path(url)
+    dep = None
+    if path is not None:
+        name = path.rsplit('/', 1)[-1]
+        ext = name[name.rfind('.'):].lower() if '.' in name else ''
+        dep = (PAGE_DEP if ext in PAGE_EXTENSIONS else ASSET_DEP) + path
+    _link_deps[url] = dep
+    return dep
+
+# The dependencies of a page, in the order they first appear
+def page_dependencies(markdown: str, template_path: str) -> list[str]:
+    deps = {TEMPLATE_DEP + template_path: None}
+    for _, url in extract_markdown_images(markdown):
+        path = _local_path(url)
+        if path is not None:
+            deps[ASSET_DEP + path] = None
+
+    for _, url in extract_markdown_links(markdown):
+        dep = _link_dependency(url)
+        if dep is not None:
+            deps[dep] = None
+    return list(deps)
+
 def split_nodes_image(old_nodes: list[TextNode]) -> list[TextNode]:
     new_nodes = []
 
@@ -138,6 +232,86 @@ def text_to_textnodes(text: str) -> list[TextNode]:
 
     return nodes
 
+_SCAN_PLAIN = re.compile(r'\*\*|_|`')
+_SCAN_ITALIC_END = re.compile(r'_|\*\*')
+_SCAN_CODE_END = re.compile(r'`|_|\*\*')
+
+# Single left to right pass producing the same nodes as text_to_textnodes.
+#
+# The chained passes give bold precedence over italic over code over
+# images over links, so:
+#   - inside ** everything is literal up to the closing **
+#   - inside _ everything but ** is literal, hitting ** first is unbalanced
+#   - inside ` both _ and ** would have split the span first, so are unbalanced
+#   - images and links are only looked for in the plain runs between spans
+def text_to_textnodes_scan(text: str) -> list[TextNode]:
+    if text == '':
+        raise Exception('how did a text node w/o text get through?')
+
+    nodes = []
+    ii = 0
+    while ii < len(text):
+        m = _SCAN_PLAIN.search(text, ii)
+        end = m.start() if m else len(text)
+        _scan_plain_run(text, ii, end, nodes)
+        if m is None:
+            break
+
+        delimiter = m.group()
+        ii = m.end()
+        if delimiter == '**':
+            close = text.find('**', ii)
+            if close == -1:
+                raise Exception(f'unbalanced "**": {text}')
+            nodes.append(TextNode(text[ii:close], TextType.BOLD))
+            ii = close + 2
+            continue
+
+        if delimiter == '_':
+            close = _SCAN_ITALIC_END.search(text, ii)
+            text_type = TextType.ITALIC
+        else:
+            close = _SCAN_CODE_END.search(text, ii)
+            text_type = TextType.CODE
+
+        if close is None or close.group() != delimiter:
+            raise Exception(f'unbalanced "{delimiter}": {text}')
+        nodes.append(TextNode(text[ii:close.start()], text_type))
+        ii = close.end()
+
+    return nodes
+
+def _scan_plain_run(text: str, start: int, end: int, nodes: list[TextNode]):
+    pos = start
+    for m in _IMAGE_PATTERN.finditer(text, start, end):
+        _scan_links(text, pos, m.start(), nodes)
+        nodes.append(TextNode(m.group(1), TextType.IMAGE, m.group(2)))
+        pos = m.end()
+    _scan_links(text, pos, end, nodes)
+
+def _scan_links(text: str, start: int, end: int, nodes: list[TextNode]):
+    pos = start
+    for m in _LINK_PATTERN.finditer(text, start, end):
+        # split_nodes_link keeps the text before a link even when it is empty
+        nodes.append(TextNode(text[pos:m.start()], TextType.TEXT))
+        nodes.append(TextNode(m.group(1), TextType.LINK, m.group(2)))
+        pos = m.end()
+    if pos < end:
+        nodes.append(TextNode(text[pos:end], TextType.TEXT))
+
+INLINE_TOKENIZERS = {
+    'split': text_to_textnodes,
+    'scan': text_to_textnodes_scan,
+}
+_inline_tokenizer = text_to_textnodes_scan
+
+# Picks the inline tokenizer used when building html nodes, see INLINE_TOKENIZERS
+def set_inline_tokenizer(name: str):
+    global _inline_tokenizer
+    if name not in INLINE_TOKENIZERS:
+        raise ValueError(f'unknown inline tokenizer: {name}')
+    _inline_tokenizer = INLINE_TOKENIZERS[name]
+
 def markdown_to_blocks(text: str) -> list[str]:
     blocks = []
     split_blocks = text.split('\n\n')
@@ -194,11 +368,16 @@ def match_ordered_list_block(block: str) -> bool:
             return False
     return True
 
-def markdown_to_html_node(markdown: str) -> HtmlNode:
-    blocks = markdown_to_blocks(markdown)
+# The original block pipeline: split on blank lines, then classify and
+# build each block from its text. Kept for differential tests and
+# benchmarks, it splits fenced code that contains blank lines.
+def markdown_to_html_node_split(markdown: str) -> HtmlNode:
+    with stage('blocks'):
+        blocks = markdown_to_blocks(markdown)
     nodes = []
     for block in blocks:
-        block_type = block_to_block_type(block)
+        with stage('block_type'):
+            block_type = block_to_block_type(block)
         if block_type == BlockType.PARAGRAPH:
             node = paragraph_to_node(block)
         elif block_type == BlockType.HEADING:
@@ -216,8 +395,192 @@ def markdown_to_html_node(markdown: str) -> HtmlNode:
 
     return ParentNode('div', nodes)
 
+_HEADING_RE = re.compile(r'(?<!#)#{1,6} \w+')
+_CODE_RE = re.compile(r'^```[^`].*[^`]```$', re.DOTALL)
+
+# A fence opener is ``` plus an optional info string without backticks
+def _opens_fence(line: str) -> bool:
+    return line.startswith('```') and '`' not in line[3:]
+
+# Splits markdown into blocks in one pass over its lines, yielding each
+# block's type and lines as soon as the block ends.
+#
+# Blocks are what markdown_to_blocks would return (separated by empty
+# lines, surrounding whitespace stripped), except that an opening ``` fence
+# runs to its closing ``` even across empty lines.
+def scan_blocks(markdown: str) -> Iterator[tuple[BlockType, list[str]]]:
+    lines = markdown.split('\n')
+    n = len(lines)
+    # once a look ahead finds no closing fence, none can exist further on
+    fences_can_close = True
+    ii = 0
+    while ii < n:
+        if lines[ii] == '':
+            ii += 1
+            continue
+
+        block = []
+        fence_end = -1
+        while ii < n and (lines[ii] != '' or ii <= fence_end):
+            line = lines[ii]
+            ii += 1
+            if len(block) == 0:
+                # leading whitespace is stripped, as in markdown_to_blocks
+                line = line.lstrip()
+                if line == '':
+                    continue
+                if fences_can_close and _opens_fence(line):
+                    fence_end = _find_fence_close(lines, ii)
+                    fences_can_close = fence_end != -1
+            block.append(line)
+
+        while len(block) > 0 and block[-1].strip() == '':
+            block.pop()
+        if len(block) == 0:
+            continue
+        block[-1] = block[-1].rstrip()
+
+        yield _classify_lines(block), block
+
+def _find_fence_close(lines: list[str], start: int) -> int:
+    for jj in range(start, len(lines)):
+        if lines[jj].rstrip().endswith('```'):
+            return jj
+    return -1
+
+# Same answer as block_to_block_type on '\n'.join(lines), checking every
+# line kind in a single loop
+def _classify_lines(lines: list[str]) -> BlockType:
+    first = lines[0]
+    if _HEADING_RE.match(first):
+        return BlockType.HEADING
+    if first.startswith('```') and _CODE_RE.match('\n'.join(lines)):
+        return BlockType.CODE
+
+    is_quote = True
+    is_unordered = True
+    is_ordered = True
+    for ii, line in enumerate(lines):
+        if is_quote and not line.startswith('>'):
+            is_quote = False
+        if is_unordered and not line.startswith('- '):
+            is_unordered = False
+        if is_ordered and not line.startswith(f'{ii+1}. '):
+            is_ordered = False
+        if not (is_quote or is_unordered or is_ordered):
+            return BlockType.PARAGRAPH
+
+    if is_quote:
+        return BlockType.QUOTE
+    if is_unordered:
+        return BlockType.UNORDERED_LIST
+    return BlockType.ORDERED_LIST
+
+# Builds a block's node from the lines scan_blocks already split
+def block_lines_to_node(block_type: BlockType, lines: list[str]) -> HtmlNode:
+    if block_type == BlockType.PARAGRAPH:
+        return ParentNode('p', text_to_children('\n'.join(lines)))
+
+    if block_type == BlockType.HEADING:
+        first = lines[0]
+        level = len(first) - len(first.lstrip('#'))
+        text = '\n'.join([first[level:]] + lines[1:]).strip()
+        return ParentNode(f'h{level}', text_to_children(text))
+
+    if block_type == BlockType.CODE:
+        cleaned = '\n'.join(lines).removeprefix('```').removesuffix('```').lstrip()
+        return ParentNode('pre', [LeafNode('code', cleaned)])
+
+    if block_type == BlockType.QUOTE:
+        text = '\n'.join(line.removeprefix('>').removeprefix(' ') for line in lines)
+        return ParentNode('blockquote', text_to_children(text))
+
+    if block_type == BlockType.UNORDERED_LIST:
+        items = [ParentNode('li', text_to_children(line[2:].rstrip())) for line in lines]
+        return ParentNode('ul', items)
+
+    items = [ParentNode('li', text_to_children(line.split(' ', maxsplit=1)[1].rstrip())) for line in lines]
+    return ParentNode('ol', items)
+
+# Bump whenever the html produced for a block changes, it keys the
+# fragment cache
+RENDERER_VERSION = '1'
+
+# Everything other than the markdown and the assets it uses that the body
+# html depends on, see RENDERER_VERSION. The block parsers disagree on
+# fences spanning blank lines.
+def render_version() -> str:
+    parts = [RENDERER_VERSION, _block_parser_name]
+    if minify_enabled():
+        parts.append('min')
+    if _image_attrs:
+        parts.append('img')
+    return '-'.join(parts)
+
+# The fragment cache keys blocks by their text alone, so its entries also
+# depend on the url and size of every asset. Pages only depend on the
+# assets they use, see depgraph.py.
+def fragment_version() -> str:
+    if _asset_index is None:
+        return render_version()
+    return f'{render_version()}-assets{_asset_digest[:16]}'
+
+_fragment_cache: Optional[FragmentCache] = None
+
+# Turns block level memoization on (or off with None)
+def set_fragment_cache(cache: Optional[FragmentCache]):
+    global _fragment_cache
+    _fragment_cache = cache
+
+def get_fragment_cache() -> Optional[FragmentCache]:
+    return _fragment_cache
+
+def markdown_to_html_node_scan(markdown: str) -> HtmlNode:
+    with stage('blocks'):
+        blocks = list(scan_blocks(markdown))
+
+    cache = _fragment_cache
+    if cache is None:
+        nodes = [block_lines_to_node(block_type, lines) for block_type, lines in blocks]
+        return ParentNode('div', nodes)
+
+    nodes = []
+    for block_type, lines in blocks:
+        text = '\n'.join(lines)
+        if len(text) < MIN_BLOCK_CHARS:
+            nodes.append(block_lines_to_node(block_type, lines))
+            continue
+
+        key = cache.key(text)
+        html = cache.get(key)
+        if html is None:
+            html = block_lines_to_node(block_type, lines).to_html()
+            cache.put(key, html)
+        nodes.append(FragmentNode(html))
+
+    return ParentNode('div', nodes)
+
+BLOCK_PARSERS = {
+    'split': markdown_to_html_node_split,
+    'scan': markdown_to_html_node_scan,
+}
+_block_parser = markdown_to_html_node_scan
+_block_parser_name = 'scan'
+
+# Picks the block parser used by markdown_to_html_node, see BLOCK_PARSERS
+def set_block_parser(name: str):
+    global _block_parser, _block_parser_name
+    if name not in BLOCK_PARSERS:
+        raise ValueError(f'unknown block parser: {name}')
+    _block_parser = BLOCK_PARSERS[name]
+    _block_parser_name = name
+
+def markdown_to_html_node(markdown: str) -> HtmlNode:
+    return _block_parser(markdown)
+
 def text_to_children(text: str) -> list[HtmlNode]:
-    text_nodes = text_to_textnodes(text)
+    with stage('inline'):
+        text_nodes = _inline_tokenizer(text)
     html_nodes = []
     for text_node in text_nodes:
         html_node = text_node_to_html_node(text_node)
@@ -270,10 +633,18 @@ def ordered_to_node(block: str) -> HtmlNode:
 
     return ParentNode('ol', nodes)
 
+_TITLE_PATTERN = re.compile(r'^# (\w.*)', re.M)
+
+# The first h1 heading, None if there is none. Searches the text as a whole
+# instead of splitting every line out of it first.
+def find_title(markdown: str) -> Optional[str]:
+    m = _TITLE_PATTERN.search(markdown)
+    if m is None:
+        return None
+    return m.group(1).strip()
+
 def extract_title(markdown: str) -> str:
-    for line in markdown.splitlines():
-        m = re.match(r'# (\w.*)', line)
-        if m:
-            return m.groups()[0].strip()
-        
-    raise Exception('could not find h1 header!')
\ No newline at end of file
+    title = find_title(markdown)
+    if title is None:
+        raise Exception('could not find h1 header!')
+    return title
\ No newline at end of file
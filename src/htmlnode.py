@@ -1,7 +1,39 @@
-from typing import Self, Any, Optional
+from typing import Self, Any, Optional, Protocol
 import io
 
+from minify import quote_attr
+
+# Anything html can be streamed into: files, io.StringIO, sys.stdout...
+class Sink(Protocol):
+    def write(self, s: str, /) -> Any: ...
+
+_minify = False
+
+# Minified output drops attribute quotes where html doesn't need them
+def set_minify(on: bool):
+    global _minify
+    _minify = on
+
+def minify_enabled() -> bool:
+    return _minify
+
+# Nodes use __slots__, documents allocate one per inline span and a
+# per-instance __dict__ would be most of their size. Each class only has
+# slots for the fields it uses, the others read as the None below and
+# can't be assigned.
 class HtmlNode:
+    __slots__ = ()
+    tag: Optional[str] = None
+    value: Optional[str] = None
+    children: Optional[list['HtmlNode']] = None
+    props: Optional[dict[str, str]] = None
+
+    # HtmlNode(...) itself makes a node with all four fields
+    def __new__(cls, *args, **kwargs):
+        if cls is HtmlNode:
+            cls = _FullHtmlNode
+        return object.__new__(cls)
+
     def __init__(self, 
                 tag: Optional[str] = None,
                 value: Optional[str] = None,
@@ -16,22 +48,39 @@ class HtmlNode:
     def to_html(self) -> str:
         raise NotImplementedError()
 
+    # Writes the html for this node straight into sink, without building
+    # the string for the whole subtree first
+    def write_html(self, sink: Sink):
+        raise NotImplementedError()
+
     def props_to_html(self) -> str:
         if self.props is None:
             return ''
 
         s = ''
         for k,v in self.props.items():
-            s += f' {k}="{v}"'
+            if _minify:
+                s += f' {k}={quote_attr(v)}'
+            else:
+                s += f' {k}="{v}"'
         return s
 
     def __repr__(self) -> str:
         return f'HtmlNode(tag={self.tag}, value={self.value}, children={self.children}, props={self.props})'
 
 
+class _FullHtmlNode(HtmlNode):
+    __slots__ = ('tag', 'value', 'children', 'props')
+
+
 class LeafNode(HtmlNode):
+    __slots__ = ('tag', 'value', 'props')
+
     def __init__(self, tag: Optional[str], value: str, props: Optional[dict[str, str]]=None):
-        super().__init__(tag, value, None, props)
+        # set directly, this is the hottest constructor in a build
+        self.tag = tag
+        self.value = value
+        self.props = props
 
 
     def to_html(self) -> str:
@@ -51,23 +100,59 @@ class LeafNode(HtmlNode):
         
         return f'<{self.tag}{self.props_to_html()}>{self.value}</{self.tag}>'
 
+    def write_html(self, sink: Sink):
+        if self.value is None:
+            raise ValueError('value is None')
+
+        if self.tag == None:
+            sink.write(self.value)
+        elif self.tag == 'img':
+            sink.write(f'<img{self.props_to_html()}>')
+        else:
+            sink.write(f'<{self.tag}{self.props_to_html()}>')
+            sink.write(self.value)
+            sink.write(f'</{self.tag}>')
+
 
 class ParentNode(HtmlNode):
+    __slots__ = ('tag', 'children', 'props')
+
     def __init__(self, tag: str, children: list[HtmlNode], props: Optional[dict[str,str]]=None):
-        super().__init__(tag, None, children, props)
+        self.tag = tag
+        self.children = children
+        self.props = props
 
     def to_html(self) -> str:
+        # one buffer for the whole subtree instead of one per nesting level
+        builder = io.StringIO()
+        self.write_html(builder)
+        return builder.getvalue()
+
+    def write_html(self, sink: Sink):
         if self.tag is None:
             raise ValueError('missing tag!')
         
         if self.children is None:
             raise ValueError('missing children!')
         
-        builder = io.StringIO()
-        builder.write(f'<{self.tag}{self.props_to_html()}>')
+        sink.write(f'<{self.tag}{self.props_to_html()}>')
 
         for child in self.children:
-            builder.write(child.to_html())
+            child.write_html(sink)
+
+        sink.write(f'</{self.tag}>')
+
+
+# Html that was already rendered, e.g. a block from the fragment cache.
+# Written out as-is.
+class FragmentNode(HtmlNode):
+    __slots__ = ('value',)
+
+    def __init__(self, html: str):
+        self.value = html
+
+    def to_html(self) -> str:
+        return self.value
 
-        builder.write(f'</{self.tag}>')
-        return builder.getvalue()
\ No newline at end of file
+    def write_html(self, sink: Sink):
+        sink.write(self.value)
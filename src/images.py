@@ -0,0 +1,52 @@
+import os
+import struct
+from typing import Optional
+
+# Image sizes read from PNG and JPEG headers, for the width and height of
+# <img> tags. See assets.py for where they are cached.
+
+IMAGE_EXTENSIONS = {'.png', '.jpg', '.jpeg'}
+
+_PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+# start of frame markers, the ones between are DHT, JPG and DAC
+_JPEG_SOF = {0xc0, 0xc1, 0xc2, 0xc3, 0xc5, 0xc6, 0xc7, 0xc9, 0xca, 0xcb, 0xcd, 0xce, 0xcf}
+
+
+def _png_size(f) -> Optional[tuple[int, int]]:
+    header = f.read(24)
+    if len(header) < 24 or not header.startswith(_PNG_SIGNATURE) or header[12:16] != b'IHDR':
+        return None
+    return struct.unpack('>II', header[16:24])
+
+def _jpeg_size(f) -> Optional[tuple[int, int]]:
+    if f.read(2) != b'\xff\xd8':
+        return None
+    while True:
+        marker = f.read(2)
+        if len(marker) < 2 or marker[0] != 0xff:
+            return None
+        if marker[1] == 0xff:
+            # fill byte, the marker starts one byte later
+            f.seek(-1, os.SEEK_CUR)
+            continue
+        if marker[1] in (0x01, 0xd8) or 0xd0 <= marker[1] <= 0xd7:
+            # markers without a length
+            continue
+
+        length = f.read(2)
+        if len(length) < 2:
+            return None
+        if marker[1] in _JPEG_SOF:
+            frame = f.read(5)
+            if len(frame) < 5:
+                return None
+            height, width = struct.unpack('>HH', frame[1:5])
+            return width, height
+        f.seek(struct.unpack('>H', length)[0] - 2, os.SEEK_CUR)
+
+# Reads (width, height) from a PNG or JPEG header, None for anything else
+def read_image_size(path: str) -> Optional[tuple[int, int]]:
+    with open(path, 'rb') as f:
+        if path.lower().endswith('.png'):
+            return _png_size(f)
+        return _jpeg_size(f)
@@ -0,0 +1,264 @@
+import hashlib
+import html
+import os
+import os.path
+import re
+from datetime import datetime, timezone
+from typing import Callable, Optional
+
+from frontmatter import read_metadata
+from manifest import BuildManifest, GENERATED, PAGES
+from template import Template
+
+# Site indexes made from the metadata every page records in its manifest
+# entry when it is rendered (front matter, title and source mtime), so
+# none of them reads or renders a page again:
+#
+#   sitemap.xml                   every page, split past 50,000 urls
+#   feed.xml                      Atom feed of the newest posts
+#   blog/, blog/page/2/, ...      the posts, newest first
+#   tags/<tag>/, ...              the posts with each tag
+#
+# Every output is streamed into a temp file while it is hashed, and only
+# replaces the old file when the hash changed. They are GENERATED entries
+# in the manifest, so ones that are no longer made get pruned.
+
+SITEMAP_NAME = 'sitemap.xml'
+FEED_NAME = 'feed.xml'
+SITEMAP_MAX_URLS = 50000
+FEED_ENTRIES = 20
+DEFAULT_PER_PAGE = 10
+POSTS_PREFIX = '/blog/'
+TAGS_PREFIX = '/tags/'
+
+
+class ListedPage:
+    __slots__ = ('src', 'url', 'title', 'updated', 'tags', 'summary')
+
+    def __init__(self, src: str, url: str, title: str, updated: str, tags: list[str],
+                 summary: Optional[str] = None):
+        self.src = src
+        self.url = url
+        self.title = title
+        # RFC 3339, e.g. 2024-03-01T00:00:00Z
+        self.updated = updated
+        self.tags = tags
+        self.summary = summary
+
+    def __repr__(self) -> str:
+        return f'ListedPage({self.url}, {self.title!r}, {self.updated})'
+
+
+# The url a page is served at: public/blog/tom/index.html -> /blog/tom/
+def page_url(dest: str, build_dir: str) -> str:
+    url = '/' + os.path.relpath(dest, build_dir).replace(os.sep, '/')
+    return url.removesuffix('index.html')
+
+def url_dest(url: str, build_dir: str) -> str:
+    rel = url.lstrip('/')
+    if rel == '' or rel.endswith('/'):
+        rel += 'index.html'
+    return os.path.join(build_dir, rel.replace('/', os.sep))
+
+def tag_slug(tag: str) -> str:
+    return re.sub(r'[^a-z0-9]+', '-', tag.lower()).strip('-') or 'tag'
+
+def _timestamp(meta: dict, mtime: float) -> str:
+    date = meta.get('updated') or meta.get('date')
+    if isinstance(date, str) and re.fullmatch(r'\d{4}-\d{2}-\d{2}', date):
+        return f'{date}T00:00:00Z'
+    if isinstance(date, str) and re.fullmatch(r'\d{4}-\d{2}-\d{2}T[0-9:.]+(Z|[+-]\d{2}:\d{2})', date):
+        return date
+    return datetime.fromtimestamp(mtime, timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')
+
+# Every page in the manifest, drafts left out, sorted by url. Pages
+# recorded before their metadata was get it from the metadata-only read
+# now, see frontmatter.py.
+def listed_pages(manifest: BuildManifest, build_dir: str) -> list[ListedPage]:
+    pages = []
+    for src, entry in manifest.entries[PAGES].items():
+        if 'meta' not in entry:
+            try:
+                entry['meta'] = read_metadata(src)
+                entry['mtime'] = os.stat(src).st_mtime
+            except (OSError, ValueError):
+                continue
+        meta = entry['meta']
+        if meta.get('draft') == 'true':
+            continue
+        tags = meta.get('tags', [])
+        if isinstance(tags, str):
+            tags = [tags]
+        summary = meta.get('summary')
+        pages.append(ListedPage(src, page_url(entry['dest'], build_dir), meta.get('title') or src,
+                                _timestamp(meta, entry.get('mtime', 0)), tags,
+                                summary if isinstance(summary, str) else None))
+    pages.sort(key=lambda page: page.url)
+    return pages
+
+def newest_first(pages: list[ListedPage]) -> list[ListedPage]:
+    return sorted(pages, key=lambda page: (page.updated, page.url), reverse=True)
+
+
+class _HashingWriter:
+    def __init__(self, f, h):
+        self.f = f
+        self.h = h
+
+    def write(self, text: str):
+        self.f.write(text)
+        self.h.update(text.encode())
+
+# Streams an output through write(sink) into a temp file, and renames it
+# over dest unless it is the same as last build. key names the output in
+# the manifest. Returns True if dest was replaced.
+def write_output(manifest: BuildManifest, key: str, dest: str, write: Callable) -> bool:
+    os.makedirs(os.path.split(dest)[0], exist_ok=True)
+    tmp_path = f'{dest}.{os.getpid()}.tmp'
+    h = hashlib.sha256()
+    try:
+        with open(tmp_path, 'wt') as f:
+            write(_HashingWriter(f, h))
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+
+    digest = h.hexdigest()
+    if manifest.is_current(GENERATED, key, digest, dest):
+        os.remove(tmp_path)
+        return False
+    os.replace(tmp_path, dest)
+    manifest.record(GENERATED, key, digest, dest)
+    print(f'LOG: wrote {dest}')
+    return True
+
+def _xml(text: str) -> str:
+    return html.escape(text, quote=True)
+
+def _write_urlset(sink, site_url: str, pages: list[ListedPage]):
+    sink.write('<?xml version="1.0" encoding="UTF-8"?>\n'
+               '<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">\n')
+    for page in pages:
+        sink.write(f'<url><loc>{_xml(site_url + page.url)}</loc><lastmod>{page.updated[:10]}</lastmod></url>\n')
+    sink.write('</urlset>\n')
+
+# sitemap.xml, or with more pages than one sitemap may hold, sitemap.xml as
+# an index of sitemap-1.xml, sitemap-2.xml, ...
+def write_sitemap(manifest: BuildManifest, build_dir: str, site_url: str, pages: list[ListedPage],
+                  max_urls: int = SITEMAP_MAX_URLS) -> int:
+    written = 0
+    if len(pages) <= max_urls:
+        written += write_output(manifest, SITEMAP_NAME, os.path.join(build_dir, SITEMAP_NAME),
+                                lambda sink: _write_urlset(sink, site_url, pages))
+        return written
+
+    parts = [pages[i:i + max_urls] for i in range(0, len(pages), max_urls)]
+    for number, part in enumerate(parts, 1):
+        name = f'sitemap-{number}.xml'
+        written += write_output(manifest, name, os.path.join(build_dir, name),
+                                lambda sink, part=part: _write_urlset(sink, site_url, part))
+
+    def write_index(sink):
+        sink.write('<?xml version="1.0" encoding="UTF-8"?>\n'
+                   '<sitemapindex xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">\n')
+        for number, part in enumerate(parts, 1):
+            newest = max(page.updated for page in part)
+            sink.write(f'<sitemap><loc>{_xml(site_url)}/sitemap-{number}.xml</loc>'
+                       f'<lastmod>{newest[:10]}</lastmod></sitemap>\n')
+        sink.write('</sitemapindex>\n')
+
+    written += write_output(manifest, SITEMAP_NAME, os.path.join(build_dir, SITEMAP_NAME), write_index)
+    return written
+
+# Atom feed of the newest posts
+def write_feed(manifest: BuildManifest, build_dir: str, site_url: str, site_title: str,
+               posts: list[ListedPage], entries: int = FEED_ENTRIES) -> int:
+    newest = newest_first(posts)[:entries]
+
+    def write(sink):
+        updated = newest[0].updated if len(newest) > 0 else '1970-01-01T00:00:00Z'
+        sink.write('<?xml version="1.0" encoding="utf-8"?>\n'
+                   '<feed xmlns="http://www.w3.org/2005/Atom">\n'
+                   f'<title>{_xml(site_title)}</title>\n'
+                   f'<link href="{_xml(site_url)}/{FEED_NAME}" rel="self"/>\n'
+                   f'<link href="{_xml(site_url)}/"/>\n'
+                   f'<id>{_xml(site_url)}/</id>\n'
+                   f'<updated>{updated}</updated>\n'
+                   f'<author><name>{_xml(site_title)}</name></author>\n')
+        for post in newest:
+            url = _xml(site_url + post.url)
+            sink.write(f'<entry><title>{_xml(post.title)}</title><link href="{url}"/>'
+                       f'<id>{url}</id><updated>{post.updated}</updated>')
+            if post.summary is not None:
+                sink.write(f'<summary>{_xml(post.summary)}</summary>')
+            sink.write('</entry>\n')
+        sink.write('</feed>\n')
+
+    return write_output(manifest, FEED_NAME, os.path.join(build_dir, FEED_NAME), write)
+
+def _write_listing(sink, template: Template, title: str, posts: list[ListedPage],
+                   older: Optional[str], newer: Optional[str]):
+    parts = [f'<h1>{html.escape(title)}</h1><ul>']
+    for post in posts:
+        parts.append(f'<li><a href="{html.escape(post.url)}">{html.escape(post.title)}</a> '
+                     f'<time datetime="{post.updated}">{post.updated[:10]}</time></li>')
+    parts.append('</ul>')
+    if newer is not None or older is not None:
+        parts.append('<nav>')
+        if newer is not None:
+            parts.append(f'<a href="{newer}" rel="prev">Newer</a>')
+        if older is not None:
+            parts.append(f'<a href="{older}" rel="next">Older</a>')
+        parts.append('</nav>')
+    template.write(sink, {'Title': html.escape(title), 'Content': ''.join(parts)})
+
+# Paginated listing of posts under base_url: base_url, base_url/page/2/, ...
+# Pages whose url a content page already has are left to that page.
+def write_listing(manifest: BuildManifest, build_dir: str, template: Template, base_url: str, title: str,
+                  posts: list[ListedPage], taken: set[str], per_page: int = DEFAULT_PER_PAGE) -> int:
+    posts = newest_first(posts)
+    chunks = [posts[i:i + per_page] for i in range(0, len(posts), per_page)] or [[]]
+    urls = [base_url] + [f'{base_url}page/{number}/' for number in range(2, len(chunks) + 1)]
+
+    written = 0
+    for index, chunk in enumerate(chunks):
+        if urls[index] in taken:
+            print(f'LOG: {urls[index]} is a content page, not listing it')
+            continue
+        older = urls[index + 1] if index + 1 < len(urls) else None
+        newer = urls[index - 1] if index > 0 else None
+        page_title = title if index == 0 else f'{title} (page {index + 1})'
+        written += write_output(manifest, f'listing:{urls[index]}', url_dest(urls[index], build_dir),
+                                lambda sink, t=page_title, c=chunk, o=older, n=newer:
+                                _write_listing(sink, template, t, c, o, n))
+    return written
+
+# Writes every index, returns how many outputs changed. sitemap.xml and
+# the feed need site_url for their absolute links and are left out
+# without it. The caller prunes the GENERATED outputs not made this time,
+# e.g. the listing of a tag no post has any more.
+def write_indexes(manifest: BuildManifest, build_dir: str, template: Template, site_url: Optional[str],
+                  listings: bool, per_page: int = DEFAULT_PER_PAGE) -> int:
+    written = 0
+    if site_url is not None or listings:
+        pages = listed_pages(manifest, build_dir)
+        posts = [page for page in pages if page.url.startswith(POSTS_PREFIX) and page.url != POSTS_PREFIX]
+
+        if site_url is not None:
+            site_url = site_url.rstrip('/')
+            home = next((page for page in pages if page.url == '/'), None)
+            written += write_sitemap(manifest, build_dir, site_url, pages)
+            written += write_feed(manifest, build_dir, site_url, home.title if home is not None else site_url, posts)
+
+        if listings:
+            taken = {page_url(entry['dest'], build_dir) for entry in manifest.entries[PAGES].values()}
+            written += write_listing(manifest, build_dir, template, POSTS_PREFIX, 'Posts', posts, taken, per_page)
+            tags: dict[str, tuple[str, list[ListedPage]]] = {}
+            for post in posts:
+                for tag in post.tags:
+                    tags.setdefault(tag_slug(tag), (tag, []))[1].append(post)
+            for slug, (tag, tagged) in sorted(tags.items()):
+                written += write_listing(manifest, build_dir, template, f'{TAGS_PREFIX}{slug}/',
+                                         f'Tagged {tag}', tagged, taken, per_page)
+
+    return written
@@ -1,79 +1,755 @@
+import argparse
+import io
 import os
 import os.path
 import shutil
+import subprocess
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Iterator, Optional
 
-from functions import markdown_to_html_node, extract_title
+from functions import (
+    markdown_to_html_node,
+    set_inline_tokenizer,
+    set_block_parser,
+    set_fragment_cache,
+    get_fragment_cache,
+    render_version,
+    fragment_version,
+    set_asset_index,
+    get_asset_index,
+    asset_state,
+    asset_states,
+    page_dependencies,
+    INLINE_TOKENIZERS,
+    BLOCK_PARSERS,
+)
+from manifest import BuildManifest, MANIFEST_PATH, PAGES, ASSETS, GENERATED, hash_bytes, hash_file
+from depgraph import ASSET_DEP
+from frontmatter import page_metadata, page_title, split_front_matter
+from listings import DEFAULT_PER_PAGE, write_indexes
+from template import Template, load_template, set_asset_urls, set_template_options, template_digest, template_inputs
+from htmlnode import HtmlNode, Sink, set_minify
+import profiler
+from parallel import generate_pages_parallel, print_worker_stats
+from compress import compress_outputs
+from assets import FINGERPRINT_EXTENSIONS, annotate_manifest, asset_urls, index_assets, publish_rewritten, write_asset_manifest
+from images import IMAGE_EXTENSIONS
+from devserver import Reloader, start_server
+from fragcache import FragmentCache, FRAGMENT_CACHE_PATH
+from parsecache import CachedPage, ParseCache, PARSE_CACHE_DIR, DEFAULT_MAX_BYTES, set_parse_cache, get_parse_cache
+from pipeline import run_pipeline, Content, DEFAULT_IO_THREADS
+from publish import STAGE_DIR, atomic_write, publish
+from shards import PartialManifest, assign_shards, merge_shards, shard_dir, stage_path
+from search import SearchIndex, node_terms
+from sync import sync_static, sync_asset, COMPARE_MTIME, COMPARE_HASH
+import watcher
+
+CONTENT_DIR = 'content'
+STATIC_DIR = 'static'
+TEMPLATE_PATH = 'template.html'
+PUBLIC_DIR = 'public'
+
+# where the build writes, ./public itself or the staging directory it is
+# published from, see publish.py
+_build_dir = PUBLIC_DIR
+
+# (markdown path, html path, markdown size)
+PageItem = tuple[str, str, int]
 
 def main():
-    copy_tree('./public', './static')
+    parser = argparse.ArgumentParser(description='Build the static site into ./public')
+    parser.add_argument('command', nargs='?', choices=['build', 'serve', 'merge'], default='build',
+                        help='serve builds, then serves ./public on --port; merge moves the pages '
+                             'built by --shard runs into ./public')
+    parser.add_argument('--full', action='store_true',
+                        help='ignore the build manifest and rebuild everything')
+    parser.add_argument('-j', '--jobs', type=int, default=1,
+                        help='render pages on this many worker processes')
+    parser.add_argument('--inline', choices=sorted(INLINE_TOKENIZERS), default='scan',
+                        help='inline markdown tokenizer to use')
+    parser.add_argument('--blocks', choices=sorted(BLOCK_PARSERS), default='scan',
+                        help='markdown block parser to use')
+    parser.add_argument('--shards', type=int, default=1,
+                        help='split the pages into this many shards, built by one process each, then merge them')
+    parser.add_argument('--shard', type=int,
+                        help='with --shards, only build this shard (0 based) into its staging directory, '
+                             'for a later merge')
+    parser.add_argument('--io-threads', type=int, default=DEFAULT_IO_THREADS,
+                        help='with one job, read and write pages on this many threads while rendering '
+                             '(0 reads, renders and writes one page at a time, as --profile does)')
+    parser.add_argument('--profile', action='store_true',
+                        help='time each build stage per page and print a summary')
+    parser.add_argument('--trace', metavar='FILE',
+                        help='with --profile, also write a Chrome trace-event JSON file')
+    parser.add_argument('--explain', action='store_true',
+                        help='log why each page that is built again had to be')
+    parser.add_argument('--sync', choices=[COMPARE_MTIME, COMPARE_HASH], default=COMPARE_MTIME,
+                        help='how static files are compared with the last build')
+    parser.add_argument('--hardlink', action='store_true',
+                        help='hardlink static files into ./public instead of copying them')
+    parser.add_argument('--minify', action='store_true',
+                        help='minify the template and serialize pages without redundant quotes')
+    parser.add_argument('--inline-css', action='store_true',
+                        help='inline the stylesheets the template links from ./static')
+    parser.add_argument('--images', action='store_true',
+                        help='publish images under content hashed names and give <img> tags sizes and lazy loading')
+    parser.add_argument('--fingerprint', action='store_true',
+                        help='publish css, js, images and fonts under content hashed names and link to those')
+    parser.add_argument('--atomic', action='store_true',
+                        help='build into a staging directory and publish it as a release ./public links to, '
+                             'switched over in one rename')
+    parser.add_argument('--site-url', metavar='URL',
+                        help='write sitemap.xml and an Atom feed of the posts, linking to the site at URL')
+    parser.add_argument('--listings', action='store_true',
+                        help='write paginated listings of the posts under /blog/ and of each tag under /tags/')
+    parser.add_argument('--per-page', type=int, default=DEFAULT_PER_PAGE,
+                        help='posts per listing page')
+    parser.add_argument('--search', action='store_true',
+                        help='write a search index of the pages under /search/, for search.js to query; '
+                             'changed pages are parsed again for it unless the parse cache is on')
+    parser.add_argument('--compress', action='store_true',
+                        help='write .gz (and .br with the brotli module) next to new and changed outputs')
+    parser.add_argument('--fragment-cache', choices=['off', 'memory', 'disk'], default='off',
+                        help='reuse the html of identical blocks, within this build or across builds (disk)')
+    parser.add_argument('--parse-cache', choices=['on', 'off'], default='on',
+                        help='reuse the body html and title of pages whose markdown is unchanged')
+    parser.add_argument('--parse-cache-mb', type=int, default=DEFAULT_MAX_BYTES // (1024 * 1024),
+                        help='evict the least recently used parse cache entries above this size')
+    parser.add_argument('--clear-cache', action='store_true',
+                        help='delete the parse and fragment caches before building')
+    parser.add_argument('--port', type=int, default=8888, help='port for serve')
+    parser.add_argument('--watch', action='store_true',
+                        help='with serve, rebuild changed pages and reload open browsers')
+    args = parser.parse_args()
+    if args.shards < 1:
+        parser.error('--shards must be at least 1')
+    if args.shard is not None and not 0 <= args.shard < args.shards:
+        parser.error(f'--shard must be between 0 and {args.shards - 1}')
+    if args.shard is not None and args.command != 'build':
+        parser.error('--shard only builds, merge the shards with the merge command')
+    if args.shards > 1 and args.command == 'serve':
+        parser.error('--shards only builds, serve the merged site without it')
+    if args.command == 'merge' and args.full:
+        parser.error('--full would drop the pages the shards kept, pass it to the shard builds')
+
+    set_inline_tokenizer(args.inline)
+    set_block_parser(args.blocks)
+    set_minify(args.minify)
+    set_template_options(args.minify, STATIC_DIR if args.inline_css else None)
+    set_explain(args.explain)
+    set_build_dir(STAGE_DIR if args.atomic else PUBLIC_DIR)
+    set_index_options(args.site_url, args.listings, args.per_page)
+    set_search(args.search)
+
+    if args.profile or args.trace:
+        profiler.enable()
+
+    if args.clear_cache:
+        clear_caches()
+    manifest = load_manifest(args.full)
+    if args.fingerprint or args.images:
+        extensions = FINGERPRINT_EXTENSIONS if args.fingerprint else IMAGE_EXTENSIONS
+        use_assets(manifest, extensions, args.images, args.sync == COMPARE_HASH)
+
+    # cached html has to come from the same renderer settings
+    version = render_version()
+    if args.parse_cache == 'on':
+        set_parse_cache(ParseCache(PARSE_CACHE_DIR, version, args.parse_cache_mb * 1024 * 1024))
+    if args.fragment_cache == 'disk':
+        set_fragment_cache(FragmentCache.load(FRAGMENT_CACHE_PATH, fragment_version()))
+    elif args.fragment_cache == 'memory':
+        set_fragment_cache(FragmentCache(fragment_version()))
+
+    if args.command == 'merge':
+        merge_site(manifest, args.shards, args.sync, args.hardlink, args.compress)
+    elif args.shard is not None:
+        build_shard(manifest, args.shards, args.shard)
+    elif args.shards > 1:
+        run_shards(args.shards)
+        merge_site(manifest, args.shards, args.sync, args.hardlink, args.compress)
+    else:
+        build_site(manifest, args.jobs, args.sync, args.hardlink, args.io_threads, args.compress)
+
+    cache = get_fragment_cache()
+    if cache is not None:
+        print(f'LOG: {cache.summary()}')
+        if args.fragment_cache == 'disk':
+            cache.save(FRAGMENT_CACHE_PATH)
+
+    parse_cache = get_parse_cache()
+    if parse_cache is not None:
+        print(f'LOG: {parse_cache.summary()}')
+        # shards building next to each other share the cache, the merge
+        # trims it once they are done
+        evicted = parse_cache.evict() if args.shard is None else 0
+        if evicted > 0:
+            print(f'LOG: evicted {evicted} parse cache entries')
+
+    if profiler.is_enabled():
+        pages = profiler.take_pages()
+        profiler.print_report(pages)
+        # with --shards each shard wrote its own, see shard_args()
+        if args.trace and (args.shards == 1 or args.shard is not None):
+            profiler.write_trace(pages, args.trace)
+
+    if args.atomic and args.shard is None:
+        publish(_build_dir, PUBLIC_DIR)
+
+    if args.command == 'serve':
+        serve_site(manifest, args.port, args.watch, args.hardlink, args.compress)
+
+# Builds into path, ./public or the staging directory for --atomic
+def set_build_dir(path: str):
+    global _build_dir
+    _build_dir = path
+    if path == PUBLIC_DIR and os.path.islink(PUBLIC_DIR):
+        # left by --atomic, the build would otherwise write into a release
+        os.remove(PUBLIC_DIR)
+        print(f'LOG: {PUBLIC_DIR} no longer links to a release, building into it')
+
+def load_manifest(full: bool = False) -> BuildManifest:
+    if full:
+        if os.path.isdir(_build_dir):
+            shutil.rmtree(_build_dir)
+            print(f'LOG: dst deleted.')
+        manifest = BuildManifest(MANIFEST_PATH)
+    else:
+        manifest = BuildManifest.load(MANIFEST_PATH)
+
+    # the outputs of a build into the other directory are left alone,
+    # pruning them would empty the live site before anything is published
+    previous = manifest.output_dir
+    if previous is None and manifest.template_hash is not None:
+        previous = PUBLIC_DIR
+    if previous is not None and previous != _build_dir:
+        print(f'LOG: last build wrote to {previous}, starting fresh in {_build_dir}')
+        manifest = BuildManifest(MANIFEST_PATH)
+    manifest.output_dir = _build_dir
+    return manifest
+
+def build_site(manifest: BuildManifest, jobs: int = 1, sync: str = COMPARE_MTIME,
+               hardlink: bool = False, io_threads: int = 0, compress: bool = False):
+    sync_site_static(manifest, sync, hardlink)
+    check_pages(manifest)
+
     # generate_page('content/index.md', 'template.html', 'public/index.html')
-    generate_pages_recursive('content', 'template.html', 'public')
+    if jobs > 1:
+        generate_pages_parallel_build(CONTENT_DIR, TEMPLATE_PATH, _build_dir, jobs, manifest)
+    elif io_threads > 0 and not profiler.is_enabled():
+        # profiling times each page's read and write, which needs them in line
+        generate_pages_pipelined_build(CONTENT_DIR, TEMPLATE_PATH, _build_dir, io_threads, manifest)
+    else:
+        generate_pages_recursive(CONTENT_DIR, TEMPLATE_PATH, _build_dir, manifest)
 
-def generate_page(from_path: str, template_path: str, dest_path: str):
-    print(f'Generating page from {from_path} to {dest_path} using {template_path}')
+    manifest.prune(PAGES)
+    write_site_indexes(manifest)
+    compress_outputs(manifest, compress)
+    manifest.save()
+
+# Copies the static files, under their hashed names if assets are
+# fingerprinted, see use_assets()
+def sync_site_static(manifest: BuildManifest, sync: str = COMPARE_MTIME, hardlink: bool = False):
+    assets = get_asset_index()
+    renames = None
+    rewritten = None
+    if assets is not None:
+        publish_rewritten(manifest, assets)
+        renames = {info.src: info.dest for info in assets.values()}
+        rewritten = {info.src for info in assets.values() if info.content is not None}
+    sync_static(_build_dir, STATIC_DIR, manifest, sync, hardlink, renames, rewritten)
+    if assets is not None:
+        annotate_manifest(manifest, assets)
+    write_asset_manifest(_build_dir, assets)
+
+# (site url, listings, per page) for write_site_indexes()
+_index_options: tuple[Optional[str], bool, int] = (None, False, DEFAULT_PER_PAGE)
+
+def set_index_options(site_url: Optional[str], listings: bool, per_page: int = DEFAULT_PER_PAGE):
+    global _index_options
+    _index_options = (site_url, listings, per_page)
 
-    with open(from_path, 'rt') as f:
+_search = False
+
+def set_search(on: bool):
+    global _search
+    _search = on
+
+# sitemap.xml, the feed and the listings, from the metadata the pages
+# recorded, see listings.py, and the search index, see search.py. Every
+# GENERATED output is made or kept here, the rest are pruned.
+def write_site_indexes(manifest: BuildManifest) -> int:
+    manifest.forget_seen(GENERATED)
+    written = write_indexes(manifest, _build_dir, load_template(TEMPLATE_PATH), *_index_options)
+    if _search:
+        written += SearchIndex.load(manifest, _build_dir).update(manifest, search_terms)
+    manifest.prune(GENERATED)
+    return written
+
+# The title and words of a page for the search index, from the body the
+# build rendered, which the parse cache usually still has. Pages are
+# rendered in workers that don't hand their nodes back, so with
+# --parse-cache off every changed page is parsed a second time here.
+def search_terms(src: str, entry: dict) -> tuple[str, Counter]:
+    with open(src, 'rt') as f:
         markdown = f.read()
+    title, html_node, cached = parse_page(markdown, entry.get('deps', []))
+    try:
+        return title, node_terms(html_node)
+    finally:
+        if cached is not None:
+            cached.close()
+
+# Works out which pages the template and asset changes since the last
+# build have made stale
+def check_pages(manifest: BuildManifest):
+    if manifest.update_template(TEMPLATE_PATH, pages_digest()):
+        print(f'LOG: template changed, rebuilding all pages')
+    invalidate_dependents(manifest)
+
+# Renders the pages of one shard into its staging directory and writes a
+# partial manifest for merge_site(). Every shard lists the whole tree to
+# find its pages; static files, pruning and compression are left to the
+# merge, and the main manifest is only read.
+def build_shard(manifest: BuildManifest, shards: int, index: int):
+    start = time.perf_counter()
+    check_pages(manifest)
+    if os.path.isdir(shard_dir(index)):
+        shutil.rmtree(shard_dir(index))
+
+    pages = list(iter_pages(CONTENT_DIR, _build_dir))
+    assigned = assign_shards(pages, shards)
+    partial = PartialManifest(shards, index, manifest.template_hash)
+    for src, dst, _ in pages:
+        if assigned[src] != index:
+            continue
+        digest = hash_file(src)
+        if page_is_current(manifest, src, digest, dst):
+            print(f'LOG: unchanged, skipping: {src}')
+            partial.keep(src)
+            continue
+        info = generate_page(src, TEMPLATE_PATH, stage_path(dst, _build_dir, index))
+        partial.record(src, digest, dst, info)
+
+    partial.save()
+    print(f'LOG: shard {index} of {shards}: {len(partial.pages)} pages built, '
+          f'{len(partial.seen) - len(partial.pages)} unchanged, {time.perf_counter() - start:.3f} s')
+
+# The arguments a shard build gets from the ones this build got: the
+# caches are cleared once, here, and every shard writes its own trace,
+# trace.json -> trace-0.json, ...
+def shard_args(args: list[str], index: int) -> list[str]:
+    def shard_trace(path: str) -> str:
+        base, ext = os.path.splitext(path)
+        return f'{base}-{index}{ext}'
+
+    out = []
+    ii = 0
+    while ii < len(args):
+        arg = args[ii]
+        if arg == '--clear-cache':
+            pass
+        elif arg == '--trace' and ii + 1 < len(args):
+            out += [arg, shard_trace(args[ii + 1])]
+            ii += 1
+        elif arg.startswith('--trace='):
+            out.append('--trace=' + shard_trace(arg.removeprefix('--trace=')))
+        else:
+            out.append(arg)
+        ii += 1
+    return out
+
+# Builds every shard on its own process, the way separate machines would,
+# with the same arguments as this one
+def run_shards(shards: int):
+    procs = [subprocess.Popen([sys.executable, sys.argv[0]] + shard_args(sys.argv[1:], index) + ['--shard', str(index)])
+             for index in range(shards)]
+    failed = [index for index, proc in enumerate(procs) if proc.wait() != 0]
+    if len(failed) > 0:
+        raise Exception(f'shards failed: {failed}')
+
+# Syncs the static files, then moves the pages the shards built into
+# place and saves the combined manifest, see shards.py
+def merge_site(manifest: BuildManifest, shards: int, sync: str = COMPARE_MTIME,
+               hardlink: bool = False, compress: bool = False):
+    sync_site_static(manifest, sync, hardlink)
+    check_pages(manifest)
+
+    merge_shards(manifest, shards, _build_dir, manifest.template_hash)
+
+    manifest.prune(PAGES)
+    write_site_indexes(manifest)
+    compress_outputs(manifest, compress)
+    manifest.save()
+
+# (extensions, image_attrs) of the assets published under hashed names,
+# None when nothing is
+_asset_options: Optional[tuple[set[str], bool]] = None
+
+# Indexes the static assets and points pages and the template at their
+# hashed names, see assets.py
+def use_assets(manifest: BuildManifest, extensions: set[str], image_attrs: bool, always_hash: bool = False):
+    global _asset_options
+    _asset_options = (extensions, image_attrs)
+    assets = index_assets(STATIC_DIR, _build_dir, manifest, always_hash, extensions)
+    set_asset_index(assets, image_attrs)
+    set_asset_urls(asset_urls(assets))
+
+# Hash of everything every page depends on besides its markdown: the
+# template and the renderer settings. A change rebuilds all pages, assets
+# only rebuild the pages using them, see invalidate_dependents().
+def pages_digest() -> str:
+    return hash_bytes(f'{template_digest(TEMPLATE_PATH)} {render_version()}'.encode())
+
+# Marks the pages using an asset whose hashed url or size changed since
+# they were built, see depgraph.py. Returns {page: reason}.
+def invalidate_dependents(manifest: BuildManifest) -> dict[str, str]:
+    stale = manifest.deps.invalidate(manifest.deps.update_states(asset_states()))
+    if len(stale) > 0:
+        print(f'LOG: {len(stale)} page(s) use changed assets')
+    return stale
+
+_explain = False
+
+# Logs why every page that isn't current is built again
+def set_explain(enabled: bool):
+    global _explain
+    _explain = enabled
+
+def page_is_current(manifest: BuildManifest, src: str, digest: str, dst: str) -> bool:
+    reason = manifest.stale_reason(PAGES, src, digest, dst)
+    if reason is None:
+        return True
+    if _explain:
+        print(f'LOG: rebuilding {src}: {reason}')
+    return False
+
+# What a page's cached html depends on besides its markdown
+def asset_context(deps: list[str]) -> str:
+    if get_asset_index() is None:
+        return ''
+    return '\n'.join(f'{dep} {asset_state(dep[len(ASSET_DEP):])}' for dep in deps if dep.startswith(ASSET_DEP))
 
-    with open(template_path, 'rt') as f:
-        template = f.read()
+# Re-keys the caches after a setting that changes rendering was updated
+def update_cache_versions():
+    cache = get_fragment_cache()
+    if cache is not None:
+        cache.version = fragment_version()
+    parse_cache = get_parse_cache()
+    if parse_cache is not None:
+        parse_cache.version = render_version()
 
-    html_content = markdown_to_html_node(markdown).to_html()
+def clear_caches():
+    if os.path.isdir(PARSE_CACHE_DIR):
+        shutil.rmtree(PARSE_CACHE_DIR)
+    if os.path.exists(FRAGMENT_CACHE_PATH):
+        os.remove(FRAGMENT_CACHE_PATH)
+    print(f'LOG: caches cleared')
 
-    title = extract_title(markdown)
+def serve_site(manifest: BuildManifest, port: int, watch: bool, hardlink: bool = False,
+               compress: bool = False):
+    reloader = Reloader()
+    server = start_server(PUBLIC_DIR, port, reloader)
+    try:
+        if not watch:
+            threading.Event().wait()
 
-    new_content = template.replace('{{ Title }}', title).replace('{{ Content }}', html_content)
+        for touched in watcher.watch([CONTENT_DIR, STATIC_DIR, TEMPLATE_PATH]):
+            start = time.perf_counter()
+            count = apply_changes(touched, manifest, hardlink)
+            compress_outputs(manifest, compress)
+            if _build_dir != PUBLIC_DIR:
+                publish(_build_dir, PUBLIC_DIR)
+            reloader.notify()
+            print(f'LOG: {count} output(s) updated in {(time.perf_counter() - start) * 1000:.1f} ms')
+            manifest.save()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.shutdown()
+        manifest.save()
 
+# Rebuilds only the outputs affected by the touched paths, returns how many
+# outputs were written or removed. A broken page is logged, not raised, so
+# a half typed edit doesn't stop the watcher.
+def apply_changes(touched: set[str], manifest: BuildManifest, hardlink: bool = False) -> int:
+    count = 0
+    paths = sorted(os.path.normpath(path) for path in touched)
+    rebuild_all = any(path in paths for path in template_inputs(TEMPLATE_PATH))
+
+    if _asset_options is not None and any(path.startswith(STATIC_DIR + os.sep)
+                                          and os.path.splitext(path)[1].lower() in _asset_options[0] | {'.css'}
+                                          for path in paths):
+        # a new hash means new urls in the pages that link the asset, and
+        # maybe in the template and the stylesheets
+        use_assets(manifest, *_asset_options)
+        update_cache_versions()
+        paths = sorted(set(paths) | invalidate_dependents(manifest).keys())
+        rebuild_all = True
+    assets = get_asset_index()
+    renames = {info.src: info.dest for info in assets.values()} if assets is not None else {}
+    rewritten = {info.src for info in assets.values() if info.content is not None} if assets is not None else set()
+    if len(rewritten) > 0:
+        count += publish_rewritten(manifest, assets)
+
+    if os.path.isfile(TEMPLATE_PATH) and rebuild_all:
+        if manifest.update_template(TEMPLATE_PATH, pages_digest()):
+            print(f'LOG: template changed, rebuilding all pages')
+            try:
+                generate_pages_recursive(CONTENT_DIR, TEMPLATE_PATH, _build_dir, manifest)
+            except Exception as e:
+                print(f'LOG: rebuild failed: {e}')
+            count += len(manifest.entries[PAGES])
+
+    for path in paths:
+        if path.startswith(CONTENT_DIR + os.sep):
+            kind = PAGES
+            dst = os.path.join(_build_dir, os.path.relpath(path, CONTENT_DIR)).removesuffix('.md') + '.html'
+        elif path.startswith(STATIC_DIR + os.sep):
+            kind = ASSETS
+            dst = renames.get(path, os.path.join(_build_dir, os.path.relpath(path, STATIC_DIR)))
+        else:
+            continue
+
+        if not os.path.exists(path):
+            count += len(manifest.remove(kind, path))
+            continue
+        if not os.path.isfile(path) or (kind == PAGES and not path.endswith('.md')) or path in rewritten:
+            continue
+
+        try:
+            if kind == ASSETS:
+                if sync_asset(path, dst, manifest, hardlink=hardlink):
+                    count += 1
+                continue
+
+            digest = hash_file(path)
+            if page_is_current(manifest, path, digest, dst):
+                continue
+            info = generate_page(path, TEMPLATE_PATH, dst)
+        except Exception as e:
+            print(f'LOG: failed to update {path}: {e}')
+            continue
+        manifest.record(kind, path, digest, dst, **info)
+        count += 1
+
+    if assets is not None:
+        annotate_manifest(manifest, assets)
+        write_asset_manifest(_build_dir, assets)
+    if count > 0:
+        count += write_site_indexes(manifest)
+    return count
+
+# Returns what the page's manifest entry records, see page_info(). info
+# is that, when the caller has already worked it out.
+def generate_page(from_path: str, template_path: str, dest_path: str, info: Optional[dict] = None) -> dict:
+    print(f'Generating page from {from_path} to {dest_path} using {template_path}')
+
+    page = profiler.begin_page(from_path)
+
+    with profiler.stage('read'):
+        with open(from_path, 'rt') as f:
+            markdown = f.read()
+
+        template = load_template(template_path)
+
+    if info is None:
+        with profiler.stage('info'):
+            info = page_info(from_path, markdown, template_path)
+
+    title, html_node, cached = parse_page(markdown, info['deps'])
+    try:
+        write_page(page, template, title, html_node, dest_path, len(markdown.encode()))
+    finally:
+        if cached is not None:
+            cached.close()
+    return info
+
+# What a page's manifest entry records besides its hash: what it depends
+# on, see depgraph.py, and the metadata listings are made from, see
+# listings.py
+def page_info(src: str, markdown: str, template_path: str) -> dict:
+    return {
+        'deps': page_dependencies(markdown, template_path),
+        'meta': page_metadata(markdown),
+        'mtime': os.stat(src).st_mtime,
+    }
+
+# Returns the title and body of a page, from the parse cache when it has
+# them. A cached page keeps its entry open until it is closed. deps are
+# the page's dependencies, the cached html depends on their assets.
+def parse_page(markdown: str, deps: list[str]) -> tuple[str, HtmlNode, Optional[CachedPage]]:
+    cache = get_parse_cache()
+    if cache is not None:
+        with profiler.stage('parse_cache'):
+            key = cache.key(markdown, asset_context(deps))
+            cached = cache.get(key)
+        if cached is not None:
+            return cached.title, cached.body, cached
+
+    with profiler.stage('parse'):
+        meta, body = split_front_matter(markdown)
+        html_node = markdown_to_html_node(body)
+
+    with profiler.stage('title'):
+        title = page_title(meta, body)
+
+    if cache is not None:
+        # the body is streamed into the cache entry and the page written
+        # from there, rather than held as a string for both
+        with profiler.stage('parse_cache'):
+            cached = cache.put_node(key, title, html_node)
+        if cached is not None:
+            return cached.title, cached.body, cached
+
+    return title, html_node, None
+
+def write_page(page: Optional[profiler.PageProfile], template: Template, title: str,
+               html_node: HtmlNode, dest_path: str, bytes_in: int):
+    # parallel workers can race to create the same directory
     dir_part = os.path.split(dest_path)[0]
-    if not os.path.exists(dir_part):
-        os.makedirs(dir_part)
-
-    with open(dest_path, 'wt') as f:
-        f.write(new_content)
-
-def generate_pages_recursive(dir_path_content: str, template_path: str, dest_dir_path: str):
-
-    listing = os.listdir(dir_path_content)
-    # print(listing)
-    for item in listing:
-        path = os.path.join(dir_path_content, item)
-
-        if os.path.isfile(path) and path.endswith('.md'):
-            new_name = item.removesuffix('.md') + '.html'
-            dst = os.path.join(dest_dir_path, new_name)
-            generate_page(path, template_path, dst)
-            print(f'{path} should be processed -> {dst}')
-        elif os.path.isdir(path):
-            new_dest_dir_path = os.path.join(dest_dir_path, item)
-            generate_pages_recursive(path, template_path, new_dest_dir_path)
-
-# Copies src to dst, deleting dst if it exists
-def copy_tree(dst: str, src: str):
-    # See if dst exists and is directory
-    if os.path.exists(dst):
-        if not os.path.isdir(dst):
-            print(f'LOG: dst is not a directory!')
-            raise Exception('dst is not a directory!')
-
-        print(f'LOG: dst exists: {dst}')
-        #Delete it
-        shutil.rmtree(dst)
-        print(f'LOG: dst deleted.')
-
-    # See if src exists 
-    if not os.path.exists(src):
-        print(f'LOG: src does not exist!: {src}')
-        raise Exception(f'src does not exist!: {src}')
-    # and is a directory 
-    if not os.path.isdir(src):
-        print(f'LOG: src is not a directory!')
-        raise Exception(f'src is not a directory!')
-    
-    # Copy tree, no thanks recursion
-    print(f'LOG: copying src -> dst: {src} -> {dst}')
-    shutil.copytree(src, dst)
-
-    pass
+    os.makedirs(dir_part, exist_ok=True)
+
+    if page is None:
+        # the page body never exists as one string, it is streamed into the
+        # file between the template chunks
+        with atomic_write(dest_path) as f:
+            template.write(f, {'Title': title, 'Content': html_node})
+        return
+
+    # profiling renders to strings first so serializing, templating and
+    # writing can be timed separately, the output is the same
+    with profiler.stage('to_html'):
+        html_content = html_node.to_html()
+
+    with profiler.stage('template'):
+        new_content = template.render({'Title': title, 'Content': html_content})
+
+    with profiler.stage('write'):
+        with atomic_write(dest_path) as f:
+            f.write(new_content)
+
+    profiler.end_page(page, html_node, bytes_in, len(new_content.encode()))
+
+def generate_pages_recursive(dir_path_content: str, template_path: str, dest_dir_path: str,
+                             manifest: Optional[BuildManifest] = None):
+    for path, dst, _ in iter_pages(dir_path_content, dest_dir_path):
+        if manifest is not None:
+            digest = hash_file(path)
+            if page_is_current(manifest, path, digest, dst):
+                print(f'LOG: unchanged, skipping: {path}')
+                continue
+        info = generate_page(path, template_path, dst)
+        if manifest is not None:
+            manifest.record(PAGES, path, digest, dst, **info)
+        print(f'{path} should be processed -> {dst}')
+
+# Yields (markdown, html, size) for every page under dir_path_content, as
+# the tree is walked. Walks without recursion, in the same depth first
+# order as listing each directory and descending into subdirectories as
+# they come up. Types come from the directory entries, so the only stat
+# per page is the one for its size.
+def iter_pages(dir_path_content: str, dest_dir_path: str) -> Iterator[PageItem]:
+    stack = [(os.scandir(dir_path_content), dest_dir_path)]
+    try:
+        while len(stack) > 0:
+            entries, dest = stack[-1]
+            entry = next(entries, None)
+            if entry is None:
+                entries.close()
+                stack.pop()
+                continue
+
+            if entry.is_file() and entry.name.endswith('.md'):
+                new_name = entry.name.removesuffix('.md') + '.html'
+                yield entry.path, os.path.join(dest, new_name), entry.stat().st_size
+            elif entry.is_dir():
+                stack.append((os.scandir(entry.path), os.path.join(dest, entry.name)))
+    finally:
+        # a consumer that stops early mustn't leak directory handles
+        for entries, _ in stack:
+            entries.close()
+
+# Lists every (markdown, html) pair under dir_path_content without rendering
+def find_pages(dir_path_content: str, dest_dir_path: str) -> list[tuple[str, str]]:
+    return [(src, dst) for src, dst, _ in iter_pages(dir_path_content, dest_dir_path)]
+
+def generate_pages_parallel_build(dir_path_content: str, template_path: str, dest_dir_path: str,
+                                  jobs: int, manifest: Optional[BuildManifest] = None):
+    start = time.perf_counter()
+
+    # hashing happens here so workers only get pages that need rendering,
+    # and so does what the manifest records, which workers have no way to
+    # hand back; they get it with the page instead of working it out
+    # again. Pages are handed to the pool as they are found.
+    digests = {}
+    infos = {}
+    stale = []
+
+    def stale_pages() -> Iterator[tuple[str, str, int, Optional[dict]]]:
+        for src, dst, size in iter_pages(dir_path_content, dest_dir_path):
+            if manifest is not None:
+                with open(src, 'rb') as f:
+                    data = f.read()
+                digests[src] = hash_bytes(data)
+                if page_is_current(manifest, src, digests[src], dst):
+                    print(f'LOG: unchanged, skipping: {src}')
+                    continue
+                infos[src] = page_info(src, io.TextIOWrapper(io.BytesIO(data)).read(), template_path)
+            stale.append((src, dst))
+            yield src, dst, size, infos.get(src)
+
+    stats = generate_pages_parallel(stale_pages(), template_path, jobs, generate_page)
+
+    if manifest is not None:
+        for src, dst in stale:
+            manifest.record(PAGES, src, digests[src], dst, **infos[src])
+
+    if len(stats) > 0:
+        print_worker_stats(stats, time.perf_counter() - start)
+
+def generate_pages_pipelined_build(dir_path_content: str, template_path: str, dest_dir_path: str,
+                                   io_threads: int, manifest: Optional[BuildManifest] = None):
+    start = time.perf_counter()
+    template = load_template(template_path)
+
+    # the source is read once, for both the manifest hash and rendering
+    def read(page: PageItem) -> tuple[bytes, str]:
+        with open(page[0], 'rb') as f:
+            data = f.read()
+        return data, hash_bytes(data)
+
+    def render(page: PageItem, read_result: tuple[bytes, str]) -> Optional[tuple[str, Content]]:
+        src, dst, _ = page
+        data, digest = read_result
+        if manifest is not None and page_is_current(manifest, src, digest, dst):
+            print(f'LOG: unchanged, skipping: {src}')
+            return None
+
+        print(f'Generating page from {src} to {dst} using {template_path}')
+        # decoded the way open(src, 'rt') would
+        markdown = io.TextIOWrapper(io.BytesIO(data)).read()
+        info = page_info(src, markdown, template_path)
+        title, html_node, cached = parse_page(markdown, info['deps'])
+
+        # streamed into the file by a writer thread, which closes the
+        # cached page once it is written
+        def write(sink: Sink):
+            try:
+                template.write(sink, {'Title': title, 'Content': html_node})
+            finally:
+                if cached is not None:
+                    cached.close()
+
+        if manifest is not None:
+            manifest.record(PAGES, src, digest, dst, **info)
+        return dst, write
+
+    stats = run_pipeline(iter_pages(dir_path_content, dest_dir_path), read, render, io_threads)
+    print(f'LOG: {stats.written} pages written, {stats.skipped} unchanged, '
+          f'{time.perf_counter() - start:.3f} s on {io_threads} I/O threads')
 
 if __name__ == '__main__':
     main()
\ No newline at end of file
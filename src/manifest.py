@@ -0,0 +1,191 @@
+import hashlib
+import json
+import os
+import os.path
+from typing import Optional
+
+from depgraph import DependencyGraph
+
+MANIFEST_VERSION = 2
+MANIFEST_PATH = '.cache/build-manifest.json'
+
+PAGES = 'pages'
+ASSETS = 'assets'
+# outputs made from other pages' metadata, sitemap.xml, feeds, listings
+GENERATED = 'generated'
+
+
+def hash_bytes(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+def hash_file(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        while True:
+            chunk = f.read(1 << 16)
+            if not chunk:
+                break
+            h.update(chunk)
+    return h.hexdigest()
+
+
+# Records the hash of every source that went into the last build, and where
+# its output was written, so the next build can skip what hasn't changed.
+#
+# entries look like {kind: {src: {'hash': ..., 'dest': ...}}}, what pages
+# depend on besides their source is kept in deps, see depgraph.py
+class BuildManifest:
+    def __init__(self, path: str):
+        self.path = path
+        self.template_hash: Optional[str] = None
+        # where the outputs were written
+        self.output_dir: Optional[str] = None
+        self.entries: dict[str, dict[str, dict[str, str]]] = {PAGES: {}, ASSETS: {}, GENERATED: {}}
+        self.seen: dict[str, set[str]] = {PAGES: set(), ASSETS: set(), GENERATED: set()}
+        # sources whose output was (re)written since loading
+        self.recorded: dict[str, set[str]] = {PAGES: set(), ASSETS: set(), GENERATED: set()}
+        self.deps = DependencyGraph()
+        self.template_changed = False
+
+    @classmethod
+    def load(cls, path: str = MANIFEST_PATH) -> 'BuildManifest':
+        manifest = cls(path)
+        if not os.path.exists(path):
+            return manifest
+
+        try:
+            with open(path, 'rt') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            print(f'LOG: unreadable manifest, starting fresh: {path}')
+            return manifest
+
+        if data.get('version') != MANIFEST_VERSION:
+            print(f'LOG: manifest version mismatch, starting fresh: {path}')
+            return manifest
+
+        manifest.template_hash = data.get('template')
+        manifest.output_dir = data.get('output')
+        for kind in manifest.entries:
+            manifest.entries[kind] = data.get(kind, {})
+        manifest.deps = DependencyGraph.from_json(data.get('deps'))
+        return manifest
+
+    def save(self):
+        dir_part = os.path.split(self.path)[0]
+        if dir_part and not os.path.exists(dir_part):
+            os.makedirs(dir_part)
+
+        data = {'version': MANIFEST_VERSION, 'template': self.template_hash, 'output': self.output_dir,
+                'deps': self.deps.to_json()}
+        data.update(self.entries)
+
+        # write then rename so a crash never leaves a half written manifest
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'wt') as f:
+            json.dump(data, f, indent=1, sort_keys=True)
+        os.replace(tmp_path, self.path)
+
+    # Returns True if the template differs from the one used last build.
+    # Every page depends on it, so a change drops all page entries.
+    # digest defaults to the hash of the file, pass one to also cover
+    # whatever else goes into the template.
+    def update_template(self, template_path: str, digest: Optional[str] = None) -> bool:
+        if digest is None:
+            digest = hash_file(template_path)
+        if digest == self.template_hash:
+            return False
+
+        self.template_hash = digest
+        self.entries[PAGES] = {}
+        self.template_changed = True
+        return True
+
+    def is_current(self, kind: str, src: str, digest: str, dest: str) -> bool:
+        return self.stale_reason(kind, src, digest, dest) is None
+
+    # Why src has to be built again, None if its output is current
+    def stale_reason(self, kind: str, src: str, digest: str, dest: str) -> Optional[str]:
+        self.seen[kind].add(src)
+        entry = self.entries[kind].get(src)
+        if entry is None:
+            return 'template changed' if kind == PAGES and self.template_changed else 'not built before'
+        if entry['hash'] != digest:
+            return 'source changed'
+        if entry['dest'] != dest:
+            return 'output moved'
+        if not os.path.exists(dest):
+            return 'output missing'
+        if kind == PAGES and src in self.deps.stale:
+            return self.deps.stale[src]
+        return None
+
+    # extra is stored alongside the hash, e.g. the source size and mtime.
+    # deps are what a page was built from besides src, see depgraph.py
+    def record(self, kind: str, src: str, digest: str, dest: str, deps: Optional[list[str]] = None, **extra):
+        self.seen[kind].add(src)
+        self.recorded[kind].add(src)
+        entry = {'hash': digest, 'dest': dest}
+        entry.update(extra)
+        self.entries[kind][src] = entry
+        if deps is not None:
+            self.deps.record(src, deps)
+        else:
+            self.deps.stale.pop(src, None)
+
+    def get(self, kind: str, src: str) -> Optional[dict]:
+        return self.entries[kind].get(src)
+
+    # Keeps src from being pruned without checking it
+    def keep(self, kind: str, src: str):
+        self.seen[kind].add(src)
+
+    # Forgets src, or every entry under it if it was a directory, and
+    # deletes their outputs
+    def remove(self, kind: str, src: str) -> list[str]:
+        prefix = src.rstrip(os.sep) + os.sep
+        removed = []
+        for key in [key for key in self.entries[kind] if key == src or key.startswith(prefix)]:
+            self.seen[kind].discard(key)
+            dest = self._remove_entry(kind, key)
+            if dest is not None:
+                removed.append(dest)
+        return removed
+
+    # Starts over on what was seen of kind, for outputs made again from
+    # scratch more than once per manifest, e.g. on every watch rebuild
+    def forget_seen(self, kind: str):
+        self.seen[kind].clear()
+
+    # Deletes outputs whose sources were not seen during this build
+    def prune(self, kind: str) -> list[str]:
+        removed = []
+        for src in list(self.entries[kind]):
+            if src in self.seen[kind]:
+                continue
+
+            dest = self._remove_entry(kind, src)
+            if dest is not None:
+                removed.append(dest)
+        return removed
+
+    def _remove_entry(self, kind: str, src: str) -> Optional[str]:
+        entry = self.entries[kind].pop(src)
+        if kind == PAGES:
+            self.deps.remove(src)
+        dest = entry['dest']
+        # precompressed copies, see compress.py
+        for suffix in entry.get('compressed', []):
+            if os.path.isfile(dest + suffix):
+                os.remove(dest + suffix)
+        if not os.path.isfile(dest):
+            return None
+
+        os.remove(dest)
+        print(f'LOG: removed stale output: {dest}')
+        # clean up directories left empty, stops at the first non-empty one
+        try:
+            os.removedirs(os.path.split(dest)[0])
+        except OSError:
+            pass
+        return dest
@@ -0,0 +1,134 @@
+import re
+
+# Minification of hand written html (the template) and css.
+#
+# Rendered pages are minified as they are serialized instead, see
+# set_minify() in htmlnode.py: the markdown renderer never puts
+# whitespace between tags, so only attribute quoting is left to do there.
+
+# elements whose line breaks don't matter for layout
+BLOCK_TAGS = {
+    'address', 'article', 'aside', 'base', 'blockquote', 'body', 'br', 'dd', 'details', 'dialog', 'div',
+    'dl', 'dt', 'fieldset', 'figcaption', 'figure', 'footer', 'form', 'h1', 'h2', 'h3', 'h4', 'h5',
+    'h6', 'head', 'header', 'hr', 'html', 'li', 'link', 'main', 'meta', 'nav', 'noscript', 'ol', 'p',
+    'pre', 'script', 'section', 'style', 'summary', 'table', 'tbody', 'td', 'tfoot', 'th', 'thead',
+    'title', 'tr', 'ul',
+}
+# elements whose content is kept exactly as written
+RAW_TAGS = {'pre', 'textarea', 'script', 'style'}
+
+_TOKEN_RE = re.compile(r'<!--.*?-->|<![^>]*>|<(/?)([a-zA-Z][^\s/>]*)((?:"[^"]*"|\'[^\']*\'|[^\'">])*)>', re.S)
+_ATTR_RE = re.compile(r'([^\s=/>]+)(?:\s*=\s*("[^"]*"|\'[^\']*\'|[^\s>]+))?')
+_SPACE_RE = re.compile(r'\s+')
+# what an attribute value may contain and still go without quotes
+_UNQUOTED_RE = re.compile(r'[^\s"\'=<>`]+')
+
+
+def quote_attr(value: str) -> str:
+    # template slots are filled in later and may contain anything
+    if _UNQUOTED_RE.fullmatch(value) and '{{' not in value:
+        return value
+    if '"' not in value:
+        return f'"{value}"'
+    if "'" not in value:
+        return f"'{value}'"
+    return '"' + value.replace('"', '&quot;') + '"'
+
+def _minify_tag(name: str, attrs: str, closing: bool) -> str:
+    if closing:
+        return f'</{name}>'
+
+    parts = [name]
+    for m in _ATTR_RE.finditer(attrs):
+        key, value = m.group(1), m.group(2)
+        if value is None:
+            parts.append(key)
+            continue
+        if value[0] in '"\'':
+            value = value[1:-1]
+        parts.append(f'{key}={quote_attr(value)}')
+    return f'<{" ".join(parts)}>'
+
+# text on both sides of a removed comment is one run of text
+def _append_text(tokens: list[tuple[str, bool, bool]], text: str):
+    if len(tokens) > 0 and tokens[-1][1]:
+        tokens[-1] = (tokens[-1][0] + text, True, False)
+    else:
+        tokens.append((text, True, False))
+
+# Collapses the whitespace in html: dropped next to block level tags,
+# squeezed to one space elsewhere. Comments are removed, attribute
+# quotes dropped where that is safe and raw elements (pre, textarea,
+# script, style) are left untouched.
+def minify_html(text: str) -> str:
+    # (html, is_text, is_block), raw element content counts as a tag
+    tokens: list[tuple[str, bool, bool]] = []
+    pos = 0
+    raw = None
+    for m in _TOKEN_RE.finditer(text):
+        closing, name = m.group(1), m.group(2)
+        if raw is not None:
+            # inside a raw element only its end tag counts
+            if closing and name is not None and name.lower() == raw:
+                tokens.append((text[pos:m.start()], False, False))
+                tokens.append((f'</{name}>', False, True))
+                pos = m.end()
+                raw = None
+            continue
+
+        _append_text(tokens, text[pos:m.start()])
+        pos = m.end()
+        if m.group(0).startswith('<!--'):
+            continue
+        if name is None:
+            # doctype
+            tokens.append((m.group(0), False, True))
+            continue
+
+        tokens.append((_minify_tag(name, m.group(3), bool(closing)), False, name.lower() in BLOCK_TAGS))
+        if not closing and name.lower() in RAW_TAGS:
+            raw = name.lower()
+    if raw is None:
+        _append_text(tokens, text[pos:])
+    else:
+        tokens.append((text[pos:], False, False))
+
+    # whether the nearest tag before / after each token is block level,
+    # the start and end of the text count as block level
+    block_before = []
+    block = True
+    for html, is_text, is_block in tokens:
+        block_before.append(block)
+        if not is_text:
+            block = is_block
+    block_after = [True] * len(tokens)
+    block = True
+    for i in range(len(tokens) - 1, -1, -1):
+        block_after[i] = block
+        if not tokens[i][1]:
+            block = tokens[i][2]
+
+    out = []
+    for i, (html, is_text, _) in enumerate(tokens):
+        if not is_text:
+            out.append(html)
+            continue
+
+        html = _SPACE_RE.sub(' ', html)
+        if html.startswith(' ') and block_before[i]:
+            html = html[1:]
+        if html.endswith(' ') and block_after[i]:
+            html = html[:-1]
+        out.append(html)
+    return ''.join(out)
+
+_CSS_COMMENT_RE = re.compile(r'/\*.*?\*/', re.S)
+_CSS_PUNCT_RE = re.compile(r'\s*([{};,>])\s*')
+
+# Drops comments and the whitespace css doesn't need. Leaves the space
+# before ':' alone, `a :hover` and `a:hover` are different selectors.
+def minify_css(text: str) -> str:
+    text = _CSS_COMMENT_RE.sub('', text)
+    text = _SPACE_RE.sub(' ', text)
+    text = _CSS_PUNCT_RE.sub(r'\1', text)
+    return text.replace(';}', '}').strip()
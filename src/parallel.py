@@ -0,0 +1,164 @@
+import multiprocessing
+import os
+import os.path
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, as_completed, wait
+from typing import Callable, Iterable, Iterator, Optional
+
+import profiler
+from functions import get_fragment_cache
+from parsecache import get_parse_cache
+
+# Small pages are grouped until a batch holds roughly this many bytes of
+# markdown, so one IPC round trip carries a useful amount of work
+DEFAULT_BATCH_BYTES = 64 * 1024
+# batches per worker submitted ahead of the ones running
+MAX_QUEUED_BATCHES = 2
+# Workers have to be forked: the build settings (minify, tokenizer, asset
+# index, template options, caches...) are module globals set by main(),
+# and only a forked worker starts with them. spawn and forkserver, the
+# defaults on macOS and from Python 3.14 on Linux, would render with the
+# defaults instead.
+START_METHOD = 'fork'
+
+# render(src, template_path, dst, info) returns the page's info, see
+# page_info() in main.py. info is what the parent already worked out for
+# the page, or None to have render work it out.
+RenderFn = Callable[[str, str, str, Optional[dict]], dict]
+
+
+class WorkerStats:
+    def __init__(self, pid: int):
+        self.pid = pid
+        self.pages = 0
+        self.bytes = 0
+        self.seconds = 0.0
+
+    def add(self, pages: int, nbytes: int, seconds: float):
+        self.pages += pages
+        self.bytes += nbytes
+        self.seconds += seconds
+
+    def __repr__(self) -> str:
+        return f'WorkerStats(pid={self.pid}, pages={self.pages}, bytes={self.bytes}, seconds={self.seconds:.3f})'
+
+
+# Groups pages into batches of about batch_bytes of source each, as they
+# arrive. Pages are (src, dst) or (src, dst, size), the size saves a stat,
+# or (src, dst, size, info) to hand render the page's info. Batches hold
+# (src, dst) or (src, dst, info).
+#
+# The first batches are small so every worker has something to do before
+# the whole tree has been listed; the target doubles after each round of
+# jobs batches until it reaches batch_bytes. Keeps arrival order so
+# batches are deterministic.
+def stream_batches(pages: Iterable[tuple], jobs: int,
+                   batch_bytes: int = DEFAULT_BATCH_BYTES) -> Iterator[list[tuple]]:
+    target = max(1, batch_bytes // 16)
+    count = 0
+    batch = []
+    batch_size = 0
+    for page in pages:
+        size = page[2] if len(page) > 2 else os.path.getsize(page[0])
+        batch.append((page[0], page[1]) + tuple(page[3:]))
+        batch_size += size
+        if batch_size >= target:
+            yield batch
+            batch = []
+            batch_size = 0
+            count += 1
+            if count % max(1, jobs) == 0:
+                target = min(batch_bytes, target * 2)
+
+    if len(batch) > 0:
+        yield batch
+
+def batch_pages(pages: list[tuple], jobs: int,
+                batch_bytes: int = DEFAULT_BATCH_BYTES) -> list[list[tuple]]:
+    return list(stream_batches(pages, jobs, batch_bytes))
+
+BatchResult = tuple[int, int, int, float, list[profiler.PageProfile], Optional[tuple], Optional[tuple]]
+
+def _render_batch(render: RenderFn, batch: list[tuple], template_path: str,
+                  profile: bool) -> BatchResult:
+    if profile:
+        profiler.enable()
+
+    start = time.perf_counter()
+    nbytes = 0
+    for page in batch:
+        src, dst = page[0], page[1]
+        nbytes += os.path.getsize(src)
+        render(src, template_path, dst, page[2] if len(page) > 2 else None)
+    seconds = time.perf_counter() - start
+
+    # fragments rendered here go back to the parent so they can be saved,
+    # cache counts so they show up in the summary
+    cache = get_fragment_cache()
+    fragments = cache.take_new() if cache is not None else None
+    parse_cache = get_parse_cache()
+    parse_stats = parse_cache.take_stats() if parse_cache is not None else None
+    return os.getpid(), len(batch), nbytes, seconds, profiler.take_pages(), fragments, parse_stats
+
+def _pool_context() -> multiprocessing.context.BaseContext:
+    if START_METHOD not in multiprocessing.get_all_start_methods():
+        raise Exception(f'parallel builds need the {START_METHOD} start method, build without -j')
+    return multiprocessing.get_context(START_METHOD)
+
+# Renders every page on a process pool. pages may be a lazy stream, see
+# stream_batches(). render is a RenderFn and must be a module level
+# function.
+def generate_pages_parallel(pages: Iterable[tuple], template_path: str, jobs: int,
+                            render: RenderFn, batch_bytes: int = DEFAULT_BATCH_BYTES) -> dict[int, WorkerStats]:
+    stats: dict[int, WorkerStats] = {}
+
+    def collect(future: Future):
+        pid, count, nbytes, seconds, profiles, fragments, parse_stats = future.result()
+        profiler.add_pages(profiles)
+        cache = get_fragment_cache()
+        if cache is not None and fragments is not None:
+            cache.merge(*fragments)
+        parse_cache = get_parse_cache()
+        if parse_cache is not None and parse_stats is not None:
+            parse_cache.add_stats(*parse_stats)
+        if pid not in stats:
+            stats[pid] = WorkerStats(pid)
+        stats[pid].add(count, nbytes, seconds)
+
+    # pages are batched and submitted while they are still being found,
+    # with at most a few batches per worker waiting in the pool
+    pool = None
+    running = set()
+    submitted = 0
+    try:
+        for batch in stream_batches(pages, jobs, batch_bytes):
+            if pool is None:
+                pool = ProcessPoolExecutor(max_workers=jobs, mp_context=_pool_context())
+            if len(running) >= jobs * MAX_QUEUED_BATCHES:
+                done, running = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    collect(future)
+            running.add(pool.submit(_render_batch, render, batch, template_path, profiler.is_enabled()))
+            submitted += len(batch)
+
+        for future in as_completed(running):
+            collect(future)
+    finally:
+        if pool is not None:
+            pool.shutdown(cancel_futures=True)
+
+    if submitted > 0:
+        print(f'LOG: rendered {submitted} pages on {jobs} workers')
+    return stats
+
+def print_worker_stats(stats: dict[int, WorkerStats], wall_seconds: float):
+    print(f'{"worker":>8} {"pages":>8} {"KiB":>10} {"busy s":>8} {"pages/s":>9}')
+    total_pages = 0
+    for pid in sorted(stats):
+        s = stats[pid]
+        rate = s.pages / s.seconds if s.seconds > 0 else 0.0
+        print(f'{pid:>8} {s.pages:>8} {s.bytes / 1024:>10.1f} {s.seconds:>8.3f} {rate:>9.1f}')
+        total_pages += s.pages
+
+    rate = total_pages / wall_seconds if wall_seconds > 0 else 0.0
+    print(f'{"total":>8} {total_pages:>8} {"":>10} {wall_seconds:>8.3f} {rate:>9.1f}')
@@ -0,0 +1,187 @@
+import codecs
+import hashlib
+import mmap
+import os
+import os.path
+from typing import Optional
+
+from htmlnode import HtmlNode, Sink
+
+# On-disk cache of parsed pages: the rendered body html and the title of
+# each markdown source, keyed by a hash of the source, the renderer
+# version and the state of the assets the page uses.
+#
+# Every entry is its own file, .cache/parse/ab/abcdef....html, holding the
+# title on the first line and the body html after it. Nothing is loaded up
+# front; an entry is opened and memory-mapped only when its page is built.
+
+PARSE_CACHE_DIR = '.cache/parse'
+DEFAULT_MAX_BYTES = 1024 * 1024 * 1024
+
+
+# Body html living in a memory-mapped cache entry
+class MappedHtmlNode(HtmlNode):
+    __slots__ = ('view',)
+
+    def __init__(self, view: memoryview):
+        self.view = view
+
+    def to_html(self) -> str:
+        return str(self.view, 'utf-8')
+
+    def write_html(self, sink: Sink):
+        # text files in utf-8 get the mapped bytes directly, no decoding
+        buffer = getattr(sink, 'buffer', None)
+        encoding = getattr(sink, 'encoding', None)
+        if buffer is not None and encoding is not None and codecs.lookup(encoding).name == 'utf-8':
+            sink.flush()
+            buffer.write(self.view)
+            return
+        sink.write(self.to_html())
+
+
+class CachedPage:
+    def __init__(self, path: str):
+        self.file = open(path, 'rb')
+        try:
+            self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            # empty files can't be mapped
+            self.file.close()
+            raise
+        newline = self.map.find(b'\n')
+        self.title = self.map[:newline].decode()
+        self.view = memoryview(self.map)[newline + 1:]
+        self.body = MappedHtmlNode(self.view)
+
+    def close(self):
+        self.view.release()
+        self.map.close()
+        self.file.close()
+
+    def __enter__(self) -> 'CachedPage':
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+
+class ParseCache:
+    def __init__(self, root: str, version: str, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.root = root
+        self.version = version
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+
+    # context is whatever else the page's html depends on
+    def key(self, markdown: str, context: str = '') -> str:
+        h = hashlib.blake2b(self.version.encode(), digest_size=20)
+        h.update(b'\0')
+        h.update(markdown.encode())
+        if context:
+            h.update(b'\0')
+            h.update(context.encode())
+        return h.hexdigest()
+
+    def entry_path(self, key: str) -> str:
+        return os.path.join(self.root, key[:2], key + '.html')
+
+    # Returns the cached page for key, to be closed by the caller
+    def get(self, key: str) -> Optional[CachedPage]:
+        path = self.entry_path(key)
+        try:
+            page = CachedPage(path)
+        except (OSError, ValueError):
+            self.misses += 1
+            return None
+
+        # mtime doubles as last use for eviction
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        self.hits += 1
+        return page
+
+    # Streams node into the entry for key and returns the entry, so the
+    # page is written from the mapped file and its body never has to exist
+    # as one string. None if the entry can't be read back.
+    def put_node(self, key: str, title: str, node: HtmlNode) -> Optional[CachedPage]:
+        path = self.entry_path(key)
+        os.makedirs(os.path.split(path)[0], exist_ok=True)
+        tmp_path = f'{path}.{os.getpid()}.tmp'
+        try:
+            with open(tmp_path, 'wt', encoding='utf-8', newline='') as f:
+                f.write(title)
+                f.write('\n')
+                node.write_html(f)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        try:
+            return CachedPage(path)
+        except (OSError, ValueError):
+            return None
+
+    # Deletes the least recently used entries until the cache is back under
+    # max_bytes, returns how many were deleted
+    def evict(self) -> int:
+        entries = []
+        total = 0
+        if not os.path.isdir(self.root):
+            return 0
+        for shard in os.scandir(self.root):
+            if not shard.is_dir():
+                continue
+            for entry in os.scandir(shard.path):
+                st = entry.stat()
+                entries.append((st.st_mtime_ns, st.st_size, entry.path))
+                total += st.st_size
+
+        if total <= self.max_bytes:
+            return 0
+
+        # trim a bit below the limit so the next build doesn't evict again
+        target = self.max_bytes * 9 // 10
+        removed = 0
+        for _, size, path in sorted(entries):
+            if total <= target:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+            removed += 1
+        return removed
+
+    # Hands over the hit/miss counts and resets them, for worker processes
+    def take_stats(self) -> tuple[int, int]:
+        stats = (self.hits, self.misses)
+        self.hits = 0
+        self.misses = 0
+        return stats
+
+    def add_stats(self, hits: int, misses: int):
+        self.hits += hits
+        self.misses += misses
+
+    def summary(self) -> str:
+        lookups = self.hits + self.misses
+        rate = 100 * self.hits / lookups if lookups > 0 else 0.0
+        return f'parse cache: {self.hits} hits, {self.misses} misses ({rate:.1f}% hit rate)'
+
+
+_cache: Optional[ParseCache] = None
+
+# Turns the parse cache on for generate_page (or off with None)
+def set_parse_cache(cache: Optional[ParseCache]):
+    global _cache
+    _cache = cache
+
+def get_parse_cache() -> Optional[ParseCache]:
+    return _cache
@@ -0,0 +1,127 @@
+import os
+import os.path
+import threading
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Iterable, Optional, TypeVar, Union
+
+from htmlnode import Sink
+from publish import atomic_write
+
+# Three stage build pipeline: sources are read ahead on a pool of I/O
+# threads, rendered on the calling thread, and written out behind it on
+# another pool, so file latency overlaps with rendering instead of adding
+# to it.
+#
+# Both pools are bounded: at most max_pending reads are in flight ahead of
+# the renderer and at most max_pending rendered pages wait to be written,
+# so memory stays flat however big the site is. A rendered page can be a
+# function that streams it into the file, so what waits is the page's
+# node (or mapped parse cache entry) rather than the whole page as a
+# string.
+
+DEFAULT_IO_THREADS = 4
+DEFAULT_MAX_PENDING = 64
+
+_DONE = object()
+
+Item = TypeVar('Item')
+Data = TypeVar('Data')
+
+# render(item, data) returns (dest_path, content) or None to skip the
+# item. content is the text, or a function that writes it into a sink and
+# is called exactly once.
+Content = Union[str, Callable[[Sink], None]]
+ReadFn = Callable[[Item], Data]
+RenderFn = Callable[[Item, Data], Optional[tuple[str, Content]]]
+
+
+# Creates each output directory once, however many pages go into it
+class DirectoryCache:
+    def __init__(self):
+        self.created: set[str] = set()
+        self.lock = threading.Lock()
+
+    def ensure(self, path: str):
+        if path == '' or path in self.created:
+            return
+        with self.lock:
+            if path in self.created:
+                return
+            os.makedirs(path, exist_ok=True)
+            self.created.add(path)
+
+
+class PipelineStats:
+    def __init__(self):
+        self.read = 0
+        self.written = 0
+        self.skipped = 0
+
+    def __repr__(self) -> str:
+        return f'PipelineStats(read={self.read}, written={self.written}, skipped={self.skipped})'
+
+
+def write_text(dirs: DirectoryCache, dest_path: str, content: Content):
+    dirs.ensure(os.path.split(dest_path)[0])
+    with atomic_write(dest_path) as f:
+        if isinstance(content, str):
+            f.write(content)
+        else:
+            content(f)
+
+# Runs every item through read -> render -> write. Items are consumed
+# lazily, in order, and rendered in that order. The first failed read,
+# render or write is raised once the pending writes have finished.
+def run_pipeline(items: Iterable[Item], read: ReadFn, render: RenderFn,
+                 io_threads: int = DEFAULT_IO_THREADS,
+                 max_pending: int = DEFAULT_MAX_PENDING) -> PipelineStats:
+    stats = PipelineStats()
+    dirs = DirectoryCache()
+    write_slots = threading.Semaphore(max_pending)
+    write_errors: list[BaseException] = []
+
+    def on_written(future: Future):
+        write_slots.release()
+        if future.exception() is not None:
+            write_errors.append(future.exception())
+
+    with ThreadPoolExecutor(io_threads, thread_name_prefix='read') as readers, \
+            ThreadPoolExecutor(io_threads, thread_name_prefix='write') as writers:
+        pending: deque[tuple[Item, Future]] = deque()
+        items = iter(items)
+        exhausted = False
+
+        while True:
+            # keep up to max_pending reads in flight ahead of the renderer
+            while not exhausted and len(pending) < max_pending:
+                item = next(items, _DONE)
+                if item is _DONE:
+                    exhausted = True
+                    break
+                pending.append((item, readers.submit(read, item)))
+
+            if len(pending) == 0 or len(write_errors) > 0:
+                break
+
+            item, future = pending.popleft()
+            data = future.result()
+            stats.read += 1
+
+            rendered = render(item, data)
+            if rendered is None:
+                stats.skipped += 1
+                continue
+
+            # blocks while max_pending pages are already waiting to be written
+            write_slots.acquire()
+            dest_path, content = rendered
+            writers.submit(write_text, dirs, dest_path, content).add_done_callback(on_written)
+            stats.written += 1
+
+        for _, future in pending:
+            future.cancel()
+
+    if len(write_errors) > 0:
+        raise write_errors[0]
+    return stats
@@ -0,0 +1,167 @@
+import json
+import os
+import time
+from typing import Optional
+
+from htmlnode import HtmlNode
+
+# Build profiler, off unless enable() is called.
+#
+# Code under measurement wraps itself in `with stage('name'):`. While
+# disabled, stage() hands back a shared no-op context manager so the
+# instrumentation costs one function call.
+
+
+class PageProfile:
+    def __init__(self, path: str):
+        self.path = path
+        self.pid = os.getpid()
+        self.start_ns = time.perf_counter_ns()
+        self.end_ns = self.start_ns
+        # (stage, start_ns, duration_ns), in the order the stages finished
+        self.events: list[tuple[str, int, int]] = []
+        self.nodes = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+
+    @property
+    def seconds(self) -> float:
+        return (self.end_ns - self.start_ns) / 1e9
+
+    def stage_totals(self) -> dict[str, tuple[float, int]]:
+        totals = {}
+        for name, _, duration in self.events:
+            seconds, calls = totals.get(name, (0.0, 0))
+            totals[name] = (seconds + duration / 1e9, calls + 1)
+        return totals
+
+    def __repr__(self) -> str:
+        return f'PageProfile({self.path}, seconds={self.seconds:.6f}, nodes={self.nodes})'
+
+
+class _NullStage:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+_NULL_STAGE = _NullStage()
+
+
+class _Stage:
+    def __init__(self, page: PageProfile, name: str):
+        self.page = page
+        self.name = name
+        self.start = 0
+
+    def __enter__(self):
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc):
+        self.page.events.append((self.name, self.start, time.perf_counter_ns() - self.start))
+        return False
+
+
+_enabled = False
+_current: Optional[PageProfile] = None
+_pages: list[PageProfile] = []
+
+def enable():
+    global _enabled
+    _enabled = True
+
+def is_enabled() -> bool:
+    return _enabled
+
+def stage(name: str):
+    if _current is None:
+        return _NULL_STAGE
+    return _Stage(_current, name)
+
+# Starts collecting stages for one page, returns None while disabled
+def begin_page(path: str) -> Optional[PageProfile]:
+    global _current
+    if not _enabled:
+        return None
+    _current = PageProfile(path)
+    return _current
+
+def end_page(page: PageProfile, root: HtmlNode, bytes_in: int, bytes_out: int):
+    global _current
+    page.end_ns = time.perf_counter_ns()
+    page.nodes = count_nodes(root)
+    page.bytes_in = bytes_in
+    page.bytes_out = bytes_out
+    _pages.append(page)
+    _current = None
+
+# Hands over every finished page profile and forgets them
+def take_pages() -> list[PageProfile]:
+    global _pages
+    pages = _pages
+    _pages = []
+    return pages
+
+# Merges profiles collected in another process
+def add_pages(pages: list[PageProfile]):
+    _pages.extend(pages)
+
+def count_nodes(node: HtmlNode) -> int:
+    count = 0
+    stack = [node]
+    while len(stack) > 0:
+        node = stack.pop()
+        count += 1
+        if node.children is not None:
+            stack.extend(node.children)
+    return count
+
+def print_report(pages: list[PageProfile], top: int = 10):
+    if len(pages) == 0:
+        print('LOG: no pages were profiled')
+        return
+
+    print(f'Slowest {min(top, len(pages))} of {len(pages)} pages:')
+    print(f'{"ms":>10} {"nodes":>8} {"KiB in":>8} {"KiB out":>8}  page')
+    for page in sorted(pages, key=lambda p: p.seconds, reverse=True)[:top]:
+        print(f'{page.seconds * 1000:>10.3f} {page.nodes:>8} {page.bytes_in / 1024:>8.1f} '
+              f'{page.bytes_out / 1024:>8.1f}  {page.path}')
+
+    totals = {}
+    for page in pages:
+        for name, (seconds, calls) in page.stage_totals().items():
+            total_seconds, total_calls = totals.get(name, (0.0, 0))
+            totals[name] = (total_seconds + seconds, total_calls + calls)
+
+    page_seconds = sum(page.seconds for page in pages)
+    print()
+    print('Stage totals (blocks, block_type and inline run inside parse, block_type only with --blocks split):')
+    print(f'{"stage":>12} {"ms":>10} {"% page":>7} {"calls":>9}')
+    for name, (seconds, calls) in sorted(totals.items(), key=lambda kv: kv[1][0], reverse=True):
+        share = 100 * seconds / page_seconds if page_seconds > 0 else 0.0
+        print(f'{name:>12} {seconds * 1000:>10.3f} {share:>6.1f}% {calls:>9}')
+    print(f'{"pages":>12} {page_seconds * 1000:>10.3f} {100.0:>6.1f}% {len(pages):>9}')
+
+# Writes the profiles in Chrome trace-event format, loadable in
+# chrome://tracing, Perfetto or speedscope
+def write_trace(pages: list[PageProfile], path: str):
+    events = []
+    for page in pages:
+        events.append({
+            'name': page.path, 'cat': 'page', 'ph': 'X',
+            'ts': page.start_ns / 1000, 'dur': (page.end_ns - page.start_ns) / 1000,
+            'pid': page.pid, 'tid': page.pid,
+            'args': {'nodes': page.nodes, 'bytes_in': page.bytes_in, 'bytes_out': page.bytes_out},
+        })
+        for name, start, duration in page.events:
+            events.append({
+                'name': name, 'cat': 'stage', 'ph': 'X',
+                'ts': start / 1000, 'dur': duration / 1000,
+                'pid': page.pid, 'tid': page.pid,
+            })
+
+    with open(path, 'wt') as f:
+        json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, f)
+    print(f'LOG: wrote trace: {path}')
@@ -0,0 +1,127 @@
+import os
+import os.path
+import shutil
+from contextlib import contextmanager
+from typing import Optional
+
+# Atomic publishing. With it the build works in a staging directory, and
+# publishing snapshots that directory as a numbered release and switches
+# the ./public symlink over to it in one rename, so a server following the
+# link sees either the old site or the new one, never a build in progress,
+# and a crashed build leaves the old site up.
+#
+# A release is made of hardlinks to the staged files, so it costs one link
+# per file and no copying. Every output is written to a temp file and
+# renamed into place, which is what keeps a build from changing a file
+# that an earlier release still links.
+
+STAGE_DIR = '.cache/stage'
+RELEASES_DIR = '.cache/releases'
+KEEP_RELEASES = 3
+
+
+# Opens a temp file next to path, renamed over path once the block
+# finishes. Readers see the old file or the new one, never a partial
+# write, and an error leaves path alone.
+@contextmanager
+def atomic_write(path: str, mode: str = 'wt'):
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    f = open(tmp_path, mode)
+    try:
+        yield f
+        f.close()
+        os.replace(tmp_path, path)
+    except BaseException:
+        f.close()
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+# Mirrors the files under src into dst as hardlinks, returns how many
+def link_tree(src: str, dst: str) -> int:
+    count = 0
+    stack = [(src, dst)]
+    while len(stack) > 0:
+        src_dir, dst_dir = stack.pop()
+        os.makedirs(dst_dir, exist_ok=True)
+        for entry in os.scandir(src_dir):
+            target = os.path.join(dst_dir, entry.name)
+            if entry.is_dir(follow_symlinks=False):
+                stack.append((entry.path, target))
+                continue
+            try:
+                os.link(entry.path, target)
+            except OSError:
+                # e.g. a filesystem without hardlinks
+                shutil.copy2(entry.path, target)
+            count += 1
+    return count
+
+def _release_numbers(releases_dir: str) -> list[int]:
+    if not os.path.isdir(releases_dir):
+        return []
+    return sorted(int(entry.name) for entry in os.scandir(releases_dir) if entry.name.isdigit())
+
+def current_release(link_path: str) -> Optional[str]:
+    if not os.path.islink(link_path):
+        return None
+    return os.path.join(os.path.dirname(link_path), os.readlink(link_path))
+
+# Points link_path at target by renaming a new symlink over it. A real
+# directory (from a build without publishing) can't be replaced in one
+# rename, it is moved aside first and deleted after.
+def switch_link(link_path: str, target: str):
+    rel_target = os.path.relpath(target, os.path.dirname(os.path.abspath(link_path)))
+    tmp_path = link_path + '.tmp'
+    if os.path.lexists(tmp_path):
+        os.remove(tmp_path)
+    os.symlink(rel_target, tmp_path)
+
+    old_dir = None
+    if os.path.isdir(link_path) and not os.path.islink(link_path):
+        old_dir = link_path + '.old'
+        if os.path.isdir(old_dir):
+            shutil.rmtree(old_dir)
+        os.rename(link_path, old_dir)
+        print(f'LOG: moved {link_path} aside to publish releases')
+    os.replace(tmp_path, link_path)
+    if old_dir is not None:
+        shutil.rmtree(old_dir)
+
+# Deletes all but the newest keep releases, never the one link_path
+# points at, and any snapshot a crash left half made
+def prune_releases(releases_dir: str, link_path: str, keep: int = KEEP_RELEASES) -> list[str]:
+    current = current_release(link_path)
+    removed = []
+    numbers = _release_numbers(releases_dir)
+    for number in numbers[:max(0, len(numbers) - keep)]:
+        path = os.path.join(releases_dir, f'{number:06d}')
+        if current is not None and os.path.samefile(path, current):
+            continue
+        shutil.rmtree(path)
+        removed.append(path)
+    for entry in os.scandir(releases_dir):
+        if entry.name.endswith('.tmp'):
+            shutil.rmtree(entry.path)
+            removed.append(entry.path)
+    return removed
+
+# Snapshots stage_dir as the next release and switches link_path to it,
+# returns the release directory
+def publish(stage_dir: str, link_path: str, releases_dir: str = RELEASES_DIR,
+            keep: int = KEEP_RELEASES) -> str:
+    numbers = _release_numbers(releases_dir)
+    release = os.path.join(releases_dir, f'{numbers[-1] + 1 if len(numbers) > 0 else 1:06d}')
+
+    # linked under a temp name so a crash never leaves a partial release
+    # that looks finished
+    tmp_release = release + '.tmp'
+    if os.path.isdir(tmp_release):
+        shutil.rmtree(tmp_release)
+    count = link_tree(stage_dir, tmp_release)
+    os.rename(tmp_release, release)
+
+    switch_link(link_path, release)
+    prune_releases(releases_dir, link_path, keep)
+    print(f'LOG: published {release} ({count} files), {link_path} -> {release}')
+    return release
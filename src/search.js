@@ -0,0 +1,95 @@
+// Client for the search index the build writes next to this file, see
+// search.py. Loads index.json once, then only the term shards and doc
+// chunks a query needs.
+//
+//   <script src="/search/search.js"></script>
+//   siteSearch('tom bomb').then(results => ...)  // [{url, title, score}]
+(function () {
+  const root = new URL('.', document.currentScript.src).href;
+  const BASE64 = 'ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789+/';
+  const loaded = new Map();
+  let meta = null;
+
+  function load(path) {
+    if (!loaded.has(path)) {
+      loaded.set(path, fetch(root + path).then(r => r.ok ? r.json() : {}));
+    }
+    return loaded.get(path);
+  }
+
+  // the same as count_terms() in search.py: split into words, then fold
+  // each one, then keep those of 2 to 32 characters
+  function terms(text) {
+    return (text.toLowerCase().match(/[\p{L}\p{N}]+/gu) || [])
+      .map(t => t.normalize('NFKD').replace(/\p{M}/gu, ''))
+      .filter(t => {
+        const length = Array.from(t).length;
+        return length >= 2 && length <= 32;
+      });
+  }
+
+  function bucketName(term) {
+    return Array.from(term).slice(0, meta.prefix)
+      .map(c => /[a-z0-9]/.test(c) ? c : '_' + c.codePointAt(0).toString(16)).join('');
+  }
+
+  // posting list -> Map of document id to count
+  function decode(text) {
+    const values = [];
+    let value = 0, shift = 0;
+    for (const c of text) {
+      const digit = BASE64.indexOf(c);
+      value += (digit & 31) * 2 ** shift;
+      if (digit & 32) {
+        shift += 5;
+      } else {
+        values.push(value);
+        value = shift = 0;
+      }
+    }
+    const postings = new Map();
+    for (let i = 0, doc = 0; i < values.length; i += 2) {
+      doc += values[i];
+      postings.set(doc, values[i + 1]);
+    }
+    return postings;
+  }
+
+  // Documents matching every word, the last one as a prefix, best first
+  async function siteSearch(query, limit = 20) {
+    meta = meta || await load('index.json');
+    const words = terms(query);
+    let scores = null;
+    for (let i = 0; i < words.length; i++) {
+      const name = bucketName(words[i]);
+      const shard = meta.shards.includes(name) ? await load(`t/${name}.json`) : {};
+      const matched = new Map();
+      for (const term in shard) {
+        if (term !== words[i] && !(i === words.length - 1 && term.startsWith(words[i]))) {
+          continue;
+        }
+        const postings = decode(shard[term]);
+        const idf = Math.log(1 + meta.docs / postings.size);
+        for (const [doc, count] of postings) {
+          matched.set(doc, (matched.get(doc) || 0) + count * idf);
+        }
+      }
+      if (scores !== null) {
+        for (const doc of matched.keys()) {
+          if (!scores.has(doc)) matched.delete(doc);
+          else matched.set(doc, matched.get(doc) + scores.get(doc));
+        }
+      }
+      scores = matched;
+    }
+
+    const best = Array.from(scores || []).sort((a, b) => b[1] - a[1]).slice(0, limit);
+    return Promise.all(best.map(async ([doc, score]) => {
+      const docs = await load(`docs/${Math.floor(doc / meta.chunk)}.json`);
+      const [url, title] = docs[doc % meta.chunk];
+      return {url, title, score};
+    }));
+  }
+
+  window.siteSearch = siteSearch;
+})();
@@ -0,0 +1,333 @@
+import html
+import json
+import os
+import os.path
+import re
+import unicodedata
+from collections import Counter
+from typing import Callable, Optional
+
+from htmlnode import HtmlNode, LeafNode, ParentNode
+from listings import page_url, write_output
+from manifest import BuildManifest, GENERATED, PAGES
+from publish import atomic_write
+
+# Site search without a server: an inverted index of the words on every
+# page, written as static files that search.js fetches as it needs them.
+#
+#   search/index.json         version, layout and the shards that exist
+#   search/docs/0.json, ...   [url, title] of each document id, in chunks
+#   search/t/to.json, ...     terms by their first two letters, each with
+#                             its posting list
+#   search/search.js          the client
+#
+# A query only loads the shards of its terms' prefixes, and since a shard
+# holds every term with that prefix, the last word of a query can be
+# matched as a prefix while it is typed.
+#
+# A posting list is (document id delta, count) pairs as base64 VLQs, the
+# encoding source maps use, sorted by document id.
+#
+# Only pages whose markdown changed since the last build are indexed
+# again, and only the shards and doc chunks they touch are rewritten. What
+# every document was indexed from is kept in .cache/search/state.json,
+# the postings themselves are read back from the shards that were written.
+
+SEARCH_DIR = 'search'
+STATE_PATH = '.cache/search/state.json'
+SEARCH_VERSION = 1
+PREFIX_LENGTH = 2
+DOCS_PER_CHUNK = 256
+MIN_TERM_LENGTH = 2
+MAX_TERM_LENGTH = 32
+CLIENT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'search.js')
+
+# text inside these isn't indexed
+SKIP_TAGS = {'code', 'pre', 'script', 'style'}
+# the rest end a word, e.g. the </p> between two paragraphs
+INLINE_TAGS = {'a', 'abbr', 'b', 'em', 'i', 'img', 'mark', 's', 'small', 'span', 'strong', 'sub', 'sup', 'u'}
+
+_TERM = re.compile(r'[^\W_]+')
+# regions of rendered html that aren't indexed, the inline tags that are
+# dropped and the rest of the markup, which ends a word
+_SKIPPED = re.compile(r'<(%s)\b[^>]*>.*?</\1\s*>' % '|'.join(sorted(SKIP_TAGS)), re.S | re.I)
+_INLINE_TAG = re.compile(r'</?(?:%s)\b[^>]*>' % '|'.join(sorted(INLINE_TAGS)), re.I)
+_MARKUP = re.compile(r'<!--.*?-->|<[^>]*>', re.S)
+_BASE64 = 'ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789+/'
+_BASE64_VALUES = {c: i for i, c in enumerate(_BASE64)}
+
+
+# Lowercased and with accents dropped, so 'Éowyn' is found as 'eowyn'
+def fold(text: str) -> str:
+    text = unicodedata.normalize('NFKD', text.lower())
+    return ''.join(c for c in text if not unicodedata.combining(c))
+
+# How often each term is in text. Folding is only needed for the few
+# distinct terms that aren't ascii, not the whole text.
+def count_terms(text: str) -> Counter:
+    terms = Counter()
+    for term, count in Counter(_TERM.findall(text.lower())).items():
+        if not term.isascii():
+            term = fold(term)
+        if MIN_TERM_LENGTH <= len(term) <= MAX_TERM_LENGTH:
+            terms[term] += count
+    return terms
+
+# The shard a term is in. Anything but a-z and 0-9 is spelled as _ and its
+# code point in hex, so shard names are safe file names.
+def bucket_name(term: str) -> str:
+    return ''.join(c if 'a' <= c <= 'z' or '0' <= c <= '9' else f'_{ord(c):x}' for c in term[:PREFIX_LENGTH])
+
+
+# Appends the text of html to out, without markup or what is inside
+# SKIP_TAGS. The html is what the renderer wrote, so tags are found with
+# regexes rather than an html parser, which is several times slower.
+def html_text(markup: str, out: list[str]):
+    markup = _SKIPPED.sub(' ', markup)
+    markup = _INLINE_TAG.sub('', markup)
+    out.append(_MARKUP.sub(' ', markup))
+
+# The visible text of a page body. The tree is walked without recursion.
+# Nodes that only hold html, e.g. a body from the parse cache or a block
+# from the fragment cache, have their html scanned.
+def node_text(node: HtmlNode) -> str:
+    out = []
+    # nodes, and the separators to write once a block's children are done
+    stack: list[HtmlNode | str] = [node]
+    while len(stack) > 0:
+        node = stack.pop()
+        if isinstance(node, str):
+            out.append(node)
+        elif node.tag in SKIP_TAGS or node.tag == 'img':
+            continue
+        elif isinstance(node, ParentNode):
+            if node.tag not in INLINE_TAGS:
+                out.append(' ')
+                stack.append(' ')
+            stack.extend(reversed(node.children))
+        elif isinstance(node, LeafNode):
+            block = node.tag is not None and node.tag not in INLINE_TAGS
+            if block:
+                out.append(' ')
+            # inline html written in the markdown
+            if '<' in node.value:
+                html_text(node.value, out)
+            else:
+                out.append(node.value)
+            if block:
+                out.append(' ')
+        else:
+            html_text(node.to_html(), out)
+    text = ''.join(out)
+    return html.unescape(text) if '&' in text else text
+
+def node_terms(node: HtmlNode) -> Counter:
+    return count_terms(node_text(node))
+
+
+def encode_vlq(values: list[int]) -> str:
+    out = []
+    for value in values:
+        while True:
+            digit = value & 31
+            value >>= 5
+            if value > 0:
+                out.append(_BASE64[digit | 32])
+            else:
+                out.append(_BASE64[digit])
+                break
+    return ''.join(out)
+
+def decode_vlq(text: str) -> list[int]:
+    values = []
+    value = shift = 0
+    for c in text:
+        digit = _BASE64_VALUES[c]
+        value |= (digit & 31) << shift
+        if digit & 32:
+            shift += 5
+        else:
+            values.append(value)
+            value = shift = 0
+    return values
+
+# {document id: count} <-> its posting list
+def encode_postings(postings: dict[int, int]) -> str:
+    values = []
+    last = 0
+    for doc in sorted(postings):
+        values.append(doc - last)
+        values.append(postings[doc])
+        last = doc
+    return encode_vlq(values)
+
+def decode_postings(text: str) -> dict[int, int]:
+    values = decode_vlq(text)
+    postings = {}
+    doc = 0
+    for i in range(0, len(values), 2):
+        doc += values[i]
+        postings[doc] = values[i + 1]
+    return postings
+
+
+def _output_key(rel: str) -> str:
+    return f'search:{rel}'
+
+def _dump(data) -> str:
+    return json.dumps(data, ensure_ascii=False, separators=(',', ':'), sort_keys=True)
+
+
+# What every document id was indexed from: [src, url, title, markdown
+# hash, shards its terms are in], None for ids free to reuse
+class SearchIndex:
+    def __init__(self, output_dir: str, path: str = STATE_PATH):
+        self.output_dir = output_dir
+        self.path = path
+        self.docs: list[Optional[list]] = []
+        self.ids: dict[str, int] = {}
+        # False until loaded from a saved state, the shards on disk are only
+        # read back then
+        self.loaded = False
+
+    # Starts empty when the state is missing, of another version or build
+    # directory, or when the manifest has lost the files it describes
+    @classmethod
+    def load(cls, manifest: BuildManifest, output_dir: str, path: str = STATE_PATH) -> 'SearchIndex':
+        index = cls(output_dir, path)
+        if not os.path.exists(path):
+            return index
+        with open(path, 'rt') as f:
+            data = json.load(f)
+        if data.get('version') != SEARCH_VERSION or data.get('output') != output_dir:
+            return index
+        entry = manifest.get(GENERATED, _output_key('index.json'))
+        if entry is None or not os.path.exists(entry['dest']):
+            print('LOG: search index output missing, indexing every page')
+            return index
+
+        index.docs = data['docs']
+        index.loaded = True
+        index.ids = {doc[0]: id for id, doc in enumerate(index.docs) if doc is not None}
+        return index
+
+    def save(self):
+        os.makedirs(os.path.split(self.path)[0], exist_ok=True)
+        with atomic_write(self.path) as f:
+            json.dump({'version': SEARCH_VERSION, 'output': self.output_dir, 'docs': self.docs}, f,
+                      separators=(',', ':'))
+
+    def _path(self, rel: str) -> str:
+        return os.path.join(self.output_dir, SEARCH_DIR, rel.replace('/', os.sep))
+
+    def _shard_rel(self, name: str) -> str:
+        return f't/{name}.json'
+
+    def _read_shard(self, manifest: BuildManifest, name: str) -> dict[str, dict[int, int]]:
+        entry = manifest.get(GENERATED, _output_key(self._shard_rel(name)))
+        if not self.loaded or entry is None or not os.path.exists(entry['dest']):
+            return {}
+        with open(entry['dest'], 'rt') as f:
+            return {term: decode_postings(postings) for term, postings in json.load(f).items()}
+
+    # Brings the index up to date with the pages in manifest, returns how
+    # many outputs changed. terms(src, entry) returns (title, term counts)
+    # of a page, it is only called for pages whose markdown changed.
+    def update(self, manifest: BuildManifest, terms: Callable[[str, dict], tuple[str, Counter]]) -> int:
+        pages = {src: entry for src, entry in manifest.entries[PAGES].items()
+                 if entry.get('meta', {}).get('draft') != 'true'}
+
+        removed = [src for src in self.ids if src not in pages]
+        changed = {}
+        for src, entry in pages.items():
+            url = page_url(entry['dest'], self.output_dir)
+            id = self.ids.get(src)
+            if id is not None and self.docs[id][3] == entry['hash'] and self.docs[id][1] == url:
+                continue
+            title, counts = terms(src, entry)
+            changed[src] = (url, title, entry['hash'], counts)
+
+        # every shard and doc chunk a removed, old or new posting is in
+        touched_shards = set()
+        touched_chunks = set()
+        old_ids = set()
+        for src in removed + list(changed):
+            id = self.ids.get(src)
+            if id is None:
+                continue
+            old_ids.add(id)
+            touched_shards.update(self.docs[id][4])
+            touched_chunks.add(id // DOCS_PER_CHUNK)
+            self.docs[id] = None
+            del self.ids[src]
+
+        # ids are reused lowest first, so documents keep their ids and
+        # chunks of ids stay the same from build to build. Ids aren't
+        # compacted, that would touch every shard, so after a removal they
+        # can differ from a fresh build's while the documents and postings
+        # found are the same
+        free = [id for id in range(len(self.docs) - 1, -1, -1) if self.docs[id] is None]
+        new_postings: dict[str, dict[str, dict[int, int]]] = {}
+        for src, (url, title, digest, counts) in sorted(changed.items()):
+            if len(free) > 0:
+                id = free.pop()
+            else:
+                id = len(self.docs)
+                self.docs.append(None)
+            buckets = {term: bucket_name(term) for term in counts}
+            shards = sorted(set(buckets.values()))
+            self.docs[id] = [src, url, title, digest, shards]
+            self.ids[src] = id
+            touched_chunks.add(id // DOCS_PER_CHUNK)
+            for term, count in counts.items():
+                new_postings.setdefault(buckets[term], {}).setdefault(term, {})[id] = count
+        touched_shards.update(new_postings)
+        while len(self.docs) > 0 and self.docs[-1] is None:
+            self.docs.pop()
+
+        written = 0
+        for name in sorted(touched_shards):
+            shard = self._read_shard(manifest, name)
+            for term in list(shard):
+                postings = shard[term]
+                for id in old_ids.intersection(postings):
+                    del postings[id]
+                if len(postings) == 0:
+                    del shard[term]
+            for term, postings in new_postings.get(name, {}).items():
+                shard.setdefault(term, {}).update(postings)
+            # empty shards aren't written, and get pruned
+            if len(shard) > 0:
+                written += self._write(manifest, self._shard_rel(name),
+                                       {term: encode_postings(postings) for term, postings in shard.items()})
+
+        for chunk in range((len(self.docs) + DOCS_PER_CHUNK - 1) // DOCS_PER_CHUNK):
+            rel = f'docs/{chunk}.json'
+            if chunk not in touched_chunks and manifest.get(GENERATED, _output_key(rel)) is not None:
+                manifest.keep(GENERATED, _output_key(rel))
+                continue
+            docs = self.docs[chunk * DOCS_PER_CHUNK:(chunk + 1) * DOCS_PER_CHUNK]
+            written += self._write(manifest, rel, [doc[1:3] if doc is not None else 0 for doc in docs])
+
+        shards = sorted({name for doc in self.docs if doc is not None for name in doc[4]})
+        for name in shards:
+            if name not in touched_shards:
+                manifest.keep(GENERATED, _output_key(self._shard_rel(name)))
+        # docs is what search.js weighs terms with, so freed ids don't count
+        written += self._write(manifest, 'index.json', {
+            'version': SEARCH_VERSION, 'prefix': PREFIX_LENGTH, 'chunk': DOCS_PER_CHUNK,
+            'docs': len(self.ids), 'shards': shards,
+        })
+        with open(CLIENT_PATH, 'rt') as f:
+            client = f.read()
+        written += write_output(manifest, _output_key('search.js'), self._path('search.js'),
+                                lambda sink: sink.write(client))
+
+        self.save()
+        print(f'LOG: search index: {len(changed)} pages indexed, {len(removed)} removed, '
+              f'{len(touched_shards)} shards touched')
+        return written
+
+    def _write(self, manifest: BuildManifest, rel: str, data) -> bool:
+        text = _dump(data)
+        return write_output(manifest, _output_key(rel), self._path(rel), lambda sink: sink.write(text))
@@ -0,0 +1,124 @@
+import hashlib
+import heapq
+import json
+import os
+import os.path
+import shutil
+from typing import Optional
+
+from manifest import BuildManifest, PAGES
+
+# Sharded builds: the pages are split into deterministic shards that build
+# independently, on separate processes or machines sharing the source
+# tree, each into its own staging directory with a partial manifest.
+# merge_shards() then moves their outputs into place and folds the partial
+# manifests into the main one.
+#
+# .cache/shards/3/public/...              pages rendered by shard 3
+# .cache/shards/3/partial-manifest.json   what shard 3 built and skipped
+
+SHARD_DIR = '.cache/shards'
+PARTIAL_MANIFEST_NAME = 'partial-manifest.json'
+PARTIAL_VERSION = 1
+
+
+# Stable across processes and machines, unlike hash()
+def path_hash(path: str) -> int:
+    return int.from_bytes(hashlib.blake2b(path.encode(), digest_size=8).digest(), 'big')
+
+# Splits pages (src, dst, size) into shards of about the same amount of
+# markdown, returns {src: shard}. Biggest pages go first, each onto the
+# lightest shard, with ties broken by path hash, so every node computes
+# the same split from the same tree.
+def assign_shards(pages: list[tuple[str, str, int]], shards: int) -> dict[str, int]:
+    if shards < 1:
+        raise ValueError(f'need at least one shard: {shards}')
+
+    loads = [(0, index) for index in range(shards)]
+    assigned = {}
+    for src, _, size in sorted(pages, key=lambda page: (-page[2], path_hash(page[0]), page[0])):
+        load, index = heapq.heappop(loads)
+        assigned[src] = index
+        heapq.heappush(loads, (load + size, index))
+    return assigned
+
+def shard_dir(index: int, root: str = SHARD_DIR) -> str:
+    return os.path.join(root, str(index))
+
+def stage_path(dest: str, public_dir: str, index: int, root: str = SHARD_DIR) -> str:
+    return os.path.join(shard_dir(index, root), 'public', os.path.relpath(dest, public_dir))
+
+
+# What one shard did: the pages it rendered into its staging directory,
+# with what each recorded (dependencies, metadata), and every page it
+# owns, rendered or not, so the merge knows not to prune them.
+class PartialManifest:
+    def __init__(self, shards: int, index: int, template_hash: Optional[str]):
+        self.shards = shards
+        self.index = index
+        self.template_hash = template_hash
+        self.pages: dict[str, dict] = {}
+        self.seen: list[str] = []
+
+    # info is what BuildManifest.record() takes besides the hash and dest
+    def record(self, src: str, digest: str, dest: str, info: dict):
+        self.pages[src] = {'hash': digest, 'dest': dest, 'info': info}
+        self.seen.append(src)
+
+    def keep(self, src: str):
+        self.seen.append(src)
+
+    def save(self, root: str = SHARD_DIR):
+        path = os.path.join(shard_dir(self.index, root), PARTIAL_MANIFEST_NAME)
+        os.makedirs(os.path.split(path)[0], exist_ok=True)
+        data = {
+            'version': PARTIAL_VERSION, 'shards': self.shards, 'index': self.index,
+            'template': self.template_hash, 'pages': self.pages, 'seen': self.seen,
+        }
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'wt') as f:
+            json.dump(data, f, indent=1, sort_keys=True)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, shards: int, index: int, root: str = SHARD_DIR) -> 'PartialManifest':
+        path = os.path.join(shard_dir(index, root), PARTIAL_MANIFEST_NAME)
+        if not os.path.exists(path):
+            raise Exception(f'shard {index} of {shards} has not been built: {path}')
+        with open(path, 'rt') as f:
+            data = json.load(f)
+        if data.get('version') != PARTIAL_VERSION or data['shards'] != shards or data['index'] != index:
+            raise Exception(f'{path} is not shard {index} of {shards}')
+
+        partial = cls(shards, index, data['template'])
+        partial.pages = data['pages']
+        partial.seen = data['seen']
+        return partial
+
+
+# Moves the pages every shard rendered into public_dir and records them in
+# manifest, returns how many were moved. Every partial manifest is loaded
+# and checked against the template digest first, so a missing or
+# mismatched shard stops the merge before anything is touched. The staging
+# directories are deleted afterwards.
+def merge_shards(manifest: BuildManifest, shards: int, public_dir: str, template_hash: str,
+                 root: str = SHARD_DIR) -> int:
+    partials = [PartialManifest.load(shards, index, root) for index in range(shards)]
+    for partial in partials:
+        if partial.template_hash != template_hash:
+            raise Exception(f'shard {partial.index} was built with a different template or settings')
+
+    moved = 0
+    for partial in partials:
+        for src, entry in partial.pages.items():
+            os.makedirs(os.path.split(entry['dest'])[0], exist_ok=True)
+            os.replace(stage_path(entry['dest'], public_dir, partial.index, root), entry['dest'])
+            manifest.record(PAGES, src, entry['hash'], entry['dest'], **entry['info'])
+            moved += 1
+        for src in partial.seen:
+            manifest.keep(PAGES, src)
+
+    for partial in partials:
+        shutil.rmtree(shard_dir(partial.index, root))
+    print(f'LOG: merged {shards} shards, {moved} pages moved into {public_dir}')
+    return moved
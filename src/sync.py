@@ -0,0 +1,173 @@
+import os
+import os.path
+import shutil
+from typing import Optional
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+from manifest import BuildManifest, ASSETS, hash_file
+
+# Delta sync of static assets into the output directory.
+#
+# Only new or changed files are copied, copies keep the source mtime, and
+# files removed from the source are removed from the output. Whether a
+# file changed is decided by size + mtime (cheap, the default) or by
+# content hash (slower, immune to touch and clock skew).
+
+COMPARE_MTIME = 'mtime'
+COMPARE_HASH = 'hash'
+
+# linux ioctl to share extents between two files (btrfs, xfs, ...)
+_FICLONE = 0x40049409
+
+
+def _reflink(src_fd: int, dst_fd: int) -> bool:
+    if fcntl is None:
+        return False
+    try:
+        fcntl.ioctl(dst_fd, _FICLONE, src_fd)
+        return True
+    except (OSError, AttributeError):
+        return False
+
+def _copy_range(src_fd: int, dst_fd: int, size: int) -> bool:
+    if not hasattr(os, 'copy_file_range'):
+        return False
+    try:
+        copied = 0
+        while copied < size:
+            n = os.copy_file_range(src_fd, dst_fd, size - copied)
+            if n == 0:
+                break
+            copied += n
+        return copied == size
+    except OSError:
+        return False
+
+# Copies src to dst keeping its mtime, preferring the cheapest method the
+# filesystem supports: a hardlink if asked for, then a reflink, then an
+# in-kernel copy_file_range, then a plain copy.
+#
+# dst is replaced by rename so readers never see a half written file,
+# which also means a hardlinked dst is never modified in place.
+def copy_file(src_path: str, dst_path: str, hardlink: bool = False) -> str:
+    dir_part = os.path.split(dst_path)[0]
+    os.makedirs(dir_part, exist_ok=True)
+    tmp_path = dst_path + '.tmp'
+    if os.path.lexists(tmp_path):
+        os.remove(tmp_path)
+
+    if hardlink:
+        try:
+            os.link(src_path, tmp_path)
+            os.replace(tmp_path, dst_path)
+            print(f'LOG: linking asset: {src_path} -> {dst_path}')
+            return 'hardlink'
+        except OSError:
+            # e.g. a different filesystem, fall through to copying
+            pass
+
+    method = 'copy'
+    with open(src_path, 'rb') as src, open(tmp_path, 'wb') as dst:
+        size = os.fstat(src.fileno()).st_size
+        if _reflink(src.fileno(), dst.fileno()):
+            method = 'reflink'
+        elif _copy_range(src.fileno(), dst.fileno(), size):
+            method = 'copy_file_range'
+        else:
+            dst.truncate(0)
+            dst.seek(0)
+            src.seek(0)
+            shutil.copyfileobj(src, dst)
+
+    shutil.copystat(src_path, tmp_path)
+    os.replace(tmp_path, dst_path)
+    print(f'LOG: copying asset ({method}): {src_path} -> {dst_path}')
+    return method
+
+def _walk_files(root: str):
+    stack = [root]
+    while len(stack) > 0:
+        for entry in os.scandir(stack.pop()):
+            if entry.is_dir():
+                stack.append(entry.path)
+            else:
+                yield entry
+
+def _dst_matches(dst_path: str, st: os.stat_result) -> bool:
+    try:
+        dst_st = os.stat(dst_path)
+    except FileNotFoundError:
+        return False
+    return dst_st.st_size == st.st_size and dst_st.st_mtime_ns == st.st_mtime_ns
+
+# Copies only the files under src that are new or changed since the last
+# build, and deletes copies of files that were removed from src.
+# renames maps source paths to the output path to use instead of the
+# mirrored one, skip holds source paths published some other way, e.g.
+# rewritten stylesheets. Returns the number of files copied.
+def sync_static(dst: str, src: str, manifest: BuildManifest,
+                compare: str = COMPARE_MTIME, hardlink: bool = False,
+                renames: Optional[dict[str, str]] = None, skip: Optional[set[str]] = None) -> int:
+    if os.path.exists(dst) and not os.path.isdir(dst):
+        print(f'LOG: dst is not a directory!')
+        raise Exception('dst is not a directory!')
+
+    if not os.path.isdir(src):
+        print(f'LOG: src is not a directory!: {src}')
+        raise Exception(f'src is not a directory!: {src}')
+
+    copied = 0
+    for entry in _walk_files(src):
+        src_path = os.path.normpath(entry.path)
+        if skip is not None and src_path in skip:
+            continue
+        dst_path = os.path.normpath(os.path.join(dst, os.path.relpath(src_path, src)))
+        if renames is not None:
+            dst_path = renames.get(src_path, dst_path)
+        st = entry.stat()
+
+        if sync_asset(src_path, dst_path, manifest, compare, hardlink, st):
+            copied += 1
+
+    manifest.prune(ASSETS)
+    return copied
+
+# Brings one asset up to date, returns True if it had to be copied
+def sync_asset(src_path: str, dst_path: str, manifest: BuildManifest,
+               compare: str = COMPARE_MTIME, hardlink: bool = False,
+               st: Optional[os.stat_result] = None) -> bool:
+    if st is None:
+        st = os.stat(src_path)
+
+    entry = manifest.get(ASSETS, src_path)
+    if compare == COMPARE_MTIME:
+        if (entry is not None and entry['dest'] == dst_path
+                and entry.get('size') == st.st_size and entry.get('mtime_ns') == st.st_mtime_ns
+                and _dst_matches(dst_path, st)):
+            manifest.keep(ASSETS, src_path)
+            return False
+        digest = hash_file(src_path)
+        if manifest.is_current(ASSETS, src_path, digest, dst_path):
+            # only touched, bring the copy's mtime in line instead of copying.
+            # The entry is updated in place, it still describes the same
+            # output, e.g. its compressed siblings.
+            os.utime(dst_path, ns=(st.st_atime_ns, st.st_mtime_ns))
+            entry['size'] = st.st_size
+            entry['mtime_ns'] = st.st_mtime_ns
+            manifest.keep(ASSETS, src_path)
+            return False
+    else:
+        digest = hash_file(src_path)
+        if manifest.is_current(ASSETS, src_path, digest, dst_path):
+            return False
+
+    if entry is not None and entry['dest'] != dst_path:
+        # renamed, e.g. a new content hash, the old copy goes
+        manifest.remove(ASSETS, src_path)
+    copy_file(src_path, dst_path, hardlink)
+    manifest.record(ASSETS, src_path, digest, dst_path, size=st.st_size, mtime_ns=st.st_mtime_ns)
+    return True
@@ -0,0 +1,170 @@
+import hashlib
+import io
+import os
+import re
+from typing import Optional, Union
+
+from htmlnode import HtmlNode, Sink
+from minify import minify_css, minify_html
+
+SLOT_PATTERN = re.compile(r'\{\{\s*(\w+)\s*\}\}')
+
+SlotValue = Union[str, HtmlNode]
+
+
+# A template parsed once into literal chunks and named slots.
+#
+# chunks always has one more entry than slots, rendering writes
+# chunks[0], slots[0], chunks[1], slots[1], ... chunks[-1]
+class Template:
+    def __init__(self, chunks: list[str], slots: list[str], placeholders: Optional[list[str]] = None):
+        if len(chunks) != len(slots) + 1:
+            raise ValueError('need exactly one more chunk than slots')
+        self.chunks = chunks
+        self.slots = slots
+        # original text of each slot, written back when it has no value
+        if placeholders is None:
+            placeholders = [f'{{{{ {slot} }}}}' for slot in slots]
+        self.placeholders = placeholders
+
+    @classmethod
+    def parse(cls, text: str) -> 'Template':
+        chunks = []
+        slots = []
+        placeholders = []
+        pos = 0
+        for m in SLOT_PATTERN.finditer(text):
+            chunks.append(text[pos:m.start()])
+            slots.append(m.group(1))
+            placeholders.append(m.group(0))
+            pos = m.end()
+        chunks.append(text[pos:])
+        return cls(chunks, slots, placeholders)
+
+    # Streams the page into sink. Strings are written as-is, html nodes
+    # through write_html. Slots without a value are left in place.
+    def write(self, sink: Sink, values: dict[str, SlotValue]):
+        sink.write(self.chunks[0])
+        for slot, placeholder, chunk in zip(self.slots, self.placeholders, self.chunks[1:]):
+            value = values.get(slot)
+            if value is None:
+                sink.write(placeholder)
+            elif isinstance(value, str):
+                sink.write(value)
+            else:
+                value.write_html(sink)
+            sink.write(chunk)
+
+    def render(self, values: dict[str, SlotValue]) -> str:
+        builder = io.StringIO()
+        self.write(builder, values)
+        return builder.getvalue()
+
+    def __repr__(self) -> str:
+        return f'Template(slots={self.slots})'
+
+
+_minify = False
+_inline_css_dir: Optional[str] = None
+_asset_urls: Optional[dict[str, str]] = None
+
+# How templates are prepared when loaded: minified, and with local
+# stylesheets from inline_css_dir inlined into a <style> element
+def set_template_options(minify: bool = False, inline_css_dir: Optional[str] = None):
+    global _minify, _inline_css_dir
+    _minify = minify
+    _inline_css_dir = inline_css_dir
+    _template_cache.clear()
+
+# Rewrites href and src values naming an asset to its hashed url, see
+# assets.py
+def set_asset_urls(urls: Optional[dict[str, str]]):
+    global _asset_urls
+    _asset_urls = urls
+    _template_cache.clear()
+
+_LINK_RE = re.compile(r'<link\b[^>]*>', re.I)
+_STYLESHEET_RE = re.compile(r'\brel\s*=\s*["\']?stylesheet\b', re.I)
+_HREF_RE = re.compile(r'\bhref\s*=\s*(?:"([^"]*)"|\'([^\']*)\'|([^\s>]+))', re.I)
+
+# Replaces links to stylesheets found under static_dir with their
+# content. Returns the new text and the stylesheets that were inlined.
+def inline_stylesheets(text: str, static_dir: str) -> tuple[str, list[str]]:
+    inlined = []
+
+    def replace(m: re.Match) -> str:
+        tag = m.group(0)
+        href = _HREF_RE.search(tag)
+        if _STYLESHEET_RE.search(tag) is None or href is None:
+            return tag
+
+        url = next(group for group in href.groups() if group is not None)
+        if '//' in url:
+            # another site's stylesheet
+            return tag
+        path = os.path.normpath(os.path.join(static_dir, url.split('?')[0].lstrip('/')))
+        if not os.path.isfile(path):
+            return tag
+
+        with open(path, 'rt') as f:
+            css = f.read()
+        if _minify:
+            css = minify_css(css)
+        inlined.append(path)
+        return f'<style>{css}</style>'
+
+    return _LINK_RE.sub(replace, text), inlined
+
+_URL_ATTR_RE = re.compile(r'\b(href|src)(\s*=\s*)(?:"([^"]*)"|\'([^\']*)\'|([^\s>"\']+))', re.I)
+
+def rewrite_asset_urls(text: str, urls: dict[str, str]) -> str:
+    def replace(m: re.Match) -> str:
+        for group, quote in ((3, '"'), (4, "'"), (5, '')):
+            if m.group(group) is not None:
+                break
+        new_url = urls.get(m.group(group))
+        if new_url is None:
+            return m.group(0)
+        return f'{m.group(1)}{m.group(2)}{quote}{new_url}{quote}'
+
+    return _URL_ATTR_RE.sub(replace, text)
+
+# path -> (inputs with their (mtime_ns, size), Template, digest)
+_template_cache: dict[str, tuple[list[tuple[str, tuple[int, int]]], Template, str]] = {}
+
+def _stat_key(path: str) -> tuple[int, int]:
+    st = os.stat(path)
+    return st.st_mtime_ns, st.st_size
+
+def _load(path: str) -> tuple[list[tuple[str, tuple[int, int]]], Template, str]:
+    cached = _template_cache.get(path)
+    if cached is not None and all(_stat_key(p) == key for p, key in cached[0]):
+        return cached
+
+    inputs = [(path, _stat_key(path))]
+    with open(path, 'rt') as f:
+        text = f.read()
+    if _inline_css_dir is not None:
+        text, stylesheets = inline_stylesheets(text, _inline_css_dir)
+        inputs.extend((p, _stat_key(p)) for p in stylesheets)
+    if _asset_urls is not None:
+        text = rewrite_asset_urls(text, _asset_urls)
+    if _minify:
+        text = minify_html(text)
+
+    cached = (inputs, Template.parse(text), hashlib.sha256(text.encode()).hexdigest())
+    _template_cache[path] = cached
+    return cached
+
+# Parses the template at path once per build. Its files are stat'ed on
+# every call so an edited template is picked up without restarting.
+def load_template(path: str) -> Template:
+    return _load(path)[1]
+
+# Hash of the template as pages see it, options and inlined files included
+def template_digest(path: str) -> str:
+    return _load(path)[2]
+
+# Every file the template is made from, itself first
+def template_inputs(path: str) -> list[str]:
+    return [p for p, _ in _load(path)[0]]
@@ -0,0 +1,100 @@
+import json
+import os
+import tempfile
+import unittest
+
+from assets import ASSET_MANIFEST_NAME, IMAGE_EXTENSIONS, index_assets, publish_rewritten, rewrite_css_urls, write_asset_manifest
+from functions import markdown_to_html_node, set_asset_index
+from manifest import BuildManifest
+from template import rewrite_asset_urls
+
+
+class TestAssets(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.static = os.path.join(self.tmp.name, 'static')
+        self.public = os.path.join(self.tmp.name, 'public')
+        os.makedirs(os.path.join(self.static, 'docs'))
+        for name, content in [('index.css', 'body {}'), ('robots.txt', 'User-agent: *'),
+                              (os.path.join('docs', 'guide.pdf'), '%PDF')]:
+            with open(os.path.join(self.static, name), 'wt') as f:
+                f.write(content)
+        self.manifest = BuildManifest(os.path.join(self.tmp.name, 'manifest.json'))
+
+    def tearDown(self):
+        set_asset_index(None)
+        self.tmp.cleanup()
+
+    def test_index(self):
+        assets = index_assets(self.static, self.public, self.manifest)
+        self.assertEqual(['/docs/guide.pdf', '/index.css'], sorted(assets))
+        css = assets['/index.css']
+        self.assertRegex(css.url, r'^/index\.[0-9a-f]{10}\.css$')
+        self.assertEqual(os.path.join(self.public, css.url[1:]), css.dest)
+
+    def test_links_rewritten(self):
+        assets = index_assets(self.static, self.public, self.manifest)
+        set_asset_index(assets)
+        html = markdown_to_html_node('Read [the guide](/docs/guide.pdf) or [elsewhere](/other.pdf)').to_html()
+        self.assertIn(f'href="{assets["/docs/guide.pdf"].url}"', html)
+        self.assertIn('href="/other.pdf"', html)
+
+    def test_template_rewrite(self):
+        urls = {'/index.css': '/index.0123456789.css'}
+        text = '<link href="/index.css" rel="stylesheet"><a href=\'/index.css\'>x</a><script src=/app.js></script>'
+        self.assertEqual('<link href="/index.0123456789.css" rel="stylesheet"><a href=\'/index.0123456789.css\'>x</a>'
+                         '<script src=/app.js></script>', rewrite_asset_urls(text, urls))
+
+    def test_asset_manifest(self):
+        assets = index_assets(self.static, self.public, self.manifest)
+        write_asset_manifest(self.public, assets)
+        path = os.path.join(self.public, ASSET_MANIFEST_NAME)
+        with open(path, 'rt') as f:
+            self.assertEqual({url: info.url for url, info in assets.items()}, json.load(f))
+
+        write_asset_manifest(self.public, None)
+        self.assertFalse(os.path.exists(path))
+
+
+    def test_css_rewrite(self):
+        urls = {'/images/a.png': '/images/a.0123456789.png', '/fonts.css': '/fonts.abcdefabcd.css'}
+        text = ('a { background: url(/images/a.png) } b { background: url("../images/a.png?v=1") }\n'
+                '@import "../fonts.css"; c { background: url(data:image/png;base64,xx) url(/missing.png) }')
+        self.assertEqual('a { background: url(/images/a.0123456789.png) } '
+                         'b { background: url("../images/a.0123456789.png?v=1") }\n'
+                         '@import "../fonts.abcdefabcd.css"; '
+                         'c { background: url(data:image/png;base64,xx) url(/missing.png) }',
+                         rewrite_css_urls(text, '/css/site.css', urls))
+
+    def write(self, name: str, content: str):
+        path = os.path.join(self.static, name)
+        os.makedirs(os.path.split(path)[0], exist_ok=True)
+        with open(path, 'wt') as f:
+            f.write(content)
+
+    def test_stylesheet_follows_its_images(self):
+        self.write(os.path.join('images', 'a.png'), 'one')
+        self.write('index.css', 'body { background: url(images/a.png) }')
+        assets = index_assets(self.static, self.public, self.manifest)
+        css = assets['/index.css']
+        image_name = os.path.basename(assets['/images/a.png'].url)
+        self.assertEqual(f'body {{ background: url(images/{image_name}) }}'.encode(), css.content)
+
+        self.assertEqual(1, publish_rewritten(self.manifest, assets))
+        with open(css.dest, 'rb') as f:
+            self.assertEqual(css.content, f.read())
+        self.assertEqual(0, publish_rewritten(self.manifest, assets))
+
+        # a new image is a new stylesheet
+        self.write(os.path.join('images', 'a.png'), 'two')
+        self.assertNotEqual(css.url, index_assets(self.static, self.public, self.manifest)['/index.css'].url)
+
+    def test_stylesheet_keeps_its_name_without_css_fingerprints(self):
+        self.write(os.path.join('images', 'a.png'), 'one')
+        self.write('index.css', 'body { background: url(/images/a.png) }')
+        assets = index_assets(self.static, self.public, self.manifest, extensions=IMAGE_EXTENSIONS)
+        self.assertEqual('/index.css', assets['/index.css'].url)
+        self.assertIn(assets['/images/a.png'].url.encode(), assets['/index.css'].content)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,69 @@
+import gzip
+import os
+import tempfile
+import unittest
+
+from compress import MIN_COMPRESS_BYTES, compress_file, compress_outputs
+from manifest import BuildManifest, PAGES, ASSETS
+
+
+class TestCompress(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.dir = self.tmp.name
+        self.manifest = BuildManifest(os.path.join(self.dir, 'manifest.json'))
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def output(self, name: str, content: str, kind: str = PAGES) -> str:
+        path = os.path.join(self.dir, name)
+        with open(path, 'wt') as f:
+            f.write(content)
+        self.manifest.record(kind, 'src/' + name, 'hash', path)
+        return path
+
+    def test_compress_file(self):
+        path = self.output('page.html', '<p>hello</p>' * 100)
+        self.assertIn('.gz', compress_file(path, ['.gz']))
+        with gzip.open(path + '.gz', 'rt') as f:
+            self.assertEqual('<p>hello</p>' * 100, f.read())
+
+    def test_small_files_are_skipped(self):
+        path = self.output('tiny.html', 'x' * (MIN_COMPRESS_BYTES - 1))
+        self.assertEqual([], compress_file(path, ['.gz']))
+        self.assertFalse(os.path.exists(path + '.gz'))
+
+    def test_only_changed_outputs(self):
+        page = self.output('page.html', '<p>a</p>' * 100)
+        self.output('style.css', 'body { color: red; }\n' * 50, ASSETS)
+        self.output('image.png', 'not really a png' * 100, ASSETS)
+        self.assertEqual(2, compress_outputs(self.manifest, True, 2))
+        self.assertFalse(os.path.exists(os.path.join(self.dir, 'image.png.gz')))
+
+        self.assertEqual(0, compress_outputs(self.manifest, True, 2))
+
+        self.output('page.html', '<p>b</p>' * 100)
+        self.assertEqual(1, compress_outputs(self.manifest, True, 2))
+        with gzip.open(page + '.gz', 'rt') as f:
+            self.assertEqual('<p>b</p>' * 100, f.read())
+
+    def test_disabled_removes_siblings(self):
+        page = self.output('page.html', '<p>a</p>' * 100)
+        compress_outputs(self.manifest, True)
+        self.assertTrue(os.path.exists(page + '.gz'))
+
+        compress_outputs(self.manifest, False)
+        self.assertFalse(os.path.exists(page + '.gz'))
+        self.assertNotIn('compressed', self.manifest.get(PAGES, 'src/page.html'))
+
+    def test_removed_output_takes_siblings(self):
+        page = self.output('page.html', '<p>a</p>' * 100)
+        compress_outputs(self.manifest, True)
+        self.manifest.remove(PAGES, 'src/page.html')
+        self.assertFalse(os.path.exists(page))
+        self.assertFalse(os.path.exists(page + '.gz'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,40 @@
+import os
+import random
+import tempfile
+import unittest
+
+from corpus import generate_document, generate_tree, link_dense
+from functions import extract_title, markdown_to_html_node, text_to_textnodes, text_to_textnodes_scan
+
+
+class TestCorpus(unittest.TestCase):
+    def test_seeded(self):
+        a = generate_document(random.Random(7), 30)
+        b = generate_document(random.Random(7), 30)
+        c = generate_document(random.Random(8), 30)
+        self.assertEqual(a, b)
+        self.assertNotEqual(a, c)
+
+    def test_documents_parse(self):
+        rng = random.Random(1)
+        for _ in range(20):
+            md = generate_document(rng, 40)
+            extract_title(md)
+            markdown_to_html_node(md).to_html()
+
+    def test_link_dense_tokenizers_agree(self):
+        text = link_dense(random.Random(2), 200)
+        self.assertEqual(text_to_textnodes(text), text_to_textnodes_scan(text))
+
+    def test_generate_tree(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            paths = generate_tree(tmp, 45, blocks=2, fanout=4)
+            self.assertEqual(45, len(paths))
+            self.assertEqual(45, len(set(paths)))
+            for path in paths:
+                self.assertTrue(os.path.isfile(path))
+            self.assertGreater(max(path.count(os.sep) for path in paths), tmp.count(os.sep) + 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
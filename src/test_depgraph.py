@@ -0,0 +1,93 @@
+import os
+import tempfile
+import unittest
+
+from depgraph import DependencyGraph
+from functions import page_dependencies
+from manifest import BuildManifest, PAGES
+
+
+class TestPageDependencies(unittest.TestCase):
+    def test_page_dependencies(self):
+        markdown = ('# T\n\n![tom](/images/tom.png) and ![remote](https://example.com/x.png)\n\n'
+                    '[home](/) [tom](/blog/tom#top) [guide](/docs/guide.pdf?v=1) [rel](other) [tom again](/blog/tom)')
+        self.assertEqual(['template:template.html', 'asset:/images/tom.png', 'page:/', 'page:/blog/tom',
+                          'asset:/docs/guide.pdf'], page_dependencies(markdown, 'template.html'))
+
+
+class TestDependencyGraph(unittest.TestCase):
+    def test_record_and_remove(self):
+        graph = DependencyGraph()
+        graph.record('a.md', ['template:t.html', 'asset:/x.png'])
+        graph.record('b.md', ['template:t.html'])
+        self.assertEqual({'a.md', 'b.md'}, graph.dependents('template:t.html'))
+
+        # recording again replaces the old edges
+        graph.record('a.md', ['template:t.html', 'asset:/y.png'])
+        self.assertEqual(set(), graph.dependents('asset:/x.png'))
+        self.assertEqual({'a.md'}, graph.dependents('asset:/y.png'))
+
+        graph.remove('a.md')
+        self.assertEqual({'b.md'}, graph.dependents('template:t.html'))
+        self.assertNotIn('asset:/y.png', graph.reverse)
+
+    def test_json_round_trip(self):
+        graph = DependencyGraph()
+        graph.record('a.md', ['template:t.html', 'asset:/x.png'])
+        graph.update_states({'asset:/x.png': '/x.0123456789.png 1x2'})
+
+        loaded = DependencyGraph.from_json(graph.to_json())
+        self.assertEqual(['template:t.html', 'asset:/x.png'], sorted(loaded.dependencies('a.md'), reverse=True))
+        self.assertEqual({'a.md'}, loaded.dependents('asset:/x.png'))
+        self.assertEqual(graph.states, loaded.states)
+
+    def test_invalidate_changed_states(self):
+        graph = DependencyGraph()
+        graph.record('a.md', ['asset:/x.png'])
+        graph.record('b.md', ['asset:/y.png'])
+        graph.record('c.md', ['page:/a'])
+        graph.update_states({'asset:/x.png': '/x.1.png', 'asset:/y.png': '/y.1.png'})
+
+        changed = graph.update_states({'asset:/x.png': '/x.2.png', 'asset:/y.png': '/y.1.png', 'asset:/z.png': '/z.1.png'})
+        self.assertEqual({'asset:/x.png': 'changed', 'asset:/z.png': 'added'}, changed)
+        self.assertEqual({'a.md': '/x.png changed'}, graph.invalidate(changed))
+        self.assertEqual({'asset:/y.png': 'removed'}, graph.update_states({'asset:/x.png': '/x.2.png', 'asset:/z.png': '/z.1.png'}))
+
+
+class TestManifestDependencies(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.dest = os.path.join(self.tmp.name, 'a.html')
+        with open(self.dest, 'wt') as f:
+            f.write('<p>a</p>')
+        self.path = os.path.join(self.tmp.name, 'manifest.json')
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_stale_until_recorded(self):
+        manifest = BuildManifest(self.path)
+        self.assertEqual('not built before', manifest.stale_reason(PAGES, 'a.md', 'abc', self.dest))
+        manifest.record(PAGES, 'a.md', 'abc', self.dest, ['asset:/x.png'])
+        manifest.deps.update_states({'asset:/x.png': '1'})
+        manifest.save()
+
+        loaded = BuildManifest.load(self.path)
+        self.assertIsNone(loaded.stale_reason(PAGES, 'a.md', 'abc', self.dest))
+        self.assertEqual('source changed', loaded.stale_reason(PAGES, 'a.md', 'abd', self.dest))
+
+        loaded.deps.invalidate(loaded.deps.update_states({'asset:/x.png': '2'}))
+        self.assertEqual('/x.png changed', loaded.stale_reason(PAGES, 'a.md', 'abc', self.dest))
+        loaded.record(PAGES, 'a.md', 'abc', self.dest, ['asset:/x.png'])
+        self.assertTrue(loaded.is_current(PAGES, 'a.md', 'abc', self.dest))
+
+    def test_removed_page_leaves_graph(self):
+        manifest = BuildManifest(self.path)
+        manifest.record(PAGES, 'a.md', 'abc', self.dest, ['asset:/x.png'])
+        manifest.remove(PAGES, 'a.md')
+        self.assertEqual(set(), manifest.deps.dependents('asset:/x.png'))
+        self.assertFalse(os.path.exists(self.dest))
+
+
+if __name__ == '__main__':
+    unittest.main()
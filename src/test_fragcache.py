@@ -0,0 +1,76 @@
+import os
+import random
+import tempfile
+import unittest
+
+from corpus import generate_document
+from fragcache import FragmentCache
+from functions import markdown_to_html_node, set_fragment_cache
+
+
+class TestFragmentCache(unittest.TestCase):
+    def test_hits_and_misses(self):
+        cache = FragmentCache('1')
+        key = cache.key('some block')
+        self.assertIsNone(cache.get(key))
+        cache.put(key, '<p>some block</p>')
+        self.assertEqual('<p>some block</p>', cache.get(key))
+        self.assertEqual((1, 1), (cache.hits, cache.misses))
+
+    def test_version_changes_key(self):
+        self.assertNotEqual(FragmentCache('1').key('x'), FragmentCache('2').key('x'))
+
+    def test_lru_eviction(self):
+        cache = FragmentCache('1', max_chars=10)
+        a, b, c = cache.key('a'), cache.key('b'), cache.key('c')
+        cache.put(a, 'aaaa')
+        cache.put(b, 'bbbb')
+        cache.get(a)
+        cache.put(c, 'cccc')
+        self.assertIsNone(cache.get(b))
+        self.assertEqual('aaaa', cache.get(a))
+        self.assertEqual('cccc', cache.get(c))
+        self.assertEqual(1, cache.evictions)
+
+    def test_save_and_load(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'fragments.pickle')
+            cache = FragmentCache('1')
+            cache.put(cache.key('x'), '<p>x</p>')
+            cache.save(path)
+
+            loaded = FragmentCache.load(path, '1')
+            self.assertEqual('<p>x</p>', loaded.get(loaded.key('x')))
+
+            self.assertEqual(0, len(FragmentCache.load(path, '2').entries))
+
+    def test_merge(self):
+        worker = FragmentCache('1')
+        worker.put(worker.key('x'), '<p>x</p>')
+        worker.get(worker.key('x'))
+
+        parent = FragmentCache('1')
+        parent.merge(*worker.take_new())
+        self.assertEqual((1, 0), (parent.hits, parent.misses))
+        self.assertEqual('<p>x</p>', parent.get(parent.key('x')))
+        self.assertEqual(({}, 0, 0), worker.take_new())
+
+    def test_same_html_as_uncached(self):
+        md = generate_document(random.Random(5), 60)
+        want = markdown_to_html_node(md).to_html()
+
+        cache = FragmentCache('test')
+        set_fragment_cache(cache)
+        try:
+            first = markdown_to_html_node(md).to_html()
+            second = markdown_to_html_node(md).to_html()
+        finally:
+            set_fragment_cache(None)
+
+        self.assertEqual(want, first)
+        self.assertEqual(want, second)
+        self.assertGreater(cache.hits, 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
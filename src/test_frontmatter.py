@@ -0,0 +1,73 @@
+import os
+import tempfile
+import unittest
+
+from frontmatter import MAX_FRONT_MATTER_BYTES, page_title, parse_front_matter, read_metadata, split_front_matter
+
+
+PAGE = '''---
+title: "Tom, again"
+date: 2024-03-01
+tags: [tolkien, 'opinion']
+# a comment
+---
+# Why Tom Bombadil Was a Mistake
+
+Body.
+'''
+
+
+class TestFrontMatter(unittest.TestCase):
+    def test_split(self):
+        meta, body = split_front_matter(PAGE)
+        self.assertEqual({'title': 'Tom, again', 'date': '2024-03-01', 'tags': ['tolkien', 'opinion']}, meta)
+        self.assertEqual('# Why Tom Bombadil Was a Mistake\n\nBody.\n', body)
+        self.assertEqual('Tom, again', page_title(meta, body))
+
+    def test_no_front_matter(self):
+        for markdown in ['# Title\n\ntext', '---x\ntitle: a\n---\n', '---\ntitle: never closed\n']:
+            self.assertEqual(({}, markdown), split_front_matter(markdown))
+        self.assertEqual('Title', page_title({}, '# Title\n\ntext'))
+
+    def test_bad_line(self):
+        with self.assertRaises(ValueError):
+            parse_front_matter('title: a\njust words\n')
+
+    def test_crlf(self):
+        meta, body = split_front_matter('---\r\ntitle: a\r\n---\r\n# b\r\n')
+        self.assertEqual({'title': 'a'}, meta)
+        self.assertEqual('# b\r\n', body)
+
+
+class TestReadMetadata(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write(self, text: str) -> str:
+        path = os.path.join(self.tmp.name, 'page.md')
+        with open(path, 'wt') as f:
+            f.write(text)
+        return path
+
+    def test_front_matter(self):
+        self.assertEqual(split_front_matter(PAGE)[0], read_metadata(self.write(PAGE)))
+
+    def test_heading_title(self):
+        path = self.write('intro\n#not a heading\n# Ünïcode title  \n\n# second\n')
+        self.assertEqual({'title': 'Ünïcode title'}, read_metadata(path))
+        self.assertEqual({'date': '2024', 'title': 'T'}, read_metadata(self.write('---\ndate: 2024\n---\n# T\n')))
+
+    def test_no_title(self):
+        self.assertEqual({}, read_metadata(self.write('')))
+        self.assertEqual({}, read_metadata(self.write('just text\n')))
+
+    def test_unclosed_header_is_body(self):
+        text = '---\n' + 'x' * MAX_FRONT_MATTER_BYTES + '\n---\n# T\n'
+        self.assertEqual({'title': 'T'}, read_metadata(self.write(text)))
+
+
+if __name__ == '__main__':
+    unittest.main()
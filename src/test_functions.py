@@ -1,3 +1,4 @@
+import random
 import unittest
 
 from htmlnode import HtmlNode, LeafNode, ParentNode
@@ -10,10 +11,13 @@ from functions import (
     split_nodes_image,
     split_nodes_link,
     text_to_textnodes,
+    text_to_textnodes_scan,
     markdown_to_blocks,
     block_to_block_type,
     BlockType,
     markdown_to_html_node,
+    markdown_to_html_node_split,
+    scan_blocks,
     extract_title
 )
                     
@@ -229,6 +233,47 @@ class TestTextToNodes(unittest.TestCase):
         got = text_to_textnodes(text)
         self.assertListEqual(want, got)
 
+class TestTextToNodesScan(unittest.TestCase):
+    def test_matches_split_pipeline(self):
+        tests = (
+            'This is **text** with an _italic_ word and a `code block` and an ![obi wan image](https://i.imgur.com/fJRm4Vk.jpeg) and a [link](https://boot.dev), tada!',
+            '[a](b)',
+            '![a](b)',
+            '**b**[a](b)',
+            'x [a](b)[c](d)',
+            '****',
+            '**[a](b)** and _![i](j)_',
+            '![x](y)[a](b) *not bold* `[c](d)`',
+        )
+        for test in tests:
+            self.assertListEqual(text_to_textnodes(test), text_to_textnodes_scan(test))
+
+    def test_unbalanced(self):
+        tests = (
+            ('I have _unbalanced delims', '_'),
+            ('**bold', r'\*\*'),
+            ('_spans **bold** too_', '_'),
+            ('`snake_case`', '`'),
+        )
+        for test, delimiter in tests:
+            with self.assertRaisesRegex(Exception, f'unbalanced "{delimiter}"'):
+                text_to_textnodes_scan(test)
+            with self.assertRaises(Exception):
+                text_to_textnodes(test)
+
+    def test_differential_random(self):
+        pieces = ['a', ' ', '*', '**', '_', '`', '[x](y)', '![i](j)', '!', '[', ']', '(', ')', '\n']
+        rng = random.Random(1234)
+        for _ in range(5000):
+            text = ''.join(rng.choice(pieces) for _ in range(rng.randint(1, 12)))
+            try:
+                want = text_to_textnodes(text)
+            except Exception:
+                with self.assertRaises(Exception):
+                    text_to_textnodes_scan(text)
+                continue
+            self.assertListEqual(want, text_to_textnodes_scan(text), text)
+
 class TestMarkdownToBlocks(unittest.TestCase):
     def test_markdown_to_blocks(self):
         md = """
@@ -417,6 +462,62 @@ the **same** even with inline stuff
             expect
         )    
 
+class TestScanBlocks(unittest.TestCase):
+    def test_matches_markdown_to_blocks(self):
+        md = """
+  # Heading  
+
+This is **bolded** paragraph
+   
+still the same paragraph
+
+> quote
+> more
+
+- one
+- two
+
+
+
+1. one
+2. two
+3. three
+
+```
+code
+```
+trailing   
+"""
+        want = [(block_to_block_type(block), block) for block in markdown_to_blocks(md)]
+        got = [(block_type, '\n'.join(lines)) for block_type, lines in scan_blocks(md)]
+        self.assertListEqual(want, got)
+        self.assertEqual(markdown_to_html_node_split(md).to_html(), markdown_to_html_node(md).to_html())
+
+    def test_fenced_code_with_blank_lines(self):
+        md = """Before
+
+```
+def f():
+
+    return 1
+
+
+f()
+```
+
+After"""
+        types = [block_type for block_type, _ in scan_blocks(md)]
+        self.assertListEqual([BlockType.PARAGRAPH, BlockType.CODE, BlockType.PARAGRAPH], types)
+
+        html = markdown_to_html_node(md).to_html()
+        expect = "<div><p>Before</p><pre><code>def f():\n\n    return 1\n\n\nf()\n</code></pre><p>After</p></div>"
+        self.assertEqual(expect, html)
+
+    def test_unclosed_fence_splits_on_blank_lines(self):
+        md = "```\nnot closed\n\nnext block"
+        blocks = ['\n'.join(lines) for _, lines in scan_blocks(md)]
+        self.assertListEqual(markdown_to_blocks(md), blocks)
+
 class TestGenerationFx(unittest.TestCase):
     def test_extract_title(self):
         md = '# title'
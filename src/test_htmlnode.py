@@ -1,6 +1,7 @@
+import io
 import unittest
 
-from htmlnode import HtmlNode, LeafNode, ParentNode
+from htmlnode import HtmlNode, LeafNode, ParentNode, set_minify
 
 class TestHtmlNode(unittest.TestCase):
     def test_props(self):
@@ -57,5 +58,66 @@ class TestParentNode(unittest.TestCase):
         actual =  node.to_html()
         self.assertEqual(expect, actual)
 
+class TestSlots(unittest.TestCase):
+    def test_no_instance_dict(self):
+        for node in (HtmlNode('p'), LeafNode('b', 'x'), ParentNode('p', [])):
+            self.assertFalse(hasattr(node, '__dict__'))
+
+    def test_api_kept(self):
+        leaf = LeafNode('a', 'x', {'href': '/'})
+        self.assertIsNone(leaf.children)
+        self.assertEqual(('a', 'x', {'href': '/'}), (leaf.tag, leaf.value, leaf.props))
+
+        parent = ParentNode('p', [leaf])
+        self.assertIsNone(parent.value)
+        self.assertEqual([leaf], parent.children)
+
+    def test_only_used_slots(self):
+        self.assertEqual(('tag', 'value', 'props'), LeafNode.__slots__)
+        self.assertEqual(('tag', 'children', 'props'), ParentNode.__slots__)
+
+        node = HtmlNode('a', 'x', None, {'href': '/'})
+        self.assertEqual(('a', 'x', None, {'href': '/'}), (node.tag, node.value, node.children, node.props))
+        parent = ParentNode('p', [])
+        parent.children = [node]
+        self.assertEqual([node], parent.children)
+
+class TestMinify(unittest.TestCase):
+    def tearDown(self):
+        set_minify(False)
+
+    def test_unquoted_props(self):
+        set_minify(True)
+        node = ParentNode('p', [LeafNode('a', 'x', {'href': '/a/b.html'}), LeafNode('img', '', {'src': 'a.png', 'alt': 'two words'})])
+        self.assertEqual('<p><a href=/a/b.html>x</a><img src=a.png alt="two words"></p>', node.to_html())
+
+    def test_props_with_quotes(self):
+        set_minify(True)
+        self.assertEqual('<a href=\'a"b\'>x</a>', LeafNode('a', 'x', {'href': 'a"b'}).to_html())
+
+
+class TestWriteHtml(unittest.TestCase):
+    def test_matches_to_html(self):
+        node = ParentNode(
+            "div",
+            [
+                ParentNode("p", [LeafNode("b", "Bold text"), LeafNode(None, "Normal text")]),
+                LeafNode("img", "", {"src": "/a.png", "alt": "a"}),
+                ParentNode("ul", [ParentNode("li", [LeafNode("a", "link", {"href": "/x"})])]),
+            ],
+        )
+        sink = io.StringIO()
+        node.write_html(sink)
+        self.assertEqual(node.to_html(), sink.getvalue())
+        self.assertEqual(
+            '<div><p><b>Bold text</b>Normal text</p><img src="/a.png" alt="a"><ul><li><a href="/x">link</a></li></ul></div>',
+            sink.getvalue(),
+        )
+
+    def test_missing_children(self):
+        node = ParentNode("div", None)
+        with self.assertRaises(ValueError):
+            node.write_html(io.StringIO())
+
 if __name__ == "__main__":
     unittest.main()
\ No newline at end of file
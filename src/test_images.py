@@ -0,0 +1,97 @@
+import os
+import struct
+import tempfile
+import unittest
+import zlib
+
+from assets import AssetInfo, annotate_manifest, hashed_path, index_assets
+from functions import set_asset_index, text_node_to_html_node
+from images import IMAGE_EXTENSIONS, read_image_size
+from manifest import BuildManifest, ASSETS
+from sync import sync_static
+from textnode import TextNode, TextType
+
+
+def png_bytes(width: int, height: int) -> bytes:
+    ihdr = struct.pack('>IIBBBBB', width, height, 8, 2, 0, 0, 0)
+    chunk = struct.pack('>I', len(ihdr)) + b'IHDR' + ihdr + struct.pack('>I', zlib.crc32(b'IHDR' + ihdr))
+    return b'\x89PNG\r\n\x1a\n' + chunk
+
+def jpeg_bytes(width: int, height: int) -> bytes:
+    app0 = b'\xff\xe0' + struct.pack('>H', 16) + b'JFIF\x00\x01\x01\x00\x00\x01\x00\x01\x00\x00'
+    sof0 = b'\xff\xc0' + struct.pack('>HBHHB', 11, 8, height, width, 1) + b'\x01\x11\x00'
+    return b'\xff\xd8' + app0 + sof0 + b'\xff\xd9'
+
+
+class TestImages(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.static = os.path.join(self.tmp.name, 'static')
+        self.public = os.path.join(self.tmp.name, 'public')
+        os.makedirs(os.path.join(self.static, 'images'))
+        self.manifest = BuildManifest(os.path.join(self.tmp.name, 'manifest.json'))
+
+    def tearDown(self):
+        set_asset_index(None)
+        self.tmp.cleanup()
+
+    def write(self, name: str, data: bytes) -> str:
+        path = os.path.join(self.static, name)
+        with open(path, 'wb') as f:
+            f.write(data)
+        return path
+
+    def test_read_image_size(self):
+        self.assertEqual((640, 480), read_image_size(self.write('a.png', png_bytes(640, 480))))
+        self.assertEqual((300, 200), read_image_size(self.write('b.jpg', jpeg_bytes(300, 200))))
+        self.assertIsNone(read_image_size(self.write('c.png', b'not an image')))
+
+    def test_hashed_path(self):
+        self.assertEqual(os.path.join('images', 'tom.abcdef0123.png'), hashed_path(os.path.join('images', 'tom.png'), 'abcdef0123456789'))
+
+    def test_sizes_reused_from_manifest(self):
+        self.write(os.path.join('images', 'a.png'), png_bytes(10, 20))
+        images = index_assets(self.static, self.public, self.manifest, extensions=IMAGE_EXTENSIONS)
+        sync_static(self.public, self.static, self.manifest, renames={i.src: i.dest for i in images.values()})
+        annotate_manifest(self.manifest, images)
+
+        info = images['/images/a.png']
+        self.assertEqual((10, 20), (info.width, info.height))
+        self.assertTrue(os.path.isfile(info.dest))
+        self.assertFalse(os.path.exists(os.path.join(self.public, 'images', 'a.png')))
+
+        # an unchanged file isn't read again, the manifest is trusted
+        self.manifest.get(ASSETS, info.src)['width'] = 99
+        self.assertEqual(99, index_assets(self.static, self.public, self.manifest, extensions=IMAGE_EXTENSIONS)['/images/a.png'].width)
+
+    def test_changed_image_replaces_old_copy(self):
+        path = self.write(os.path.join('images', 'a.png'), png_bytes(10, 20))
+        first = index_assets(self.static, self.public, self.manifest, extensions=IMAGE_EXTENSIONS)['/images/a.png']
+        sync_static(self.public, self.static, self.manifest, renames={first.src: first.dest})
+
+        self.write(os.path.join('images', 'a.png'), png_bytes(30, 40))
+        os.utime(path, ns=(0, 0))
+        second = index_assets(self.static, self.public, self.manifest, extensions=IMAGE_EXTENSIONS)['/images/a.png']
+        sync_static(self.public, self.static, self.manifest, renames={second.src: second.dest})
+
+        self.assertNotEqual(first.dest, second.dest)
+        self.assertEqual((30, 40), (second.width, second.height))
+        self.assertEqual([os.path.basename(second.dest)], os.listdir(os.path.join(self.public, 'images')))
+
+    def test_img_props(self):
+        node = TextNode('alt text', TextType.IMAGE, '/images/a.png')
+        self.assertEqual('<img src="/images/a.png" alt="alt text">', text_node_to_html_node(node).to_html())
+
+        info = AssetInfo('static/images/a.png', 'public/images/a.0123456789.png', '/images/a.0123456789.png',
+                         '0123456789', 10, 20)
+        set_asset_index({'/images/a.png': info}, image_attrs=True)
+        self.assertEqual('<img src="/images/a.0123456789.png" alt="alt text" width="10" height="20" '
+                         'loading="lazy" decoding="async">', text_node_to_html_node(node).to_html())
+
+        other = TextNode('x', TextType.IMAGE, 'https://example.com/x.png')
+        self.assertEqual('<img src="https://example.com/x.png" alt="x" loading="lazy" decoding="async">',
+                         text_node_to_html_node(other).to_html())
+
+
+if __name__ == '__main__':
+    unittest.main()
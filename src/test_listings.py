@@ -0,0 +1,96 @@
+import os
+import os.path
+import tempfile
+import unittest
+
+from listings import page_url, tag_slug, write_indexes
+from manifest import BuildManifest, GENERATED, PAGES
+from template import Template
+
+
+class TestListings(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.public = os.path.join(self.tmp.name, 'public')
+        self.manifest = BuildManifest(os.path.join(self.tmp.name, 'manifest.json'))
+        self.template = Template.parse('<title>{{ Title }}</title>{{ Content }}')
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write(self, site_url, listings: bool, per_page: int = 10) -> int:
+        self.manifest.forget_seen(GENERATED)
+        written = write_indexes(self.manifest, self.public, self.template, site_url, listings, per_page)
+        self.manifest.prune(GENERATED)
+        return written
+
+    def add(self, rel: str, meta: dict, mtime: float = 0):
+        dest = os.path.join(self.public, rel, 'index.html')
+        self.manifest.record(PAGES, f'content/{rel}/index.md', 'hash', dest, meta=meta, mtime=mtime)
+
+    def read(self, rel: str) -> str:
+        with open(os.path.join(self.public, rel), 'rt') as f:
+            return f.read()
+
+    def test_page_url(self):
+        self.assertEqual('/', page_url('public/index.html', 'public'))
+        self.assertEqual('/blog/tom/', page_url('public/blog/tom/index.html', 'public'))
+
+    def test_tag_slug(self):
+        self.assertEqual('lord-of-the-rings', tag_slug('Lord of the Rings!'))
+
+    def test_sitemap_and_feed(self):
+        self.add('blog/tom', {'title': 'Tom & Goldberry', 'date': '2024-03-01', 'tags': ['tolkien']})
+        self.add('blog/old', {'title': 'Old', 'date': '2020-01-01'})
+        self.add('blog/draft', {'title': 'Draft', 'draft': 'true'})
+        self.write('https://example.com/', False)
+
+        sitemap = self.read('sitemap.xml')
+        self.assertIn('<loc>https://example.com/blog/tom/</loc><lastmod>2024-03-01</lastmod>', sitemap)
+        self.assertNotIn('draft', sitemap)
+        feed = self.read('feed.xml')
+        self.assertIn('<title>Tom &amp; Goldberry</title>', feed)
+        self.assertIn('<updated>2024-03-01T00:00:00Z</updated>', feed)
+        self.assertLess(feed.index('/blog/tom/'), feed.index('/blog/old/'))
+
+    def test_listing_pages(self):
+        for day in range(1, 6):
+            self.add(f'blog/post{day}', {'title': f'Post {day}', 'date': f'2024-01-0{day}', 'tags': ['Middle Earth']})
+        self.write(None, True, 2)
+
+        first = self.read('blog/index.html')
+        self.assertIn('Post 5', first)
+        self.assertIn('href="/blog/page/2/" rel="next"', first)
+        last = self.read('blog/page/3/index.html')
+        self.assertIn('Post 1', last)
+        self.assertNotIn('rel="next"', last)
+        self.assertIn('Tagged Middle Earth', self.read('tags/middle-earth/index.html'))
+        self.assertFalse(os.path.exists(os.path.join(self.public, 'sitemap.xml')))
+
+    def test_content_page_keeps_its_url(self):
+        self.add('blog', {'title': 'My Blog'})
+        self.add('blog/tom', {'title': 'Tom'})
+        self.write(None, True)
+        self.assertIsNone(self.manifest.get(GENERATED, 'listing:/blog/'))
+
+    def test_unchanged_outputs_not_rewritten(self):
+        self.add('blog/tom', {'title': 'Tom', 'date': '2024-03-01'})
+        self.assertEqual(3, self.write('https://example.com', True))
+        self.assertEqual(0, self.write('https://example.com', True))
+
+        self.add('blog/tom', {'title': 'Tom Bombadil', 'date': '2024-03-01'})
+        self.assertEqual(2, self.write('https://example.com', True))
+
+    def test_outputs_no_longer_made_are_pruned(self):
+        self.add('blog/tom', {'title': 'Tom', 'tags': ['tolkien']})
+        self.write('https://example.com', True)
+        self.assertTrue(os.path.exists(os.path.join(self.public, 'tags', 'tolkien', 'index.html')))
+
+        self.write(None, False)
+        self.assertEqual({}, self.manifest.entries[GENERATED])
+        self.assertFalse(os.path.exists(os.path.join(self.public, 'sitemap.xml')))
+        self.assertFalse(os.path.exists(os.path.join(self.public, 'tags', 'tolkien', 'index.html')))
+
+
+if __name__ == '__main__':
+    unittest.main()
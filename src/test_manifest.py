@@ -0,0 +1,81 @@
+import os
+import os.path
+import tempfile
+import unittest
+
+from manifest import BuildManifest, PAGES, hash_file
+
+
+class TestBuildManifest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.dir = self.tmp.name
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write(self, name: str, text: str) -> str:
+        path = os.path.join(self.dir, name)
+        os.makedirs(os.path.split(path)[0], exist_ok=True)
+        with open(path, 'wt') as f:
+            f.write(text)
+        return path
+
+    def test_round_trip(self):
+        src = self.write('a.md', '# A')
+        dest = self.write('out/a.html', '<h1>A</h1>')
+        manifest_path = os.path.join(self.dir, 'manifest.json')
+
+        manifest = BuildManifest(manifest_path)
+        manifest.record(PAGES, src, hash_file(src), dest)
+        manifest.save()
+
+        loaded = BuildManifest.load(manifest_path)
+        self.assertTrue(loaded.is_current(PAGES, src, hash_file(src), dest))
+
+        self.write('a.md', '# B')
+        self.assertFalse(loaded.is_current(PAGES, src, hash_file(src), dest))
+
+    def test_missing_output_is_not_current(self):
+        src = self.write('a.md', '# A')
+        dest = os.path.join(self.dir, 'out/a.html')
+
+        manifest = BuildManifest(os.path.join(self.dir, 'manifest.json'))
+        manifest.record(PAGES, src, hash_file(src), dest)
+        self.assertFalse(manifest.is_current(PAGES, src, hash_file(src), dest))
+
+    def test_template_change_drops_pages(self):
+        template = self.write('template.html', '{{ Content }}')
+        manifest = BuildManifest(os.path.join(self.dir, 'manifest.json'))
+        self.assertTrue(manifest.update_template(template))
+
+        manifest.record(PAGES, 'a.md', 'abc', 'a.html')
+        self.assertFalse(manifest.update_template(template))
+        self.assertIn('a.md', manifest.entries[PAGES])
+
+        self.write('template.html', '<b>{{ Content }}</b>')
+        self.assertTrue(manifest.update_template(template))
+        self.assertEqual({}, manifest.entries[PAGES])
+
+    def test_prune(self):
+        manifest_path = os.path.join(self.dir, 'manifest.json')
+        kept = self.write('out/kept.html', 'kept')
+        stale = self.write('out/gone/stale.html', 'stale')
+
+        manifest = BuildManifest(manifest_path)
+        manifest.record(PAGES, 'kept.md', 'abc', kept)
+        manifest.record(PAGES, 'stale.md', 'def', stale)
+        manifest.save()
+
+        manifest = BuildManifest.load(manifest_path)
+        manifest.is_current(PAGES, 'kept.md', 'abc', kept)
+        removed = manifest.prune(PAGES)
+
+        self.assertEqual([stale], removed)
+        self.assertFalse(os.path.exists(os.path.join(self.dir, 'out/gone')))
+        self.assertTrue(os.path.exists(kept))
+        self.assertEqual(['kept.md'], list(manifest.entries[PAGES]))
+
+
+if __name__ == "__main__":
+    unittest.main()
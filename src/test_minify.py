@@ -0,0 +1,47 @@
+import unittest
+
+from minify import minify_css, minify_html, quote_attr
+
+
+class TestMinifyHtml(unittest.TestCase):
+    def test_whitespace_between_block_tags(self):
+        html = '<html>\n  <head>\n    <title>T</title>\n  </head>\n  <body>\n    <p>x</p>\n  </body>\n</html>\n'
+        self.assertEqual('<html><head><title>T</title></head><body><p>x</p></body></html>', minify_html(html))
+
+    def test_inline_whitespace_collapses(self):
+        self.assertEqual('<p>a <b>b</b> <i>c</i> d</p>', minify_html('<p>a   <b>b</b>\n  <i>c</i>\td </p>'))
+
+    def test_raw_elements_untouched(self):
+        html = '<div>\n<pre><code>a  \n   b</code></pre>\n<script>if (a  <  b) {}</script>\n</div>'
+        self.assertEqual('<div><pre><code>a  \n   b</code></pre><script>if (a  <  b) {}</script></div>', minify_html(html))
+
+    def test_comments_removed(self):
+        self.assertEqual('<p>a b</p>', minify_html('<p>a <!-- note --> b</p>\n<!--\nlong\n-->'))
+
+    def test_attributes(self):
+        html = '<meta charset="utf-8" />\n<a href="/x/" title=\'a b\' data-q="a=b" hidden>x</a>'
+        self.assertEqual('<meta charset=utf-8><a href=/x/ title="a b" data-q="a=b" hidden>x</a>', minify_html(html))
+
+    def test_slots_keep_quotes(self):
+        self.assertEqual('<a href="{{Url}}">{{ Text }}</a>', minify_html('<a href="{{Url}}">{{ Text }}</a>'))
+
+    def test_quote_attr(self):
+        self.assertEqual('/a.png', quote_attr('/a.png'))
+        self.assertEqual('""', quote_attr(''))
+        self.assertEqual('"a b"', quote_attr('a b'))
+        self.assertEqual('"x>"', quote_attr('x>'))
+        self.assertEqual("'say \"hi\"'", quote_attr('say "hi"'))
+        self.assertEqual('"it\'s &quot;x&quot;"', quote_attr('it\'s "x"'))
+
+    def test_attribute_with_quotes(self):
+        self.assertEqual('<a title=\'say "hi"\' href=/x>x</a>', minify_html('<a title=\'say "hi"\' href="/x">x</a>'))
+
+
+class TestMinifyCss(unittest.TestCase):
+    def test_minify_css(self):
+        css = '/* c */\nbody {\n  color: red;\n  margin: 0;\n}\n\nh1, h2 > a :hover {\n  color: blue;\n}\n'
+        self.assertEqual('body{color: red;margin: 0}h1,h2>a :hover{color: blue}', minify_css(css))
+
+
+if __name__ == '__main__':
+    unittest.main()
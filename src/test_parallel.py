@@ -0,0 +1,138 @@
+import multiprocessing
+import os
+import os.path
+import sys
+import tempfile
+import unittest
+
+from htmlnode import set_minify
+from main import find_pages, generate_page, generate_pages_recursive, iter_pages
+from parallel import batch_pages, generate_pages_parallel, stream_batches
+from template import set_template_options
+
+
+# stands in for generate_page, writes down the info it was handed
+def write_info(src: str, template_path: str, dst: str, info) -> dict:
+    os.makedirs(os.path.split(dst)[0], exist_ok=True)
+    with open(dst, 'wt') as f:
+        f.write(repr(info))
+    return info
+
+
+class TestParallelBuild(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.dir = self.tmp.name
+        self.content = os.path.join(self.dir, 'content')
+        self.template = os.path.join(self.dir, 'template.html')
+
+        with open(self.template, 'wt') as f:
+            f.write('<title>{{ Title }}</title><main>{{ Content }}</main>')
+
+        for ii in range(12):
+            path = os.path.join(self.content, f'section{ii % 3}', f'page{ii}.md')
+            os.makedirs(os.path.split(path)[0], exist_ok=True)
+            with open(path, 'wt') as f:
+                f.write(f'# Page {ii}\n\nSome **bold** text\n\n- one\n- two\n' * (ii + 1))
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def read_tree(self, root: str) -> dict[str, bytes]:
+        files = {}
+        for dir_path, _, file_names in os.walk(root):
+            for file_name in file_names:
+                path = os.path.join(dir_path, file_name)
+                with open(path, 'rb') as f:
+                    files[os.path.relpath(path, root)] = f.read()
+        return files
+
+    def test_find_pages(self):
+        pages = find_pages(self.content, 'public')
+        self.assertEqual(12, len(pages))
+        for src, dst in pages:
+            self.assertTrue(src.endswith('.md'))
+            self.assertTrue(dst.startswith('public'))
+            self.assertTrue(dst.endswith('.html'))
+
+    def test_iter_pages_sizes(self):
+        for src, dst, size in iter_pages(self.content, 'public'):
+            self.assertEqual(os.path.getsize(src), size)
+            self.assertEqual(os.path.join('public', os.path.relpath(src, self.content)).removesuffix('.md') + '.html', dst)
+
+    def test_iter_pages_deep_tree(self):
+        path = os.path.join(self.dir, 'deep', *['d'] * 300)
+        os.makedirs(path)
+        with open(os.path.join(path, 'leaf.md'), 'wt') as f:
+            f.write('# Leaf')
+
+        # a tree deeper than the recursion limit
+        limit = sys.getrecursionlimit()
+        sys.setrecursionlimit(200)
+        try:
+            pages = list(iter_pages(os.path.join(self.dir, 'deep'), 'public'))
+        finally:
+            sys.setrecursionlimit(limit)
+        self.assertEqual(1, len(pages))
+        self.assertTrue(pages[0][1].endswith(os.path.join('d', 'leaf.html')))
+
+    def test_stream_batches_start_small(self):
+        pages = [(f'{ii}.md', f'{ii}.html', 100) for ii in range(100)]
+        batches = list(stream_batches(pages, jobs=2, batch_bytes=1600))
+        self.assertEqual(1, len(batches[0]))
+        self.assertEqual(16, len(batches[-2]))
+        self.assertEqual([page[:2] for page in pages], [page for batch in batches for page in batch])
+
+    def test_batches_cover_every_page(self):
+        pages = find_pages(self.content, 'public')
+        batches = batch_pages(pages, jobs=2, batch_bytes=200)
+        self.assertGreater(len(batches), 1)
+        self.assertEqual(pages, [page for batch in batches for page in batch])
+
+    def test_matches_serial_output(self):
+        serial = os.path.join(self.dir, 'serial')
+        parallel = os.path.join(self.dir, 'parallel')
+
+        generate_pages_recursive(self.content, self.template, serial)
+        stats = generate_pages_parallel(iter_pages(self.content, parallel), self.template, 3, generate_page)
+
+        self.assertEqual(12, sum(s.pages for s in stats.values()))
+        self.assertEqual(self.read_tree(serial), self.read_tree(parallel))
+
+
+    def test_info_handed_to_render(self):
+        out = os.path.join(self.dir, 'out')
+        pages = [(src, dst, size, {'src': src}) for src, dst, size in iter_pages(self.content, out)]
+        generate_pages_parallel(pages, self.template, 2, write_info)
+        for src, dst, _, _ in pages:
+            with open(dst, 'rt') as f:
+                self.assertEqual(repr({'src': src}), f.read())
+
+    # settings live in module globals, workers must render with them
+    # whatever the default start method is
+    def test_matches_serial_output_with_settings(self):
+        serial = os.path.join(self.dir, 'serial')
+        parallel = os.path.join(self.dir, 'parallel')
+        with open(self.template, 'wt') as f:
+            f.write('<title> {{ Title }} </title>\n<main>\n  {{ Content }}\n</main>\n')
+        with open(os.path.join(self.content, 'section0', 'page0.md'), 'at') as f:
+            f.write('\n[a link](/section1/page1)\n')
+        default_method = multiprocessing.get_start_method()
+        set_minify(True)
+        set_template_options(minify=True)
+        multiprocessing.set_start_method('spawn', force=True)
+        try:
+            generate_pages_recursive(self.content, self.template, serial)
+            generate_pages_parallel(iter_pages(self.content, parallel), self.template, 2, generate_page)
+        finally:
+            multiprocessing.set_start_method(default_method, force=True)
+            set_minify(False)
+            set_template_options()
+
+        serial_files = self.read_tree(serial)
+        self.assertIn(b'<main><div><h1>Page 0</h1>', serial_files[os.path.join('section0', 'page0.html')])
+        self.assertIn(b'href=/section1/page1>', serial_files[os.path.join('section0', 'page0.html')])
+        self.assertEqual(serial_files, self.read_tree(parallel))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,100 @@
+import io
+import os
+import tempfile
+import unittest
+
+from functions import markdown_to_html_node
+from htmlnode import FragmentNode, LeafNode
+from main import generate_page
+from parsecache import ParseCache, set_parse_cache
+
+
+class TestParseCache(unittest.TestCase):
+    def test_put_and_get(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            cache = ParseCache(tmp, '1')
+            key = cache.key('# Hi\n\nthere')
+            self.assertIsNone(cache.get(key))
+            cache.put_node(key, 'Hi', FragmentNode('<div><h1>Hi</h1><p>there é</p></div>')).close()
+            with cache.get(key) as page:
+                self.assertEqual('Hi', page.title)
+                self.assertEqual('<div><h1>Hi</h1><p>there é</p></div>', page.body.to_html())
+            self.assertEqual((1, 1), (cache.hits, cache.misses))
+
+    def test_put_node(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            cache = ParseCache(tmp, '1')
+            node = markdown_to_html_node('# Hi\n\nthere é\r\n\n```\ncode\n```')
+            with cache.put_node('ab', 'Hi', node) as page:
+                self.assertEqual('Hi', page.title)
+                self.assertEqual(node.to_html(), page.body.to_html())
+            with cache.get('ab') as page:
+                self.assertEqual(node.to_html(), page.body.to_html())
+
+    def test_put_node_failure_leaves_no_file(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            cache = ParseCache(tmp, '1')
+            with self.assertRaises(ValueError):
+                cache.put_node('ab', 'T', LeafNode('p', None))
+            self.assertEqual([], os.listdir(os.path.split(cache.entry_path('ab'))[0]))
+            self.assertIsNone(cache.get('ab'))
+
+    def test_version_changes_key(self):
+        self.assertNotEqual(ParseCache('x', '1').key('a'), ParseCache('x', '2').key('a'))
+
+    def test_write_html(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            cache = ParseCache(tmp, '1')
+            cache.put_node('ab', 'T', FragmentNode('<p>é</p>')).close()
+            out = os.path.join(tmp, 'out.html')
+            with cache.get('ab') as page:
+                with open(out, 'wt', encoding='utf-8') as f:
+                    f.write('<body>')
+                    page.body.write_html(f)
+                    f.write('</body>')
+                sink = io.StringIO()
+                page.body.write_html(sink)
+            with open(out, 'rt', encoding='utf-8') as f:
+                self.assertEqual('<body><p>é</p></body>', f.read())
+            self.assertEqual('<p>é</p>', sink.getvalue())
+
+    def test_evict_oldest(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            cache = ParseCache(tmp, '1', max_bytes=150)
+            for i, key in enumerate(['aa', 'bb', 'cc']):
+                cache.put_node(key, 'T', FragmentNode('x' * 100)).close()
+                os.utime(cache.entry_path(key), ns=(i * 10**9, i * 10**9))
+            self.assertEqual(2, cache.evict())
+            self.assertFalse(os.path.exists(cache.entry_path('aa')))
+            self.assertFalse(os.path.exists(cache.entry_path('bb')))
+            self.assertTrue(os.path.exists(cache.entry_path('cc')))
+            self.assertEqual(0, cache.evict())
+
+    def test_generate_page_uses_cache(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            src = os.path.join(tmp, 'page.md')
+            template = os.path.join(tmp, 'template.html')
+            with open(src, 'wt') as f:
+                f.write('# Title\n\nSome **bold** text')
+            with open(template, 'wt') as f:
+                f.write('<title>{{ Title }}</title>{{ Content }}')
+
+            cache = ParseCache(os.path.join(tmp, 'cache'), '1')
+            set_parse_cache(cache)
+            try:
+                outputs = []
+                for name in ['a.html', 'b.html']:
+                    generate_page(src, template, os.path.join(tmp, name))
+                    with open(os.path.join(tmp, name), 'rt') as f:
+                        outputs.append(f.read())
+            finally:
+                set_parse_cache(None)
+
+            self.assertEqual(outputs[0], outputs[1])
+            self.assertIn('<title>Title</title>', outputs[1])
+            self.assertIn('<b>bold</b>', outputs[1])
+            self.assertEqual((1, 1), (cache.hits, cache.misses))
+
+
+if __name__ == '__main__':
+    unittest.main()
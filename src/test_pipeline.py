@@ -0,0 +1,109 @@
+import os
+import tempfile
+import threading
+import unittest
+
+from pipeline import DirectoryCache, run_pipeline
+
+
+class TestRunPipeline(unittest.TestCase):
+    def test_renders_in_order_and_writes(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            items = [(i, os.path.join(tmp, f'd{i % 3}', f'{i}.html')) for i in range(50)]
+            rendered = []
+
+            def render(item, data):
+                rendered.append(item[0])
+                return item[1], data
+
+            stats = run_pipeline(items, lambda item: f'page {item[0]}', render, io_threads=3, max_pending=4)
+
+            self.assertEqual(list(range(50)), rendered)
+            self.assertEqual((50, 50, 0), (stats.read, stats.written, stats.skipped))
+            for i, path in items:
+                with open(path, 'rt') as f:
+                    self.assertEqual(f'page {i}', f.read())
+
+    def test_streamed_content(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            written = []
+
+            def render(item, data):
+                def write(sink):
+                    sink.write('<p>')
+                    sink.write(data)
+                    sink.write('</p>')
+                    written.append(item)
+                return os.path.join(tmp, f'{item}.html'), write
+
+            run_pipeline(range(5), str, render, io_threads=2, max_pending=2)
+            self.assertEqual(list(range(5)), sorted(written))
+            with open(os.path.join(tmp, '3.html'), 'rt') as f:
+                self.assertEqual('<p>3</p>', f.read())
+
+    def test_skipped_items_are_not_written(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            def render(item, data):
+                if item % 2 == 0:
+                    return None
+                return os.path.join(tmp, f'{item}.html'), data
+
+            stats = run_pipeline(range(10), str, render)
+            self.assertEqual(5, stats.skipped)
+            self.assertEqual(['1.html', '3.html', '5.html', '7.html', '9.html'], sorted(os.listdir(tmp)))
+
+    def test_reads_are_bounded(self):
+        lock = threading.Lock()
+        state = {'consumed': 0, 'ahead': 0}
+
+        def items():
+            for i in range(100):
+                with lock:
+                    state['ahead'] = max(state['ahead'], i - state['consumed'])
+                yield i
+
+        def render(item, data):
+            with lock:
+                state['consumed'] += 1
+            return None
+
+        run_pipeline(items(), str, render, io_threads=2, max_pending=5)
+        self.assertLessEqual(state['ahead'], 5)
+
+    def test_read_error_is_raised(self):
+        def read(item):
+            if item == 3:
+                raise OSError('unreadable')
+            return item
+
+        with self.assertRaises(OSError):
+            run_pipeline(range(10), read, lambda item, data: None)
+
+    def test_write_error_is_raised(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            # a file where the output directory should be
+            blocker = os.path.join(tmp, 'blocker')
+            with open(blocker, 'wt') as f:
+                f.write('')
+
+            with self.assertRaises(OSError):
+                run_pipeline(range(3), str, lambda item, data: (os.path.join(blocker, f'{item}.html'), data))
+
+
+class TestDirectoryCache(unittest.TestCase):
+    def test_creates_once(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            dirs = DirectoryCache()
+            path = os.path.join(tmp, 'a', 'b')
+            dirs.ensure(path)
+            self.assertTrue(os.path.isdir(path))
+
+            # already created, so a removed directory is not noticed
+            os.rmdir(path)
+            dirs.ensure(path)
+            self.assertFalse(os.path.isdir(path))
+            self.assertEqual({path}, dirs.created)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,59 @@
+import json
+import os
+import tempfile
+import unittest
+
+import profiler
+from functions import markdown_to_html_node
+from htmlnode import LeafNode, ParentNode
+
+
+class TestProfiler(unittest.TestCase):
+    def tearDown(self):
+        profiler._enabled = False
+        profiler.take_pages()
+
+    def test_disabled_is_noop(self):
+        self.assertIsNone(profiler.begin_page('a.md'))
+        with profiler.stage('parse'):
+            markdown_to_html_node('# hi')
+        self.assertEqual([], profiler.take_pages())
+
+    def test_collects_stages(self):
+        profiler.enable()
+        page = profiler.begin_page('a.md')
+        with profiler.stage('parse'):
+            node = markdown_to_html_node('# hi\n\nsome **text**\n\n- one\n- two')
+        profiler.end_page(page, node, 10, 20)
+
+        pages = profiler.take_pages()
+        self.assertEqual([page], pages)
+        totals = page.stage_totals()
+        for name in ('parse', 'blocks', 'inline'):
+            self.assertIn(name, totals)
+        self.assertEqual(4, totals['inline'][1])
+        self.assertEqual(11, page.nodes)
+
+    def test_count_nodes(self):
+        node = ParentNode('div', [ParentNode('p', [LeafNode(None, 'a'), LeafNode('b', 'c')])])
+        self.assertEqual(4, profiler.count_nodes(node))
+
+    def test_write_trace(self):
+        profiler.enable()
+        page = profiler.begin_page('a.md')
+        with profiler.stage('read'):
+            pass
+        profiler.end_page(page, LeafNode(None, 'x'), 1, 1)
+
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'trace.json')
+            profiler.write_trace(profiler.take_pages(), path)
+            with open(path, 'rt') as f:
+                events = json.load(f)['traceEvents']
+
+        self.assertEqual(['a.md', 'read'], [e['name'] for e in events])
+        self.assertTrue(all(e['ph'] == 'X' for e in events))
+
+
+if __name__ == "__main__":
+    unittest.main()
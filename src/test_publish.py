@@ -0,0 +1,72 @@
+import os
+import tempfile
+import unittest
+
+from publish import atomic_write, current_release, link_tree, publish
+
+
+class TestPublish(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.stage = os.path.join(self.tmp.name, 'stage')
+        self.releases = os.path.join(self.tmp.name, 'releases')
+        self.public = os.path.join(self.tmp.name, 'public')
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write(self, path: str, text: str):
+        os.makedirs(os.path.split(path)[0], exist_ok=True)
+        with atomic_write(path) as f:
+            f.write(text)
+
+    def read(self, path: str) -> str:
+        with open(path, 'rt') as f:
+            return f.read()
+
+    def test_atomic_write_error_keeps_old_file(self):
+        path = os.path.join(self.stage, 'a.html')
+        self.write(path, 'old')
+        with self.assertRaises(ValueError):
+            with atomic_write(path) as f:
+                f.write('half')
+                raise ValueError('render failed')
+        self.assertEqual('old', self.read(path))
+        self.assertEqual(['a.html'], os.listdir(self.stage))
+
+    def test_link_tree(self):
+        self.write(os.path.join(self.stage, 'a', 'b.html'), 'b')
+        self.assertEqual(1, link_tree(self.stage, self.public))
+        self.assertTrue(os.path.samefile(os.path.join(self.stage, 'a', 'b.html'), os.path.join(self.public, 'a', 'b.html')))
+
+    def test_publish_switches_link(self):
+        self.write(os.path.join(self.stage, 'index.html'), 'one')
+        self.write(os.path.join(self.stage, 'index.css'), 'css')
+        first = publish(self.stage, self.public, self.releases)
+        self.assertTrue(os.path.samefile(first, current_release(self.public)))
+
+        self.write(os.path.join(self.stage, 'index.html'), 'two')
+        second = publish(self.stage, self.public, self.releases)
+        self.assertEqual('two', self.read(os.path.join(self.public, 'index.html')))
+        # the old release still has its own copy of what changed, and
+        # shares the rest
+        self.assertEqual('one', self.read(os.path.join(first, 'index.html')))
+        self.assertTrue(os.path.samefile(os.path.join(first, 'index.css'), os.path.join(second, 'index.css')))
+
+    def test_old_releases_pruned(self):
+        self.write(os.path.join(self.stage, 'index.html'), 'x')
+        for _ in range(5):
+            last = publish(self.stage, self.public, self.releases, keep=2)
+        self.assertEqual(['000004', '000005'], sorted(os.listdir(self.releases)))
+        self.assertTrue(os.path.samefile(last, current_release(self.public)))
+
+    def test_replaces_directory(self):
+        self.write(os.path.join(self.public, 'old.html'), 'old')
+        self.write(os.path.join(self.stage, 'index.html'), 'new')
+        publish(self.stage, self.public, self.releases)
+        self.assertTrue(os.path.islink(self.public))
+        self.assertEqual(['index.html'], os.listdir(self.public))
+
+
+if __name__ == '__main__':
+    unittest.main()
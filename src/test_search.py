@@ -0,0 +1,171 @@
+import json
+import os
+import os.path
+import tempfile
+import unittest
+from collections import Counter
+
+from functions import markdown_to_html_node
+from htmlnode import FragmentNode, LeafNode, ParentNode
+from manifest import BuildManifest, GENERATED, PAGES
+from parsecache import MappedHtmlNode
+from search import (
+    SearchIndex,
+    bucket_name,
+    count_terms,
+    decode_postings,
+    decode_vlq,
+    encode_postings,
+    encode_vlq,
+    node_text,
+)
+
+
+class TestSearchText(unittest.TestCase):
+    def test_markdown_body(self):
+        node = markdown_to_html_node('# Tom Bombadil\n\nHe *sings* in `code` a lot.\n\n```\nfenced block\n```\n\nThe end')
+        terms = count_terms(node_text(node))
+        self.assertEqual(1, terms['sings'])
+        self.assertEqual(1, terms['bombadil'])
+        self.assertNotIn('code', terms)
+        self.assertNotIn('fenced', terms)
+        # words in separate blocks don't run together
+        self.assertNotIn('bombadilhe', terms)
+
+    def test_rendered_html(self):
+        html = '<p>Old <b>Man</b> Willow</p><p>eats&amp;sleeps</p><pre><code>print(x)</code></pre>'
+        for node in [FragmentNode(html), MappedHtmlNode(memoryview(html.encode()))]:
+            self.assertEqual(Counter({'old': 1, 'man': 1, 'willow': 1, 'eats': 1, 'sleeps': 1}),
+                             count_terms(node_text(node)))
+
+    def test_tree_with_fragments(self):
+        node = ParentNode('div', [
+            FragmentNode('<p>cached</p>'),
+            LeafNode('p', 'inline <span>html</span>'),
+            LeafNode('code', 'skipped'),
+            LeafNode('img', '', {'alt': 'picture'}),
+        ])
+        self.assertEqual({'cached', 'inline', 'html'}, set(count_terms(node_text(node))))
+
+    def test_fold(self):
+        self.assertEqual(Counter({'eowyn': 2}), count_terms('Éowyn eowyn a'))
+
+    def test_bucket_name(self):
+        self.assertEqual('to', bucket_name('tom'))
+        self.assertEqual('_3bb_3b5', bucket_name('λεγολας'))
+
+    def test_postings_round_trip(self):
+        self.assertEqual([0, 31, 32, 1000], decode_vlq(encode_vlq([0, 31, 32, 1000])))
+        postings = {3: 1, 700: 12, 40: 2}
+        self.assertEqual(postings, decode_postings(encode_postings(postings)))
+
+
+class TestSearchIndex(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.public = os.path.join(self.tmp.name, 'public')
+        self.state = os.path.join(self.tmp.name, 'state.json')
+        self.manifest = BuildManifest(os.path.join(self.tmp.name, 'manifest.json'))
+        self.texts = {}
+        self.indexed = []
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def add(self, name: str, text: str):
+        dest = os.path.join(self.public, name, 'index.html')
+        self.texts[name] = text
+        self.manifest.record(PAGES, name, str(hash(text)), dest, meta={})
+
+    def terms(self, src: str, entry: dict) -> tuple[str, Counter]:
+        self.indexed.append(src)
+        return src.title(), count_terms(self.texts[src])
+
+    def update(self) -> int:
+        self.manifest.forget_seen(GENERATED)
+        written = SearchIndex.load(self.manifest, self.public, self.state).update(self.manifest, self.terms)
+        self.manifest.prune(GENERATED)
+        return written
+
+    def read(self, rel: str):
+        with open(os.path.join(self.public, 'search', rel), 'rt') as f:
+            return json.load(f)
+
+    def test_index(self):
+        self.add('tom', 'Tom Bombadil sings')
+        self.add('willow', 'Old Man Willow sings to Tom')
+        self.update()
+
+        self.assertEqual([['/tom/', 'Tom'], ['/willow/', 'Willow']], self.read('docs/0.json'))
+        self.assertEqual({0: 1, 1: 1}, decode_postings(self.read('t/to.json')['tom']))
+        meta = self.read('index.json')
+        self.assertEqual(2, meta['docs'])
+        self.assertIn('wi', meta['shards'])
+
+    def test_only_changed_pages_indexed(self):
+        self.add('tom', 'Tom Bombadil')
+        self.add('willow', 'Old Man Willow')
+        self.update()
+        self.indexed.clear()
+        self.assertEqual(0, self.update())
+        self.assertEqual([], self.indexed)
+
+        self.add('tom', 'Tom Bombadil is merry')
+        self.update()
+        self.assertEqual(['tom'], self.indexed)
+
+    # what a search finds, {term: {url: count}}, and the document count
+    def found(self) -> tuple[dict, int]:
+        meta = self.read('index.json')
+        urls = {}
+        for name in os.listdir(os.path.join(self.public, 'search', 'docs')):
+            chunk = int(name.split('.')[0])
+            for i, doc in enumerate(self.read(f'docs/{name}')):
+                if doc != 0:
+                    urls[chunk * meta['chunk'] + i] = doc[0]
+        terms = {}
+        for name in meta['shards']:
+            for term, postings in self.read(f't/{name}.json').items():
+                terms[term] = {urls[id]: count for id, count in decode_postings(postings).items()}
+        return terms, meta['docs']
+
+    def test_incremental_matches_full(self):
+        self.add('barrow', 'Barrow wights')
+        self.add('goldberry', 'Goldberry, the river daughter')
+        self.add('tom', 'Tom Bombadil')
+        self.add('willow', 'Old Man Willow')
+        self.update()
+
+        self.add('tom', 'Tom Bombadil the merry')
+        self.manifest.remove(PAGES, 'barrow')
+        self.update()
+        incremental = self.found()
+        self.assertNotIn('barrow', incremental[0])
+        self.assertEqual(3, incremental[1])
+
+        os.remove(self.state)
+        self.update()
+        self.assertEqual(incremental, self.found())
+
+    def test_freed_ids_not_counted(self):
+        self.add('barrow', 'Barrow wights')
+        self.add('tom', 'Tom Bombadil')
+        self.update()
+        self.manifest.remove(PAGES, 'barrow')
+        self.update()
+        # tom keeps its id, leaving a hole in front of it
+        self.assertEqual([0, ['/tom/', 'Tom']], self.read('docs/0.json'))
+        self.assertEqual(1, self.read('index.json')['docs'])
+
+    def test_removed_shards_pruned(self):
+        self.add('tom', 'Tom')
+        self.add('willow', 'Willow')
+        self.update()
+        self.manifest.remove(PAGES, 'willow')
+        self.update()
+        self.assertFalse(os.path.exists(os.path.join(self.public, 'search', 't', 'wi.json')))
+        self.assertEqual(['to'], self.read('index.json')['shards'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,77 @@
+import os
+import tempfile
+import unittest
+
+from main import shard_args
+from manifest import BuildManifest, PAGES
+from shards import PartialManifest, assign_shards, merge_shards, shard_dir, stage_path
+
+
+class TestAssignShards(unittest.TestCase):
+    def test_balanced_and_deterministic(self):
+        pages = [(f'content/p{i}.md', f'public/p{i}.html', (i % 7 + 1) * 100) for i in range(50)]
+        assigned = assign_shards(pages, 4)
+        self.assertEqual(assigned, assign_shards(list(reversed(pages)), 4))
+        self.assertEqual({0, 1, 2, 3}, set(assigned.values()))
+
+        loads = [0] * 4
+        for src, _, size in pages:
+            loads[assigned[src]] += size
+        self.assertLessEqual(max(loads) - min(loads), 700)
+
+    def test_one_shard(self):
+        self.assertEqual({'a.md': 0, 'b.md': 0}, assign_shards([('a.md', 'a.html', 1), ('b.md', 'b.html', 2)], 1))
+
+
+class TestMergeShards(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = os.path.join(self.tmp.name, 'shards')
+        self.public = os.path.join(self.tmp.name, 'public')
+        self.manifest = BuildManifest(os.path.join(self.tmp.name, 'manifest.json'))
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def build(self, index: int, shards: int, template: str, pages: dict[str, str]):
+        partial = PartialManifest(shards, index, template)
+        for src, name in pages.items():
+            dest = os.path.join(self.public, name)
+            staged = stage_path(dest, self.public, index, self.root)
+            os.makedirs(os.path.split(staged)[0], exist_ok=True)
+            with open(staged, 'wt') as f:
+                f.write(src)
+            partial.record(src, 'h' + src, dest, {'deps': ['template:t.html'], 'meta': {'title': src}})
+        partial.save(self.root)
+
+    def test_merge(self):
+        self.build(0, 2, 'abc', {'a.md': 'a.html'})
+        self.build(1, 2, 'abc', {'b.md': os.path.join('blog', 'b.html')})
+
+        self.assertEqual(2, merge_shards(self.manifest, 2, self.public, 'abc', self.root))
+        with open(os.path.join(self.public, 'blog', 'b.html'), 'rt') as f:
+            self.assertEqual('b.md', f.read())
+        self.assertEqual('ha.md', self.manifest.get(PAGES, 'a.md')['hash'])
+        self.assertEqual({'a.md', 'b.md'}, self.manifest.deps.dependents('template:t.html'))
+        self.assertEqual({'title': 'b.md'}, self.manifest.get(PAGES, 'b.md')['meta'])
+        self.assertFalse(os.path.exists(shard_dir(0, self.root)))
+
+    def test_incomplete_merge_touches_nothing(self):
+        self.build(0, 2, 'abc', {'a.md': 'a.html'})
+        with self.assertRaises(Exception):
+            merge_shards(self.manifest, 2, self.public, 'abc', self.root)
+
+        self.build(1, 2, 'other', {'b.md': 'b.html'})
+        with self.assertRaises(Exception):
+            merge_shards(self.manifest, 2, self.public, 'abc', self.root)
+        self.assertFalse(os.path.exists(self.public))
+        self.assertEqual({}, self.manifest.entries[PAGES])
+
+
+    def test_shard_args(self):
+        args = ['--shards', '2', '--clear-cache', '--profile', '--trace', 'out/trace.json', '-j', '2']
+        self.assertEqual(['--shards', '2', '--profile', '--trace', 'out/trace-1.json', '-j', '2'], shard_args(args, 1))
+        self.assertEqual(['--trace=t-0.json'], shard_args(['--trace=t.json'], 0))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,98 @@
+import os
+import os.path
+import tempfile
+import unittest
+
+from manifest import BuildManifest, ASSETS
+from sync import copy_file, sync_static, COMPARE_HASH
+
+
+class TestSyncStatic(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.src = os.path.join(self.tmp.name, 'static')
+        self.dst = os.path.join(self.tmp.name, 'public')
+        self.manifest = BuildManifest(os.path.join(self.tmp.name, 'manifest.json'))
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write(self, name: str, text: str) -> str:
+        path = os.path.join(self.src, name)
+        os.makedirs(os.path.split(path)[0], exist_ok=True)
+        with open(path, 'wt') as f:
+            f.write(text)
+        return path
+
+    def sync(self, **kwargs) -> int:
+        self.manifest.save()
+        self.manifest = BuildManifest.load(self.manifest.path)
+        return sync_static(self.dst, self.src, self.manifest, **kwargs)
+
+    def read(self, name: str) -> str:
+        with open(os.path.join(self.dst, name), 'rt') as f:
+            return f.read()
+
+    def test_copies_only_changes(self):
+        self.write('index.css', 'body {}')
+        self.write('images/a.png', 'png')
+        self.assertEqual(2, self.sync())
+        self.assertEqual('png', self.read('images/a.png'))
+        self.assertEqual(0, self.sync())
+
+        path = self.write('index.css', 'body { color: red }')
+        os.utime(path, ns=(0, 1_000_000_000))
+        self.assertEqual(1, self.sync())
+        self.assertEqual('body { color: red }', self.read('index.css'))
+        self.assertEqual(1_000_000_000, os.stat(os.path.join(self.dst, 'index.css')).st_mtime_ns)
+
+    def test_touch_does_not_copy(self):
+        path = self.write('index.css', 'body {}')
+        self.sync()
+        os.utime(path, ns=(0, 2_000_000_000))
+        self.assertEqual(0, self.sync())
+        self.assertEqual(2_000_000_000, os.stat(os.path.join(self.dst, 'index.css')).st_mtime_ns)
+
+    def test_touch_keeps_entry(self):
+        path = self.write('index.css', 'body {}')
+        self.sync()
+        self.manifest.get(ASSETS, path)['compressed'] = ['.gz']
+        os.utime(path, ns=(0, 2_000_000_000))
+        self.assertEqual(0, self.sync())
+        entry = self.manifest.get(ASSETS, path)
+        self.assertEqual(['.gz'], entry['compressed'])
+        self.assertEqual(2_000_000_000, entry['mtime_ns'])
+        self.assertEqual(0, self.sync())
+
+    def test_hash_compare(self):
+        path = self.write('index.css', 'body {}')
+        self.assertEqual(1, self.sync(compare=COMPARE_HASH))
+        os.utime(path, ns=(0, 3_000_000_000))
+        self.assertEqual(0, self.sync(compare=COMPARE_HASH))
+
+    def test_removes_orphans(self):
+        self.write('keep.css', 'a')
+        gone = self.write('old/gone.png', 'b')
+        self.sync()
+        os.remove(gone)
+        self.sync()
+        self.assertTrue(os.path.exists(os.path.join(self.dst, 'keep.css')))
+        self.assertFalse(os.path.exists(os.path.join(self.dst, 'old')))
+        self.assertEqual([os.path.join(self.src, 'keep.css')], list(self.manifest.entries[ASSETS]))
+
+    def test_hardlink(self):
+        path = self.write('index.css', 'body {}')
+        self.sync(hardlink=True)
+        self.assertTrue(os.path.samefile(path, os.path.join(self.dst, 'index.css')))
+
+    def test_copy_file(self):
+        path = self.write('big.bin', 'x' * 100000)
+        dst = os.path.join(self.dst, 'big.bin')
+        copy_file(path, dst)
+        self.assertEqual('x' * 100000, self.read('big.bin'))
+        self.assertFalse(os.path.samefile(path, dst))
+        self.assertFalse(os.path.exists(dst + '.tmp'))
+
+
+if __name__ == "__main__":
+    unittest.main()
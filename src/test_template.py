@@ -0,0 +1,91 @@
+import io
+import os
+import tempfile
+import unittest
+
+from htmlnode import LeafNode, ParentNode
+from template import Template, inline_stylesheets, load_template, set_template_options, template_digest, template_inputs
+
+
+class TestTemplate(unittest.TestCase):
+    def test_parse(self):
+        template = Template.parse('<title>{{ Title }}</title><p>{{Date}}</p>{{ Content }}!')
+        self.assertEqual(['Title', 'Date', 'Content'], template.slots)
+        self.assertEqual(['<title>', '</title><p>', '</p>', '!'], template.chunks)
+
+    def test_no_slots(self):
+        template = Template.parse('<p>plain</p>')
+        self.assertEqual('<p>plain</p>', template.render({}))
+
+    def test_render(self):
+        template = Template.parse('<title>{{ Title }}</title><h1>{{ Title }}</h1>{{ Content }}')
+        content = ParentNode('div', [LeafNode('b', 'hi')])
+        expect = '<title>T</title><h1>T</h1><div><b>hi</b></div>'
+        self.assertEqual(expect, template.render({'Title': 'T', 'Content': content}))
+
+        sink = io.StringIO()
+        template.write(sink, {'Title': 'T', 'Content': content})
+        self.assertEqual(expect, sink.getvalue())
+
+    def test_missing_value_left_in_place(self):
+        template = Template.parse('{{ Title }} {{Nav}}')
+        self.assertEqual('T {{Nav}}', template.render({'Title': 'T'}))
+
+    def test_matches_str_replace(self):
+        text = '<title>{{ Title }}</title>\n<article>{{ Content }}</article>\n'
+        expect = text.replace('{{ Title }}', 'A title').replace('{{ Content }}', '<p>body</p>')
+        actual = Template.parse(text).render({'Title': 'A title', 'Content': '<p>body</p>'})
+        self.assertEqual(expect, actual)
+
+    def test_load_template_cache(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'template.html')
+            with open(path, 'wt') as f:
+                f.write('{{ Title }}')
+
+            first = load_template(path)
+            self.assertIs(first, load_template(path))
+
+            with open(path, 'wt') as f:
+                f.write('<b>{{ Title }}</b>')
+            os.utime(path, ns=(0, 0))
+            self.assertEqual('<b>T</b>', load_template(path).render({'Title': 'T'}))
+
+    def test_inline_stylesheets(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            with open(os.path.join(tmp, 'index.css'), 'wt') as f:
+                f.write('body { color: red; }')
+            text = ('<link href="/index.css" rel="stylesheet" />'
+                    '<link rel="stylesheet" href="https://example.com/x.css">'
+                    '<link rel="icon" href="/index.css">')
+            actual, inlined = inline_stylesheets(text, tmp)
+            self.assertEqual('<style>body { color: red; }</style>' + text.split('/>', 1)[1], actual)
+            self.assertEqual([os.path.join(tmp, 'index.css')], inlined)
+
+    def test_options_change_digest(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'template.html')
+            css = os.path.join(tmp, 'index.css')
+            with open(path, 'wt') as f:
+                f.write('<head>\n  <link href="/index.css" rel="stylesheet">\n</head>\n{{ Content }}')
+            with open(css, 'wt') as f:
+                f.write('p { margin: 0; }')
+
+            try:
+                plain = template_digest(path)
+                set_template_options(minify=True, inline_css_dir=tmp)
+                self.assertNotEqual(plain, template_digest(path))
+                self.assertEqual([path, css], template_inputs(path))
+                self.assertEqual('<head><style>p{margin: 0}</style></head>x', load_template(path).render({'Content': 'x'}))
+
+                minified = template_digest(path)
+                with open(css, 'wt') as f:
+                    f.write('p { margin: 1px; }')
+                os.utime(css, ns=(0, 0))
+                self.assertNotEqual(minified, template_digest(path))
+            finally:
+                set_template_options()
+
+
+if __name__ == "__main__":
+    unittest.main()
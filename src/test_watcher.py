@@ -0,0 +1,109 @@
+import os
+import os.path
+import tempfile
+import threading
+import time
+import unittest
+
+from devserver import Reloader
+from watcher import PollingWatcher, diff_snapshots, snapshot, watch
+
+
+class TestWatcher(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.dir = self.tmp.name
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write(self, name: str, text: str) -> str:
+        path = os.path.join(self.dir, name)
+        os.makedirs(os.path.split(path)[0], exist_ok=True)
+        with open(path, 'wt') as f:
+            f.write(text)
+        return path
+
+    def test_diff_snapshots(self):
+        a = self.write('a.md', 'a')
+        b = self.write('sub/b.md', 'b')
+        before = snapshot([self.dir])
+        self.assertEqual({a, b}, set(before))
+
+        self.write('sub/b.md', 'bb')
+        c = self.write('c.md', 'c')
+        os.remove(a)
+        self.assertEqual({a, b, c}, diff_snapshots(before, snapshot([self.dir])))
+
+    def test_polling_watcher(self):
+        watcher = PollingWatcher([self.dir], interval=0.01)
+        self.assertEqual(set(), watcher.poll(0.01))
+        path = self.write('new/page.md', 'x')
+        self.assertEqual({path}, watcher.poll(0.01))
+
+    def test_watch_reports_changes(self):
+        self.write('keep.md', 'x')
+        template = self.write('template.html', 'x')
+        paths = [os.path.join(self.dir, 'content'), template]
+        os.makedirs(paths[0])
+        a = os.path.join(self.dir, 'content/a.md')
+        b = os.path.join(self.dir, 'content/dir/b.md')
+
+        seen = set()
+        def run():
+            # batching depends on timing, only the union of batches is checked
+            for touched in watch(paths, interval=0.01, debounce=0.05, stop_after=10):
+                seen.update(touched)
+                if {a, b, template} <= seen:
+                    break
+
+        thread = threading.Thread(target=run)
+        thread.start()
+        time.sleep(0.2)
+        self.write('content/a.md', 'a')
+        self.write('content/dir/b.md', 'b')
+        self.write('keep.md', 'ignored, not watched')
+        self.write('template.html', 'y')
+        thread.join(5)
+
+        self.assertFalse(thread.is_alive())
+        self.assertTrue({a, b, template} <= seen)
+        self.assertNotIn(os.path.join(self.dir, 'keep.md'), seen)
+
+    def test_watch_batches_changes(self):
+        self.write('keep.md', 'x')
+        template = self.write('template.html', 'x')
+        paths = [os.path.join(self.dir, 'content'), template]
+        os.makedirs(paths[0])
+
+        batches = []
+        def run():
+            # the writes below land well within one debounce window
+            for touched in watch(paths, interval=0.01, debounce=0.5, stop_after=1):
+                batches.append(touched)
+
+        thread = threading.Thread(target=run)
+        thread.start()
+        time.sleep(0.2)
+        a = self.write('content/a.md', 'a')
+        b = self.write('content/dir/b.md', 'b')
+        self.write('keep.md', 'ignored, not watched')
+        self.write('template.html', 'y')
+        thread.join(5)
+
+        self.assertFalse(thread.is_alive())
+        self.assertEqual(1, len(batches))
+        self.assertTrue({a, b, template} <= batches[0])
+        self.assertNotIn(os.path.join(self.dir, 'keep.md'), batches[0])
+
+
+class TestReloader(unittest.TestCase):
+    def test_wait(self):
+        reloader = Reloader()
+        self.assertEqual(0, reloader.wait(0, 0.01))
+        threading.Timer(0.05, reloader.notify).start()
+        self.assertEqual(1, reloader.wait(0, 5))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,204 @@
+import ctypes
+import ctypes.util
+import os
+import os.path
+import select
+import struct
+import sys
+import time
+from typing import Iterator, Optional
+
+# Watches files and directory trees and reports what changed.
+#
+# On Linux inotify is used through ctypes, elsewhere (or if inotify is
+# unavailable) the trees are polled. Either way events are debounced: a
+# batch is reported once nothing has changed for `debounce` seconds, so an
+# editor saving several files only causes one rebuild.
+
+DEFAULT_INTERVAL = 0.05
+DEFAULT_DEBOUNCE = 0.02
+
+
+# Returns (mtime_ns, size) for every file under the given paths.
+# A path can be a single file or a directory tree.
+def snapshot(paths: list[str]) -> dict[str, tuple[int, int]]:
+    files = {}
+    for path in paths:
+        if os.path.isfile(path):
+            st = os.stat(path)
+            files[path] = (st.st_mtime_ns, st.st_size)
+            continue
+
+        stack = [path]
+        while len(stack) > 0:
+            try:
+                entries = list(os.scandir(stack.pop()))
+            except FileNotFoundError:
+                continue
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append(entry.path)
+                    continue
+                try:
+                    st = entry.stat()
+                except FileNotFoundError:
+                    continue
+                files[entry.path] = (st.st_mtime_ns, st.st_size)
+    return files
+
+def diff_snapshots(old: dict[str, tuple[int, int]], new: dict[str, tuple[int, int]]) -> set[str]:
+    touched = {path for path, key in new.items() if old.get(path) != key}
+    touched.update(path for path in old if path not in new)
+    return touched
+
+
+class PollingWatcher:
+    def __init__(self, paths: list[str], interval: float = DEFAULT_INTERVAL):
+        self.paths = paths
+        self.interval = interval
+        self.files = snapshot(paths)
+
+    # Waits up to timeout seconds, returns the paths touched since last call
+    def poll(self, timeout: float) -> set[str]:
+        time.sleep(min(timeout, self.interval))
+        files = snapshot(self.paths)
+        touched = diff_snapshots(self.files, files)
+        self.files = files
+        return touched
+
+    def close(self):
+        pass
+
+
+_IN_MODIFY = 0x002
+_IN_ATTRIB = 0x004
+_IN_CLOSE_WRITE = 0x008
+_IN_MOVED_FROM = 0x040
+_IN_MOVED_TO = 0x080
+_IN_CREATE = 0x100
+_IN_DELETE = 0x200
+_IN_DELETE_SELF = 0x400
+_IN_ISDIR = 0x40000000
+_IN_NONBLOCK = 0o4000
+_WATCH_MASK = (_IN_MODIFY | _IN_ATTRIB | _IN_CLOSE_WRITE | _IN_MOVED_FROM | _IN_MOVED_TO
+               | _IN_CREATE | _IN_DELETE | _IN_DELETE_SELF)
+_EVENT_HEADER = struct.Struct('iIII')
+
+
+class InotifyWatcher:
+    def __init__(self, paths: list[str]):
+        libc_name = ctypes.util.find_library('c')
+        if not sys.platform.startswith('linux') or libc_name is None:
+            raise OSError('inotify is only available on linux')
+
+        self.libc = ctypes.CDLL(libc_name, use_errno=True)
+        self.fd = self.libc.inotify_init1(_IN_NONBLOCK)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), 'inotify_init1 failed')
+
+        # watch descriptor -> directory, and for single files the names we care about
+        self.dirs: dict[int, str] = {}
+        self.files: dict[str, set[str]] = {}
+        for path in paths:
+            if os.path.isdir(path):
+                self.add_tree(path)
+            else:
+                dir_part = os.path.split(path)[0] or '.'
+                self.add_dir(dir_part)
+                self.files.setdefault(dir_part, set()).add(os.path.split(path)[1])
+
+    def add_dir(self, path: str):
+        wd = self.libc.inotify_add_watch(self.fd, os.fsencode(path), _WATCH_MASK)
+        if wd < 0:
+            raise OSError(ctypes.get_errno(), f'inotify_add_watch failed: {path}')
+        self.dirs[wd] = path
+
+    # Watches path and every directory below it, returns the files found
+    def add_tree(self, path: str) -> list[str]:
+        found = []
+        stack = [path]
+        while len(stack) > 0:
+            dir_path = stack.pop()
+            self.add_dir(dir_path)
+            try:
+                entries = list(os.scandir(dir_path))
+            except FileNotFoundError:
+                continue
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append(entry.path)
+                else:
+                    found.append(entry.path)
+        return found
+
+    # Waits up to timeout seconds for a change to a watched path. Events for
+    # files next to a watched file are skipped without ending the wait, or
+    # watch() would take them for things having settled down.
+    def poll(self, timeout: float) -> set[str]:
+        touched = set()
+        deadline = time.monotonic() + timeout
+        while len(touched) == 0:
+            readable, _, _ = select.select([self.fd], [], [], max(deadline - time.monotonic(), 0))
+            if not readable:
+                break
+            try:
+                data = os.read(self.fd, 1 << 16)
+            except BlockingIOError:
+                continue
+            self.read_events(data, touched)
+        return touched
+
+    def read_events(self, data: bytes, touched: set[str]):
+        offset = 0
+        while offset < len(data):
+            wd, mask, _, name_len = _EVENT_HEADER.unpack_from(data, offset)
+            offset += _EVENT_HEADER.size
+            name = data[offset:offset + name_len].rstrip(b'\0').decode()
+            offset += name_len
+
+            dir_path = self.dirs.get(wd)
+            if dir_path is None or name == '':
+                continue
+            if dir_path in self.files and name not in self.files[dir_path]:
+                continue
+
+            path = os.path.join(dir_path, name)
+            if mask & _IN_ISDIR and mask & (_IN_CREATE | _IN_MOVED_TO) and dir_path not in self.files:
+                # a whole directory appeared, everything in it is new
+                touched.update(self.add_tree(path))
+            touched.add(path)
+
+    def close(self):
+        os.close(self.fd)
+
+
+def make_watcher(paths: list[str], interval: float = DEFAULT_INTERVAL):
+    try:
+        return InotifyWatcher(paths)
+    except OSError as e:
+        print(f'LOG: inotify unavailable, polling every {interval}s: {e}')
+        return PollingWatcher(paths, interval)
+
+# Yields a set of touched paths (changed, created or deleted) per batch of
+# changes, forever. stop_after is for tests: stop after that many batches.
+def watch(paths: list[str], interval: float = DEFAULT_INTERVAL, debounce: float = DEFAULT_DEBOUNCE,
+          stop_after: Optional[int] = None) -> Iterator[set[str]]:
+    watcher = make_watcher(paths, interval)
+    batches = 0
+    try:
+        while stop_after is None or batches < stop_after:
+            touched = watcher.poll(1.0)
+            if len(touched) == 0:
+                continue
+
+            # keep collecting until things settle down
+            while True:
+                more = watcher.poll(debounce)
+                if len(more) == 0:
+                    break
+                touched.update(more)
+
+            batches += 1
+            yield touched
+    finally:
+        watcher.close()